@@ -0,0 +1,276 @@
+# accounts/bulk_import.py
+"""
+Bulk user import from CSV or NDJSON (`manage.py import_users`, or
+POST /admin-api/users/import/ which runs it as a background job).
+
+Columns / keys: username, email, password, first_name, last_name, phone.
+username defaults to the email. Rows without a password get an unusable one
+(the user sets it through the reset flow) and skip hashing altogether.
+
+Per batch of USER_IMPORT_BATCH_SIZE rows: validate, drop rows whose username /
+email already exists (in the table or earlier in the file), hash the passwords
+across a process pool, then one bulk_create. The slow part is the hasher
+(PBKDF2, on purpose), so it is the part that runs on every core.
+"""
+import csv
+import io
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+
+from courses.services.job_service import JobService
+from courses.utils import jobs_collection
+
+MAX_REPORTED_ERRORS = 200
+FIELDS = ("username", "email", "password", "first_name", "last_name", "phone")
+
+
+# --------------------------
+# Reading
+# --------------------------
+def detect_format(name):
+    return "ndjson" if name.lower().endswith((".ndjson", ".jsonl", ".json")) else "csv"
+
+
+def read_rows(binary_file, fmt):
+    """
+    Yields (line number, row dict) from a binary file object.
+    """
+    text = io.TextIOWrapper(binary_file, encoding="utf-8-sig", newline="" if fmt == "csv" else None)
+    if fmt == "csv":
+        for line, row in enumerate(csv.DictReader(text), start=2):
+            yield line, row
+        return
+
+    for line, raw in enumerate(text, start=1):
+        if not raw.strip():
+            continue
+        try:
+            row = json.loads(raw)
+        except ValueError:
+            row = None
+        yield line, row if isinstance(row, dict) else {"__invalid__": "not a JSON object"}
+
+
+# --------------------------
+# Hashing pool (spawned processes: safe to start from a threaded web worker)
+# --------------------------
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _hash(password):
+    from django.contrib.auth.hashers import make_password
+    return make_password(password)
+
+
+def hashing_pool(workers):
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+    )
+
+
+# --------------------------
+# Import
+# --------------------------
+def _clean(line, row, User):
+    """
+    (fields dict, None) or (None, error).
+    """
+    from django.core.exceptions import ValidationError
+    from django.core.validators import validate_email
+
+    if "__invalid__" in row:
+        return None, row["__invalid__"]
+    data = {k: (str(row.get(k) or "")).strip() for k in FIELDS}
+    data["email"] = data["email"].lower()
+    data["username"] = data["username"] or data["email"]
+    if not data["username"]:
+        return None, "username or email required"
+    if len(data["username"]) > 150:
+        return None, "username longer than 150 characters"
+    try:
+        User.username_validator(data["username"])
+        if data["email"]:
+            validate_email(data["email"])
+    except ValidationError as exc:
+        return None, exc.messages[0]
+    return data, None
+
+
+class _Report:
+    def __init__(self):
+        self.created = self.skipped = self.failed = 0
+        self.user_ids = []
+        self.errors = []
+
+    def error(self, line, message, skipped=False):
+        if skipped:
+            self.skipped += 1
+        else:
+            self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "error": message})
+
+    def as_dict(self):
+        return {"created": self.created, "skipped": self.skipped, "failed": self.failed, "errors": self.errors}
+
+
+def import_users(rows, batch_size=None, workers=None, dry_run=False, progress=None):
+    """
+    rows: iterable of (line, dict). Returns a _Report (created ids in user_ids).
+    """
+    from django.contrib.auth import get_user_model
+    User = get_user_model()
+
+    batch_size = batch_size or settings.USER_IMPORT_BATCH_SIZE
+    workers = workers or settings.USER_IMPORT_WORKERS or os.cpu_count() or 1
+    report = _Report()
+    state = {"usernames": set(), "emails": set(), "workers": workers, "dry_run": dry_run}
+
+    with hashing_pool(workers) as pool:
+        batch = []
+        for line, row in rows:
+            batch.append((line, row))
+            if len(batch) >= batch_size:
+                _import_batch(batch, User, pool, report, state)
+                batch = []
+                if progress:
+                    progress(report)
+        if batch:
+            _import_batch(batch, User, pool, report, state)
+            if progress:
+                progress(report)
+    return report
+
+
+def _import_batch(batch, User, pool, report, state):
+    from django.contrib.auth.hashers import make_password
+    from django.db import IntegrityError, transaction
+
+    cleaned = []
+    for line, row in batch:
+        data, error = _clean(line, row, User)
+        if error:
+            report.error(line, error)
+        else:
+            cleaned.append((line, data))
+
+    # existing accounts: two indexed lookups per batch
+    usernames = {d["username"] for _, d in cleaned}
+    emails = {d["email"] for _, d in cleaned if d["email"]}
+    taken_usernames = set(User.objects.filter(username__in=usernames).values_list("username", flat=True))
+    taken_emails = {e.lower() for e in User.objects.with_emails(emails).values_list("email", flat=True)}
+
+    seen_usernames, seen_emails = state["usernames"], state["emails"]
+    fresh = []
+    for line, data in cleaned:
+        if data["username"] in taken_usernames or data["username"] in seen_usernames:
+            report.error(line, f"username {data['username']} exists", skipped=True)
+        elif data["email"] and (data["email"] in taken_emails or data["email"] in seen_emails):
+            report.error(line, f"email {data['email']} exists", skipped=True)
+        else:
+            seen_usernames.add(data["username"])
+            if data["email"]:
+                seen_emails.add(data["email"])
+            fresh.append((line, data))
+    if state["dry_run"]:
+        report.created += len(fresh)   # would be created
+        return
+    if not fresh:
+        return
+
+    # only real passwords go to the pool; blank ones become unusable here
+    passwords = [d["password"] for _, d in fresh if d["password"]]
+    chunksize = max(1, len(passwords) // (state["workers"] * 4))
+    hashed = iter(pool.map(_hash, passwords, chunksize=chunksize))
+
+    users = [
+        User(
+            **{k: v for k, v in data.items() if k != "password"},
+            password=next(hashed) if data["password"] else make_password(None),
+        )
+        for _, data in fresh
+    ]
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create(users)
+    except IntegrityError as exc:
+        # someone registered one of these meanwhile: report the batch, go on
+        for line, _ in fresh:
+            report.error(line, f"batch not imported: {exc}")
+        return
+
+    report.created += len(users)
+    report.user_ids.extend(
+        User.objects.filter(username__in=[u.username for u in users]).values_list("id", flat=True)
+    )
+
+
+def assign_imported(user_ids, course_id, created_by=None):
+    """
+    Hands the new accounts to the assign_multiple job (enroll + email).
+    """
+    import courses.services.enrollment_service  # noqa: F401  registers assign_multiple
+
+    return JobService.submit(
+        "assign_multiple",
+        items=[str(i) for i in user_ids],
+        payload={"course_id": course_id, "source": "import_users"},
+        created_by=created_by,
+    )
+
+
+# --------------------------
+# Background job (admin upload)
+# --------------------------
+def save_upload(upload):
+    """
+    Copies an uploaded file into USER_IMPORT_DIR (owner-only: it holds
+    plain-text passwords until the job deletes it). Returns the path.
+    """
+    import uuid
+
+    directory = settings.USER_IMPORT_DIR
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    path = os.path.join(directory, f"{uuid.uuid4().hex}-{os.path.basename(upload.name)}")
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "wb") as out:
+        for block in upload.chunks():
+            out.write(block)
+    return path
+
+
+@JobService.register("import_users")
+def import_users_job(job, chunk):
+    """
+    items = [path of the saved upload]; the row report is kept on job.report.
+    """
+    payload = job["payload"]
+
+    def progress(report):
+        jobs_collection.update_one({"_id": job["_id"]}, {"$set": {"report": report.as_dict()}})
+        JobService.heartbeat(job)
+
+    errors = []
+    for path in chunk:
+        try:
+            with open(path, "rb") as f:
+                report = import_users(read_rows(f, payload["format"]), progress=progress)
+        except FileNotFoundError:
+            errors.append({"item": os.path.basename(path), "error": "upload file is gone"})
+            continue
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+        if payload.get("course_id") and report.user_ids:
+            assign_job = assign_imported(report.user_ids, payload["course_id"], job.get("created_by"))
+            jobs_collection.update_one({"_id": job["_id"]}, {"$set": {"assign_job_id": str(assign_job["_id"])}})
+    return {"processed": len(chunk), "failed": len(errors), "errors": errors}
@@ -1,10 +1,11 @@
 # accounts/forms.py
 from django import forms
 from django.core.signing import TimestampSigner, BadSignature, SignatureExpired
-from django.utils.crypto import get_random_string
 from django.contrib.auth import get_user_model
 from notifications.services import NotificationService
 
+from . import otp as otp_store
+
 User = get_user_model()
 signer = TimestampSigner()
 
@@ -13,13 +14,12 @@ class ForgotPasswordForm(forms.Form):
 
     def send_otp(self):
         email = self.cleaned_data["email"]
-        user = User.objects.filter(email__iexact=email).first()
+        user = User.objects.with_email(email).first()
         if not user:
             raise forms.ValidationError("Email not found")
 
-        otp = get_random_string(6, "0123456789")
-        user.profile_otp = otp
-        user.save()
+        # cache only - no write to the user table
+        otp = otp_store.issue(user.pk)
 
         NotificationService.send(
             event_name="USER_FORGOT_PASSWORD",
@@ -37,11 +37,11 @@ class VerifyOTPForm(forms.Form):
         cleaned = super().clean()
         email = cleaned.get("email")
         otp = cleaned.get("otp")
-        user = User.objects.filter(email__iexact=email).first()
+        user = User.objects.with_email(email).first()
         if not user:
             raise forms.ValidationError("User not found")
-        if user.profile_otp != otp:
-            raise forms.ValidationError("Invalid OTP")
+        if not otp_store.verify(user.pk, otp):
+            raise forms.ValidationError("Invalid or expired OTP")
         return cleaned
 
 
@@ -50,7 +50,7 @@ class SendResetLinkForm(forms.Form):
 
     def send_reset_link(self):
         email = self.cleaned_data["email"]
-        user = User.objects.filter(email__iexact=email).first()
+        user = User.objects.with_email(email).first()
         if not user:
             raise forms.ValidationError("User not found")
 
@@ -89,10 +89,10 @@ class ResetPasswordForm(forms.Form):
     def save_password(self):
         token = self.cleaned_data["token"]
         email = signer.unsign(token)
-        user = User.objects.filter(email__iexact=email).first()
+        user = User.objects.with_email(email).first()
         if not user:
             raise forms.ValidationError("User not found")
         user.set_password(self.cleaned_data["new_password"])
-        user.profile_otp = ""  # clear OTP
-        user.save()
+        user.save(update_fields=["password"])
+        otp_store.revoke(user.pk)  # a code still pending is useless now
         return True
@@ -0,0 +1,136 @@
+# accounts/management/commands/bench_sqlite_writes.py
+import os
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from courseapi.database import SQLITE_PRAGMAS, SQLITE_BUSY_TIMEOUT_MS
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrency benchmark for the user table on SQLite: default settings "
+        "(rollback journal, deferred transactions) vs courseapi.database settings "
+        "(WAL + busy_timeout + BEGIN IMMEDIATE). Runs on a throwaway file, "
+        "never on db.sqlite3."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writers", type=int, default=8)
+        parser.add_argument("--readers", type=int, default=8)
+        parser.add_argument("--seconds", type=float, default=5.0)
+        parser.add_argument("--users", type=int, default=1000)
+
+    def handle(self, *args, **opts):
+        for label, tuned in (("default", False), ("tuned", True)):
+            with tempfile.TemporaryDirectory() as tmp:
+                path = os.path.join(tmp, "bench.sqlite3")
+                self._seed(path, opts["users"])
+                stats = self._run(path, tuned, opts)
+
+            self.stdout.write(
+                f"{label:8} writes/s={stats['writes'] / opts['seconds']:9.1f} "
+                f"reads/s={stats['reads'] / opts['seconds']:9.1f} "
+                f"locked_errors={stats['locked']} "
+                f"p99_write_ms={stats['p99_write_ms']:.1f}"
+            )
+
+    # --------------------------
+    # helpers
+    # --------------------------
+    def _seed(self, path, users):
+        conn = sqlite3.connect(path)
+        conn.execute(
+            "CREATE TABLE accounts_user ("
+            "id INTEGER PRIMARY KEY, username TEXT UNIQUE, email TEXT, "
+            "password TEXT, profile_otp TEXT)"
+        )
+        conn.executemany(
+            "INSERT INTO accounts_user (id, username, email, password) VALUES (?, ?, ?, ?)",
+            [(i, f"user{i}", f"user{i}@example.com", "x" * 88) for i in range(1, users + 1)],
+        )
+        conn.commit()
+        conn.close()
+
+    def _connect(self, path, tuned):
+        if not tuned:
+            # what Django does without OPTIONS: 5s driver timeout, deferred BEGIN
+            return sqlite3.connect(path, timeout=5, isolation_level=None, check_same_thread=False)
+
+        conn = sqlite3.connect(
+            path,
+            timeout=SQLITE_BUSY_TIMEOUT_MS / 1000,
+            isolation_level=None,
+            check_same_thread=False,
+        )
+        for pragma in SQLITE_PRAGMAS:
+            conn.execute(pragma)
+        return conn
+
+    def _run(self, path, tuned, opts):
+        stop = time.monotonic() + opts["seconds"]
+        lock = threading.Lock()
+        stats = {"writes": 0, "reads": 0, "locked": 0}
+        write_latencies = []
+        begin = "BEGIN IMMEDIATE" if tuned else "BEGIN"
+
+        def writer():
+            conn = self._connect(path, tuned)
+            writes, locked, lat = 0, 0, []
+            while time.monotonic() < stop:
+                uid = random.randint(1, opts["users"])
+                started = time.perf_counter()
+                try:
+                    # same shape as user.save(): read the row, rewrite every column
+                    conn.execute(begin)
+                    row = conn.execute(
+                        "SELECT id, username, email, password FROM accounts_user WHERE id = ?", (uid,)
+                    ).fetchone()
+                    conn.execute(
+                        "UPDATE accounts_user SET username=?, email=?, password=?, profile_otp=? WHERE id=?",
+                        (row[1], row[2], row[3], f"{random.randint(0, 999999):06d}", uid),
+                    )
+                    conn.execute("COMMIT")
+                    writes += 1
+                    lat.append(time.perf_counter() - started)
+                except sqlite3.OperationalError:
+                    locked += 1
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+            conn.close()
+            with lock:
+                stats["writes"] += writes
+                stats["locked"] += locked
+                write_latencies.extend(lat)
+
+        def reader():
+            conn = self._connect(path, tuned)
+            reads = 0
+            while time.monotonic() < stop:
+                email = f"user{random.randint(1, opts['users'])}@example.com"
+                try:
+                    conn.execute("SELECT id FROM accounts_user WHERE email = ?", (email,)).fetchone()
+                    reads += 1
+                except sqlite3.OperationalError:
+                    pass
+            conn.close()
+            with lock:
+                stats["reads"] += reads
+
+        threads = [threading.Thread(target=writer) for _ in range(opts["writers"])]
+        threads += [threading.Thread(target=reader) for _ in range(opts["readers"])]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        write_latencies.sort()
+        if write_latencies:
+            stats["p99_write_ms"] = write_latencies[int(len(write_latencies) * 0.99) - 1] * 1000
+        else:
+            stats["p99_write_ms"] = 0.0
+        return stats
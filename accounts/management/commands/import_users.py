@@ -0,0 +1,60 @@
+# accounts/management/commands/import_users.py
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.bulk_import import assign_imported, detect_format, import_users, read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Create accounts in bulk from a CSV (header row) or NDJSON file with "
+        "username, email, password, first_name, last_name, phone. Passwords are "
+        "hashed across a process pool and rows written with bulk_create; existing "
+        "usernames / emails are skipped. --course enrolls every created account "
+        "through the assign_multiple job."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--format", choices=["csv", "ndjson"])
+        parser.add_argument("--course", help="course id to enroll the new accounts in")
+        parser.add_argument("--workers", type=int, help="hashing processes (default: USER_IMPORT_WORKERS / cores)")
+        parser.add_argument("--batch-size", type=int)
+        parser.add_argument("--dry-run", action="store_true", help="validate and check duplicates only")
+
+    def handle(self, *args, **opts):
+        fmt = opts["format"] or detect_format(opts["path"])
+        started = time.perf_counter()
+
+        def progress(report):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f"created {report.created}, skipped {report.skipped}, failed {report.failed} "
+                f"({report.created / elapsed:.0f} users/s)"
+            )
+
+        try:
+            with open(opts["path"], "rb") as f:
+                report = import_users(
+                    read_rows(f, fmt),
+                    batch_size=opts["batch_size"],
+                    workers=opts["workers"],
+                    dry_run=opts["dry_run"],
+                    progress=progress,
+                )
+        except FileNotFoundError:
+            raise CommandError(f"no such file: {opts['path']}")
+
+        for error in report.errors:
+            self.stdout.write(self.style.WARNING(f"line {error['line']}: {error['error']}"))
+
+        verb = "would create" if opts["dry_run"] else "created"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {report.created} users in {time.perf_counter() - started:.1f}s; "
+            f"{report.skipped} already existed, {report.failed} invalid"
+        ))
+
+        if opts["course"] and report.user_ids:
+            job = assign_imported(report.user_ids, opts["course"])
+            self.stdout.write(f"enrollment job {job['_id']} submitted")
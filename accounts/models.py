@@ -1,10 +1,34 @@
 # accounts/models.py
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
+from django.db.models import Value
+from django.db.models.functions import Lower
+
+
+class AccountManager(UserManager):
+    def with_email(self, email):
+        """
+        Case-insensitive email match that uses user_email_lower_idx (iexact
+        compiles to LIKE / UPPER() and scans the table).
+        """
+        return self.alias(email_lower=Lower("email")).filter(email_lower=Lower(Value(email)))
+
+    def with_emails(self, emails):
+        return self.alias(email_lower=Lower("email")).filter(
+            email_lower__in=[Lower(Value(e)) for e in emails]
+        )
+
 
 class User(AbstractUser):
     phone = models.CharField(max_length=20, null=True, blank=True)
-    profile_otp = models.CharField(max_length=10, null=True, blank=True)  # added for OTP
+    profile_otp = models.CharField(max_length=10, null=True, blank=True)  # legacy: OTPs live in accounts/otp.py now
+
+    objects = AccountManager()
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(Lower("email"), name="user_email_lower_idx"),
+        ]
 
     def __str__(self):
         return self.username
@@ -0,0 +1,69 @@
+# accounts/otp.py
+"""
+One-time codes for the password-reset flow, kept in Django's cache instead of
+User.profile_otp. Codes expire after OTP_TTL_SECONDS, allow OTP_MAX_ATTEMPTS
+wrong guesses and are consumed by the first successful verify.
+
+Only an HMAC of the code is stored. Verify-and-consume relies on
+cache.delete() returning True for exactly one caller (atomic on locmem and
+Redis), so two concurrent verifies of the same code can't both succeed.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.crypto import constant_time_compare, get_random_string, salted_hmac
+
+OTP_LENGTH = 6
+
+
+def _code_key(user_id):
+    return f"otp:{user_id}:code"
+
+
+def _attempts_key(user_id):
+    return f"otp:{user_id}:attempts"
+
+
+def _digest(user_id, code):
+    return salted_hmac("accounts.otp", f"{user_id}:{code}").hexdigest()
+
+
+def issue(user_id):
+    """
+    New code for user_id (replaces any pending one). Returns the plain code.
+    """
+    code = get_random_string(OTP_LENGTH, "0123456789")
+    ttl = settings.OTP_TTL_SECONDS
+    cache.set_many({
+        _code_key(user_id): _digest(user_id, code),
+        _attempts_key(user_id): 0,
+    }, timeout=ttl)
+    return code
+
+
+def verify(user_id, code):
+    """
+    True once for the right code; False when wrong, expired, already used or
+    after too many attempts (the code is then dropped).
+    """
+    try:
+        attempts = cache.incr(_attempts_key(user_id))
+    except ValueError:   # nothing issued, or expired
+        return False
+
+    if attempts > settings.OTP_MAX_ATTEMPTS:
+        revoke(user_id)
+        return False
+
+    stored = cache.get(_code_key(user_id))
+    if stored is None or not constant_time_compare(stored, _digest(user_id, code or "")):
+        return False
+
+    # consume: only the caller whose delete removed the key wins
+    if not cache.delete(_code_key(user_id)):
+        return False
+    cache.delete(_attempts_key(user_id))
+    return True
+
+
+def revoke(user_id):
+    cache.delete_many([_code_key(user_id), _attempts_key(user_id)])
@@ -6,7 +6,7 @@ from django.utils.crypto import get_random_string
 from django.contrib.auth import get_user_model
 from rest_framework.views import APIView
 from rest_framework.response import Response
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 
 from .forms import (
     ForgotPasswordForm,
@@ -95,3 +95,35 @@ def reset_password_form(request):
     else:
         form = ResetPasswordForm(initial={"token": token})
     return render(request, "accounts/reset_password.html", {"form": form})
+
+
+# --------------------------
+# Admin bulk import (runs as a background job)
+# --------------------------
+class UserImportView(APIView):
+    """
+    POST multipart `file` (.csv or .ndjson) and optional `course_id` to enroll
+    every created account. Returns the job; poll /api/jobs/<id>/.
+    """
+    permission_classes = [IsAdminUser]
+
+    def post(self, request):
+        upload = request.FILES.get("file")
+        if not upload:
+            return Response({"error": "file_required"}, status=400)
+
+        from courses.services.job_service import JobService
+        from .bulk_import import detect_format, save_upload
+
+        path = save_upload(upload)
+        job = JobService.submit(
+            "import_users",
+            items=[path],
+            payload={
+                "format": request.data.get("format") or detect_format(upload.name),
+                "course_id": request.data.get("course_id") or None,
+                "source": upload.name,
+            },
+            created_by=request.user.id,
+        )
+        return Response(JobService.public(job), status=202)
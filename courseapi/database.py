@@ -0,0 +1,102 @@
+# courseapi/database.py
+"""
+Relational DB configuration (Django ORM side: users, OTPs, notification templates).
+
+- persistent connections (CONN_MAX_AGE + health checks)
+- SQLite pragmas applied on every new connection (WAL, synchronous, busy_timeout)
+- optional read replica alias + router that sends ORM reads to it (except
+  accounts / auth, which are read right after they're written)
+"""
+import os
+
+from django.conf import settings
+
+
+# --------------------------
+# SQLite pragmas
+# --------------------------
+# WAL lets readers run while a writer holds the lock, NORMAL is safe with WAL,
+# busy_timeout makes concurrent writers wait instead of failing with "database is locked".
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+
+SQLITE_PRAGMAS = [
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-20000",   # ~20MB page cache per connection
+]
+
+
+def sqlite_options():
+    return {
+        "init_command": "; ".join(SQLITE_PRAGMAS),
+        # seconds the sqlite3 driver waits on a locked db (same budget as busy_timeout)
+        "timeout": SQLITE_BUSY_TIMEOUT_MS / 1000,
+        # take the write lock at BEGIN, so two writers never deadlock on lock upgrade
+        "transaction_mode": "IMMEDIATE",
+    }
+
+
+# --------------------------
+# DATABASES builder
+# --------------------------
+def build_databases(base_dir):
+    """
+    Env vars:
+    - DB_CONN_MAX_AGE        seconds to keep a connection open (0 = close per request)
+    - SQLITE_PATH            primary sqlite file (default <BASE_DIR>/db.sqlite3)
+    - SQLITE_REPLICA_PATH    read replica file (e.g. a litestream restore); enables "replica"
+    """
+    conn_max_age = int(os.environ.get("DB_CONN_MAX_AGE", 600))
+
+    default = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.environ.get("SQLITE_PATH", base_dir / "db.sqlite3"),
+        "CONN_MAX_AGE": conn_max_age,
+        "CONN_HEALTH_CHECKS": True,
+        "OPTIONS": sqlite_options(),
+    }
+    databases = {"default": default}
+
+    replica_path = os.environ.get("SQLITE_REPLICA_PATH")
+    if replica_path:
+        databases["replica"] = {
+            **default,
+            "NAME": replica_path,
+            "TEST": {"MIRROR": "default"},
+        }
+
+    return databases
+
+
+# --------------------------
+# Read replica router
+# --------------------------
+class ReadReplicaRouter:
+    """
+    Reads -> "replica" when it is configured, writes and migrations -> "default".
+
+    Users, OTPs and sessions always read the primary: register -> login, the
+    JWT user lookup right after signup and the password reset flow all read
+    rows written a moment earlier, which a lagging replica may not have yet.
+    """
+    replica_alias = "replica"
+    primary_apps = {"accounts", "auth", "sessions"}
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in self.primary_apps:
+            return "default"
+        if self.replica_alias in settings.DATABASES:
+            return self.replica_alias
+        return "default"
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == "default"
@@ -0,0 +1,204 @@
+# courseapi/events.py
+"""
+Per-user server-sent events (GET /api/events/, ASGI only).
+
+publish(user_id, type, data) is called from ordinary sync code (views, job
+threads). Subscribers are asyncio queues owned by the SSE responses of this
+process; delivery hops onto each subscriber's event loop with
+call_soon_threadsafe.
+
+EVENTS_BROKER = "local": only subscribers in the publishing process see the
+event (one worker, or a sticky user -> worker mapping).
+EVENTS_BROKER = "redis": publish goes to Redis pub/sub (EVENTS_REDIS_URL) and
+every process with subscribers runs one listener thread that hands messages to
+its local subscribers, so any worker can serve any user.
+
+Events published by `manage.py run_jobs` (jobs it picks up) only reach the
+web workers' streams through the redis broker; run_jobs warns when it's local.
+
+EventSource can't send an Authorization header, so browsers first POST
+/api/events/ticket/ (normal JWT auth) and open the stream with ?ticket=: a
+signed, EVENTS_TICKET_SECONDS-lived value that only the stream accepts, so no
+access token ends up in URLs / access logs.
+
+Events aren't stored: a client that reconnects re-reads /api/enrollments/my/.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import ImproperlyConfigured
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+CHANNEL_PREFIX = "courseapi:events:"
+TICKET_SALT = "courseapi.events.ticket"
+
+
+class Subscription:
+    def __init__(self, user_id):
+        self.user_id = str(user_id)
+        self.loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=settings.EVENTS_QUEUE_SIZE)
+
+    def push(self, event):
+        # runs on self.loop; a slow client loses its oldest events, not memory
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+
+# --------------------------
+# In-process fan-out
+# --------------------------
+_subscribers = {}
+_lock = threading.Lock()
+
+
+def subscribe(user_id):
+    subscription = Subscription(user_id)
+    with _lock:
+        _subscribers.setdefault(subscription.user_id, set()).add(subscription)
+    _broker().started()
+    return subscription
+
+
+def unsubscribe(subscription):
+    with _lock:
+        subs = _subscribers.get(subscription.user_id)
+        if subs is not None:
+            subs.discard(subscription)
+            if not subs:
+                del _subscribers[subscription.user_id]
+
+
+def deliver(user_id, event):
+    with _lock:
+        subs = list(_subscribers.get(str(user_id), ()))
+    for subscription in subs:
+        try:
+            subscription.loop.call_soon_threadsafe(subscription.push, event)
+        except RuntimeError:   # its loop is closed: the response is gone
+            unsubscribe(subscription)
+
+
+def subscriber_count():
+    with _lock:
+        return sum(len(subs) for subs in _subscribers.values())
+
+
+# --------------------------
+# Brokers
+# --------------------------
+class LocalBroker:
+    def publish(self, user_id, event):
+        deliver(user_id, event)
+
+    def started(self):
+        pass
+
+
+class RedisBroker:
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured("EVENTS_BROKER=redis needs the redis package")
+        self.client = redis.Redis.from_url(url)
+        self._listener = None
+        self._listener_lock = threading.Lock()
+
+    def publish(self, user_id, event):
+        self.client.publish(f"{CHANNEL_PREFIX}{user_id}", json.dumps(event, cls=DjangoJSONEncoder))
+
+    def started(self):
+        # first subscriber in this process: start listening
+        if self._listener is None:
+            with self._listener_lock:
+                if self._listener is None:
+                    self._listener = threading.Thread(target=self._listen, name="events-redis", daemon=True)
+                    self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(f"{CHANNEL_PREFIX}*")
+                for message in pubsub.listen():
+                    channel = message["channel"].decode()
+                    deliver(channel[len(CHANNEL_PREFIX):], json.loads(message["data"]))
+            except Exception:
+                logger.exception("redis event listener failed; reconnecting")
+                time.sleep(1)
+
+
+_broker_instance = None
+
+
+def _broker():
+    global _broker_instance
+    if _broker_instance is None:
+        if settings.EVENTS_BROKER == "redis":
+            _broker_instance = RedisBroker(settings.EVENTS_REDIS_URL)
+        else:
+            _broker_instance = LocalBroker()
+    return _broker_instance
+
+
+def publish(user_id, event_type, data):
+    """
+    Sends {"id", "type", "data"} to user_id's open streams. Never raises:
+    a push failure must not fail the write that triggered it.
+    """
+    event = {"id": str(time.time_ns()), "type": event_type, "data": data}
+    try:
+        _broker().publish(user_id, json.loads(json.dumps(event, cls=DjangoJSONEncoder)))
+    except Exception:
+        logger.exception("publishing %s for user %s failed", event_type, user_id)
+
+
+# --------------------------
+# Stream tickets
+# --------------------------
+def issue_ticket(user_id):
+    return signing.TimestampSigner(salt=TICKET_SALT).sign(str(user_id))
+
+
+def redeem_ticket(ticket):
+    """
+    User id (str) of a ticket younger than EVENTS_TICKET_SECONDS, else None.
+    """
+    try:
+        return signing.TimestampSigner(salt=TICKET_SALT).unsign(
+            ticket, max_age=settings.EVENTS_TICKET_SECONDS
+        )
+    except signing.BadSignature:   # SignatureExpired included
+        return None
+
+
+# --------------------------
+# SSE stream
+# --------------------------
+async def stream(subscription):
+    """
+    text/event-stream body: events as they arrive, a comment every
+    EVENTS_HEARTBEAT_SECONDS so proxies keep the connection open.
+    """
+    try:
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                event = await asyncio.wait_for(
+                    subscription.queue.get(), timeout=settings.EVENTS_HEARTBEAT_SECONDS
+                )
+            except asyncio.TimeoutError:
+                yield ": ping\n\n"
+                continue
+            yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event['data'])}\n\n"
+    finally:
+        unsubscribe(subscription)
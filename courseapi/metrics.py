@@ -0,0 +1,372 @@
+# courseapi/metrics.py
+"""
+Counters, histograms and gauges with Prometheus text exposition (/metrics).
+
+Single process: values live in memory. Several worker processes: set
+METRICS_DIR (one directory shared by the workers of a host, emptied on
+deploy). Each process then writes a snapshot to METRICS_DIR/<pid>.json every
+METRICS_FLUSH_SECONDS, and /metrics merges every file: counters and
+histograms are summed, gauges are summed over live processes only.
+"""
+import atexit
+import bisect
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self._flusher_pid = None
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def changed(self):
+        # first update in this process (also after a fork): start its flusher
+        if self._flusher_pid != os.getpid() and _metrics_dir() is not None:
+            with self.lock:
+                if self._flusher_pid != os.getpid():
+                    self._flusher_pid = os.getpid()
+                    threading.Thread(target=_flush_loop, name="metrics-flush", daemon=True).start()
+
+
+REGISTRY = _Registry()
+
+
+# --------------------------
+# Metric types
+# --------------------------
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.samples = {}
+        REGISTRY.register(self)
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {sorted(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with REGISTRY.lock:
+            self.samples[key] = self.samples.get(key, 0) + amount
+        REGISTRY.changed()
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with REGISTRY.lock:
+            self.samples[key] = value
+        REGISTRY.changed()
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with REGISTRY.lock:
+            self.samples[key] = self.samples.get(key, 0) + amount
+        REGISTRY.changed()
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with REGISTRY.lock:
+            # [per-bucket counts..., +Inf count, sum]
+            sample = self.samples.get(key)
+            if sample is None:
+                sample = self.samples[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            sample[index] += 1
+            sample[-1] += value
+        REGISTRY.changed()
+
+    def time(self, **labels):
+        return _Timer(self, labels)
+
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram, self.labels = histogram, labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+
+
+# --------------------------
+# Multi-process snapshots
+# --------------------------
+def _metrics_dir():
+    path = getattr(settings, "METRICS_DIR", None)
+    return Path(path) if path else None
+
+
+def _snapshot():
+    with REGISTRY.lock:
+        return {
+            name: [[list(key), value if not isinstance(value, list) else list(value)]
+                   for key, value in metric.samples.items()]
+            for name, metric in REGISTRY.metrics.items()
+        }
+
+
+def flush():
+    directory = _metrics_dir()
+    if directory is None:
+        return
+    directory.mkdir(parents=True, exist_ok=True)
+    target = directory / f"{os.getpid()}.json"
+    # own temp file per call: the flusher thread and a /metrics request may flush at once
+    with tempfile.NamedTemporaryFile("w", dir=directory, prefix=f"{os.getpid()}.", suffix=".tmp",
+                                     delete=False) as tmp:
+        tmp.write(json.dumps({"pid": os.getpid(), "samples": _snapshot()}))
+    try:
+        os.replace(tmp.name, target)   # readers never see a half-written file
+    except OSError:
+        os.unlink(tmp.name)
+        raise
+
+
+def _flush_loop():
+    while True:
+        time.sleep(settings.METRICS_FLUSH_SECONDS)
+        try:
+            flush()
+        except OSError:
+            pass
+
+
+atexit.register(flush)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _collect():
+    """
+    name -> {label values tuple: value}, merged over every process.
+    """
+    directory = _metrics_dir()
+    if directory is None:
+        return {name: {tuple(k): v for k, v in samples} for name, samples in _snapshot().items()}
+
+    flush()
+    merged = {name: {} for name in REGISTRY.metrics}
+    for path in directory.glob("*.json"):
+        try:
+            doc = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        alive = _alive(doc["pid"])
+        for name, samples in doc["samples"].items():
+            metric = REGISTRY.metrics.get(name)
+            if metric is None or (metric.kind == "gauge" and not alive):
+                continue
+            target = merged[name]
+            for key, value in samples:
+                key = tuple(key)
+                if isinstance(value, list):
+                    current = target.get(key) or [0] * len(value)
+                    target[key] = [a + b for a, b in zip(current, value)]
+                else:
+                    target[key] = target.get(key, 0) + value
+    return merged
+
+
+# --------------------------
+# Text exposition
+# --------------------------
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value):
+    if isinstance(value, float):
+        return repr(value) if value == value and abs(value) != float("inf") else str(value)
+    return str(value)
+
+
+def render():
+    lines = []
+    for name, samples in sorted(_collect().items()):
+        metric = REGISTRY.metrics[name]
+        lines.append(f"# HELP {name} {metric.documentation}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for key, value in sorted(samples.items()):
+            if metric.kind != "histogram":
+                lines.append(f"{name}{_labels(metric.labelnames, key)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (float("inf"),), value[:-1]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else _number(float(bound))
+                bucket_labels = _labels(metric.labelnames, key, 'le="' + le + '"')
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{_labels(metric.labelnames, key)} {_number(float(value[-1]))}")
+            lines.append(f"{name}_count{_labels(metric.labelnames, key)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+# ======================================================================
+# Application metrics
+# ======================================================================
+API_LATENCY = Histogram(
+    "courseapi_request_duration_seconds",
+    "API view latency by viewset and action.",
+    ["view", "action", "method", "status"],
+)
+ENROLLMENTS = Counter(
+    "courseapi_enrollments_total",
+    "Enrollments written, by source (self, assign, bulk).",
+    ["source"],
+)
+ENROLLMENT_ERRORS = Counter(
+    "courseapi_enrollment_errors_total",
+    "Enrollment attempts that failed, by source and error.",
+    ["source", "error"],
+)
+NOTIFICATIONS = Counter(
+    "courseapi_notifications_total",
+    "NotificationService.send calls by event and result (sent, failed, no_template).",
+    ["event", "result"],
+)
+NOTIFICATION_LATENCY = Histogram(
+    "courseapi_notification_send_seconds",
+    "Time spent rendering + sending one notification email.",
+    ["event"],
+)
+JOB_ITEMS = Counter(
+    "courseapi_job_items_total",
+    "Background job items handled, by job type and result.",
+    ["type", "result"],
+)
+MONGO_CONNECTIONS = Gauge(
+    "courseapi_mongo_pool_connections",
+    "Open connections in the Mongo pool.",
+    ["address"],
+)
+MONGO_CHECKED_OUT = Gauge(
+    "courseapi_mongo_pool_checked_out",
+    "Mongo connections currently checked out of the pool.",
+    ["address"],
+)
+MONGO_CHECKOUT_FAILURES = Counter(
+    "courseapi_mongo_pool_checkout_failures_total",
+    "Failed Mongo connection checkouts (pool exhausted, timeout, ...).",
+    ["address", "reason"],
+)
+
+
+class ViewMetricsMixin:
+    """
+    DRF views/viewsets: observes API_LATENCY for every dispatch.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        started = time.perf_counter()
+        response = super().dispatch(request, *args, **kwargs)
+        API_LATENCY.observe(
+            time.perf_counter() - started,
+            view=type(self).__name__,
+            action=getattr(self, "action", None) or request.method.lower(),
+            method=request.method,
+            status=f"{response.status_code // 100}xx",
+        )
+        return response
+
+
+def _address(event):
+    host, port = event.address
+    return f"{host}:{port}"
+
+
+def mongo_pool_listener():
+    """
+    pymongo ConnectionPoolListener feeding the MONGO_* metrics.
+    """
+    from pymongo import monitoring
+
+    class MongoPoolListener(monitoring.ConnectionPoolListener):
+        def pool_created(self, event):
+            pass
+
+        def pool_ready(self, event):
+            pass
+
+        def pool_closed(self, event):
+            pass
+
+        def connection_ready(self, event):
+            pass
+
+        def pool_cleared(self, event):
+            pass
+
+        def connection_check_out_started(self, event):
+            pass
+
+
+        def connection_created(self, event):
+            MONGO_CONNECTIONS.inc(address=_address(event))
+
+        def connection_closed(self, event):
+            MONGO_CONNECTIONS.dec(address=_address(event))
+
+        def connection_checked_out(self, event):
+            MONGO_CHECKED_OUT.inc(address=_address(event))
+
+        def connection_checked_in(self, event):
+            MONGO_CHECKED_OUT.dec(address=_address(event))
+
+        def connection_check_out_failed(self, event):
+            MONGO_CHECKOUT_FAILURES.inc(address=_address(event), reason=str(event.reason))
+
+    return MongoPoolListener()
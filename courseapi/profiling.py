@@ -0,0 +1,171 @@
+# courseapi/profiling.py
+"""
+Opt-in cProfile capture per request.
+
+A request is profiled when an admin sends `X-Profile: 1` (session staff user
+or a staff JWT), or when it falls in PROFILING_SAMPLE_RATE. Each capture is
+written to PROFILING_DIR as <id>.pstats plus <id>.json (request metadata and
+the top functions); the newest PROFILING_KEEP are kept. Admins list and
+download them under /admin-api/profiles/.
+"""
+import cProfile
+import io
+import json
+import logging
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_ID = re.compile(r"^[0-9A-Za-z-]+$")
+TOP_FUNCTIONS = 20
+
+# cProfile can't run twice at once in one process (3.12+ refuses outright);
+# concurrent candidates are simply not profiled
+_active = threading.Lock()
+
+
+def profiles_dir():
+    path = Path(settings.PROFILING_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _is_admin(request):
+    user = getattr(request, "user", None)
+    if user is not None and user.is_authenticated:
+        return user.is_staff
+    try:
+        from rest_framework_simplejwt.authentication import JWTAuthentication
+        result = JWTAuthentication().authenticate(request)
+    except Exception:   # bad / expired token: just don't profile
+        return False
+    return bool(result and result[0].is_staff)
+
+
+class ProfilingMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        reason = self._reason(request)
+        if reason is None or not _active.acquire(blocking=False):
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profiler.disable()
+        finally:
+            _active.release()
+        duration_ms = (time.perf_counter() - started) * 1000
+
+        try:
+            profile_id = save_profile(profiler, request, response, reason, duration_ms)
+            response["X-Profile-Id"] = profile_id
+        except Exception:
+            logger.exception("storing profile for %s failed", request.path)
+        return response
+
+    @staticmethod
+    def _reason(request):
+        if request.headers.get(settings.PROFILING_HEADER, "") in ("1", "true") and _is_admin(request):
+            return "header"
+        rate = settings.PROFILING_SAMPLE_RATE
+        if rate and random.random() < rate:
+            return "sample"
+        return None
+
+
+# --------------------------
+# Storage
+# --------------------------
+def save_profile(profiler, request, response, reason, duration_ms):
+    now = datetime.utcnow()
+    profile_id = f"{now:%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+    directory = profiles_dir()
+
+    profiler.dump_stats(directory / f"{profile_id}.pstats")
+
+    match = getattr(request, "resolver_match", None)
+    user = getattr(request, "user", None)
+    meta = {
+        "id": profile_id,
+        "created_at": now.isoformat(),
+        "reason": reason,
+        "method": request.method,
+        "path": request.path,
+        "query": request.META.get("QUERY_STRING", ""),
+        "view": match.view_name if match else None,
+        "status": response.status_code,
+        "duration_ms": round(duration_ms, 1),
+        "user": user.username if user is not None and user.is_authenticated else None,
+        "top": top_functions(profiler),
+    }
+    (directory / f"{profile_id}.json").write_text(json.dumps(meta))
+
+    _prune(directory)
+    return profile_id
+
+
+def top_functions(profiler, limit=TOP_FUNCTIONS):
+    stats = pstats.Stats(profiler)
+    rows = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+    return [
+        {
+            "function": f"{filename}:{line}({name})",
+            "calls": calls,
+            "tottime_ms": round(tottime * 1000, 2),
+            "cumtime_ms": round(cumtime * 1000, 2),
+        }
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in rows
+    ]
+
+
+def _prune(directory):
+    metas = sorted(directory.glob("*.json"))
+    for meta in metas[:-settings.PROFILING_KEEP]:
+        meta.unlink(missing_ok=True)
+        meta.with_suffix(".pstats").unlink(missing_ok=True)
+
+
+def list_profiles():
+    profiles = []
+    for meta in sorted(profiles_dir().glob("*.json"), reverse=True):
+        doc = json.loads(meta.read_text())
+        doc.pop("top", None)
+        profiles.append(doc)
+    return profiles
+
+
+def profile_path(profile_id, suffix):
+    if not PROFILE_ID.match(profile_id or ""):
+        return None
+    path = profiles_dir() / f"{profile_id}{suffix}"
+    return path if path.exists() else None
+
+
+# ?sort= values for render_text (pstats raises on anything else)
+SORT_KEYS = frozenset(pstats.Stats.sort_arg_dict_default)
+
+
+def render_text(profile_id, sort="cumulative", limit=60):
+    """
+    Printed stats; sort must be one of SORT_KEYS and the .pstats file must exist.
+    """
+    out = io.StringIO()
+    stats = pstats.Stats(str(profile_path(profile_id, ".pstats")), stream=out)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
@@ -4,6 +4,8 @@ from pathlib import Path
 import os
 from datetime import timedelta
 
+from courseapi.database import build_databases
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 SECRET_KEY = 'django-insecure-+y4nz)wp!s562#93mb5$$tr6oqb(i1&4)_-rw(+i68v^nttj8x'
@@ -34,6 +36,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'courses.middleware.ReadPreferenceMiddleware',
+    'courseapi.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'courseapi.urls'
@@ -55,12 +59,41 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'courseapi.wsgi.application'
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# persistent connections, WAL pragmas and optional read replica -> courseapi/database.py
+DATABASES = build_databases(BASE_DIR)
+DATABASE_ROUTERS = ['courseapi.database.ReadReplicaRouter']
+
+# ------------------------
+# Cache (catalog snapshots, OTPs). Set REDIS_URL (or CACHE_DIR on a single
+# host) to share it between workers - locmem is per process.
+# ------------------------
+if os.environ.get("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.environ["REDIS_URL"],
+        }
     }
-}
+elif os.environ.get("CACHE_DIR"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ["CACHE_DIR"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# seconds a pre-rendered catalog page lives (enrollers counts can lag this much)
+CATALOG_SNAPSHOT_TTL = 300
+
+# password-reset OTPs (accounts/otp.py): lifetime and wrong guesses allowed per code
+OTP_TTL_SECONDS = 600
+OTP_MAX_ATTEMPTS = 5
 
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',},
@@ -84,6 +117,80 @@ REST_FRAMEWORK = {
     "PAGE_SIZE": 5,
 }
 
+# /api/batch/: max sub-requests per call, threads used when "parallel": true
+BATCH_MAX_REQUESTS = 20
+BATCH_MAX_WORKERS = 4
+
+# background jobs (assign-multiple, CSV cohorts): worker threads per process, users per chunk
+JOB_WORKERS = 2
+JOB_CHUNK_SIZE = 500
+# a running job without a heartbeat for this long is taken over by another worker
+JOB_STALE_SECONDS = 30 * 60
+
+# learner progress events: buffered per (user, course) and bulk-written every N seconds
+PROGRESS_FLUSH_SECONDS = 5
+PROGRESS_FLUSH_MAX_KEYS = 5000
+PROGRESS_MAX_EVENTS = 500
+PROGRESS_CONTENT_CACHE_SECONDS = 300
+
+# per-user enrolled-course sets (MembershipService); enroll/assign drop them.
+# Shared cache (REDIS_URL / CACHE_DIR): kept MEMBERSHIP_CACHE_SECONDS. Per-process
+# cache (locmem): only MEMBERSHIP_LOCAL_CACHE_SECONDS, since run_jobs enrolls users
+# from its own process and its invalidations don't reach the web workers
+MEMBERSHIP_CACHE_SECONDS = 600
+MEMBERSHIP_LOCAL_CACHE_SECONDS = 5
+
+# popular / trending rails: K per segment x category, rebuilt in memory every N seconds
+RANKINGS_TOP_K = 20
+RANKINGS_REFRESH_SECONDS = 300
+RANKINGS_TRENDING_DAYS = 7
+
+# compiled notification templates kept per process (also reloaded on template save)
+NOTIFICATION_TEMPLATE_CACHE_SECONDS = 300
+
+# worker start-up: run courseapi.warmup in a background thread from wsgi/asgi;
+# /ready/ answers 503 until it finishes
+WARMUP_ON_START = os.environ.get("WARMUP_ON_START", "1") == "1"
+
+# per-request cProfile capture (courseapi/profiling.py): admins send the header,
+# PROFILING_SAMPLE_RATE (0..1) profiles that fraction of all requests
+PROFILING_HEADER = "X-Profile"
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", 0))
+PROFILING_DIR = os.environ.get("PROFILING_DIR", os.path.join(BASE_DIR, "profiles"))
+PROFILING_KEEP = 200
+
+# resumable video uploads (courses/services/upload_service.py): chunk size the
+# server asks for, largest file accepted, hours an unfinished upload is kept;
+# dirs are under MEDIA_ROOT (keep them on one filesystem: finalize renames)
+UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+UPLOAD_MAX_BYTES = 20 * 1024 * 1024 * 1024
+UPLOAD_EXPIRE_HOURS = 24
+UPLOAD_TMP_DIR = "uploads/tmp"
+UPLOAD_DEST_DIR = "videos"
+
+# bulk user import (accounts/bulk_import.py): hashing processes (0 = one per
+# core), rows per bulk_create, private dir for uploads waiting for their job
+USER_IMPORT_WORKERS = int(os.environ.get("USER_IMPORT_WORKERS", 0))
+USER_IMPORT_BATCH_SIZE = 1000
+USER_IMPORT_DIR = os.environ.get("USER_IMPORT_DIR", os.path.join(BASE_DIR, "imports"))
+
+# server-sent events (courseapi/events.py): "local" delivers within one process,
+# "redis" fans out through Redis pub/sub to every worker. Use redis whenever
+# `manage.py run_jobs` runs: with "local" the enrollment events of the jobs it
+# processes are dropped (it warns at start)
+EVENTS_BROKER = os.environ.get("EVENTS_BROKER", "local")
+EVENTS_REDIS_URL = os.environ.get("EVENTS_REDIS_URL", os.environ.get("REDIS_URL", ""))
+EVENTS_HEARTBEAT_SECONDS = 15
+EVENTS_QUEUE_SIZE = 100
+# lifetime of the ?ticket= a browser opens the stream with (POST /api/events/ticket/)
+EVENTS_TICKET_SECONDS = 30
+
+# /metrics: METRICS_DIR shares counters between worker processes (empty it on
+# deploy). Staff users only, or a scraper sending "Authorization: Bearer <METRICS_TOKEN>"
+METRICS_DIR = os.environ.get("METRICS_DIR")
+METRICS_FLUSH_SECONDS = 5
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN")
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(hours=3),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
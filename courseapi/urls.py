@@ -2,9 +2,19 @@ from django.contrib import admin
 from django.urls import path, include
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
+from accounts.views import UserImportView
+from courseapi.views import event_stream, event_ticket, metrics_view, profile_detail, profile_list, ready
+
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("ready/", ready, name="ready"),
+    path("metrics", metrics_view, name="metrics"),
+    path("admin-api/profiles/", profile_list, name="profile-list"),
+    path("admin-api/profiles/<str:profile_id>/", profile_detail, name="profile-detail"),
+    path("admin-api/users/import/", UserImportView.as_view(), name="user-import"),
 
+    path("api/events/", event_stream, name="events"),
+    path("api/events/ticket/", event_ticket, name="events-ticket"),
     path("api/", include("courses.urls")),
     path("api/auth/", include("accounts.urls")),      # API URLS
     path("auth/", include("accounts.frontend_urls")), # HTML FORM URLS
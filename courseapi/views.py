@@ -0,0 +1,149 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from courseapi import events, metrics, profiling, warmup
+
+
+def ready(request):
+    """
+    Readiness probe: 200 once warm-up finished, 503 before that.
+    Also starts warm-up if the wsgi/asgi hook didn't (e.g. WARMUP_ON_START=0).
+    """
+    warmup.start()
+    return JsonResponse(warmup.status(), status=200 if warmup.is_ready() else 503)
+
+
+def _metrics_allowed(request):
+    """
+    "Authorization: Bearer <METRICS_TOKEN>" (the scraper), or a staff user
+    (admin session or JWT access token).
+    """
+    from rest_framework.exceptions import AuthenticationFailed
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+
+    token = settings.METRICS_TOKEN
+    if token and constant_time_compare(request.headers.get("Authorization", ""), f"Bearer {token}"):
+        return True
+    if request.user.is_staff:
+        return True
+    try:
+        found = JWTAuthentication().authenticate(request)
+    except AuthenticationFailed:   # InvalidToken included
+        return False
+    return found is not None and found[0].is_staff
+
+
+def metrics_view(request):
+    """
+    Prometheus text exposition, merged over every worker process.
+    """
+    if not _metrics_allowed(request):
+        return HttpResponse(status=401)
+    return HttpResponse(metrics.render(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# --------------------------
+# Stored request profiles (courseapi/profiling.py)
+# --------------------------
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def profile_list(request):
+    return Response({"results": profiling.list_profiles()})
+
+
+@api_view(["GET"])
+@permission_classes([IsAdminUser])
+def profile_detail(request, profile_id):
+    """
+    ?as=pstats (default: the file, for snakeviz / pstats), ?as=text (printed
+    stats), ?as=json (metadata + top functions). Not ?format=: DRF owns that.
+    """
+    fmt = request.GET.get("as", "pstats")
+    if profiling.profile_path(profile_id, ".json") is None:
+        return Response({"detail": "Profile not found"}, status=404)
+
+    if fmt == "json":
+        return Response(json.loads(profiling.profile_path(profile_id, ".json").read_text()))
+
+    # the metadata can outlive its .pstats file (pruned / deleted by hand)
+    path = profiling.profile_path(profile_id, ".pstats")
+    if path is None:
+        return Response({"detail": "Profile data not found"}, status=404)
+
+    if fmt == "text":
+        sort = request.GET.get("sort", "cumulative")
+        if sort not in profiling.SORT_KEYS:
+            return Response(
+                {"detail": f"sort must be one of {', '.join(sorted(profiling.SORT_KEYS))}"},
+                status=400,
+            )
+        text = profiling.render_text(profile_id, sort=sort)
+        return HttpResponse(text, content_type="text/plain; charset=utf-8")
+
+    return FileResponse(path.open("rb"), as_attachment=True, filename=path.name)
+
+
+# --------------------------
+# Server-sent events (courseapi/events.py)
+# --------------------------
+def _stream_user(request):
+    """
+    User from "Authorization: Bearer <access>" or ?ticket=<stream ticket>
+    (EventSource can't send headers), else None.
+    """
+    from django.contrib.auth import get_user_model
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+    auth = JWTAuthentication()
+    header = auth.get_header(request)
+    if header:
+        try:
+            raw = auth.get_raw_token(header)
+            return auth.get_user(auth.get_validated_token(raw)) if raw else None
+        except (InvalidToken, TokenError):
+            return None
+
+    user_id = events.redeem_ticket(request.GET.get("ticket", ""))
+    if user_id is None:
+        return None
+    return get_user_model().objects.filter(pk=user_id).first()
+
+
+@api_view(["POST"])
+def event_ticket(request):
+    """
+    POST /api/events/ticket/ -> {"ticket", "expires_in"}: open the stream with
+    /api/events/?ticket=<ticket> within expires_in seconds.
+    """
+    return Response({
+        "ticket": events.issue_ticket(request.user.id),
+        "expires_in": settings.EVENTS_TICKET_SECONDS,
+    })
+
+
+async def event_stream(request):
+    """
+    GET /api/events/: text/event-stream of the caller's enrollment and
+    notification events. Needs the ASGI app (uvicorn / daphne): a sync worker
+    would hold a thread per open stream.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"error": "events need the ASGI server"}, status=501)
+
+    user = await sync_to_async(_stream_user)(request)
+    if user is None or not user.is_active:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+
+    response = StreamingHttpResponse(events.stream(events.subscribe(user.id)), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"   # nginx: don't buffer the stream
+    return response
@@ -0,0 +1,169 @@
+# courseapi/warmup.py
+"""
+Worker start-up warm-up.
+
+wsgi.py / asgi.py call start() once per process; it runs the steps below in a
+background thread so the first real requests don't pay for connecting the
+Mongo pool, importing the JWT machinery, compiling notification templates or
+building the catalog caches. The ORM database is only checked: its
+connections are per thread, so request threads open their own. /ready/ reports 503 until every step succeeded.
+
+With gunicorn --preload the app is imported before forking; call start()
+from a post_fork hook instead so each worker warms its own connections.
+"""
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+RETRY_SECONDS = 5
+PING_TIMEOUT_SECONDS = 5
+
+
+# --------------------------
+# Steps
+# --------------------------
+def _mongo():
+    import pymongo
+    from courses.utils import client
+    # opens the pool (minPoolSize sockets); don't sit on the 30s selection timeout
+    with pymongo.timeout(PING_TIMEOUT_SECONDS):
+        client.admin.command("ping")
+
+
+def _database():
+    # reachability only: Django connections are per thread, so a connection
+    # opened here is no use to request threads (_run closes it again)
+    from django.db import connections
+    for alias in connections:
+        with connections[alias].cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+
+def _auth():
+    # imports simplejwt, resolves its settings and token classes
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.settings import api_settings
+    JWTAuthentication()
+    api_settings.AUTH_TOKEN_CLASSES  # noqa: B018
+
+
+def _urls():
+    # importing the URLconf imports every view, serializer and service module
+    from django.urls import get_resolver
+    get_resolver().url_patterns  # noqa: B018
+
+
+def _templates():
+    from notifications.services import NotificationService
+    NotificationService.load_templates()
+
+
+def _catalog():
+    from courses.services.ranking_service import RankingService
+    from courses.snapshots import refresh_all_snapshots
+    refresh_all_snapshots()
+    RankingService.refresh()
+
+
+# (name, step, step it needs) - a step is skipped while its dependency fails
+STEPS = [
+    ("mongo", _mongo, None),
+    ("database", _database, None),
+    ("auth", _auth, None),
+    ("urls", _urls, None),
+    ("templates", _templates, "database"),
+    ("catalog", _catalog, "mongo"),
+]
+
+
+# --------------------------
+# State
+# --------------------------
+_lock = threading.Lock()
+_started = False
+_state = {
+    "ready": False,
+    "started_at": None,
+    "finished_at": None,
+    "steps": {},
+}
+
+
+def warm_up(steps=None):
+    """
+    Runs the given (default: all) steps once, recording ms + error per step.
+    Returns the names of the steps that failed.
+    """
+    failed = []
+    for name, step, needs in STEPS:
+        if steps is not None and name not in steps:
+            continue
+        t0 = time.perf_counter()
+        error = None
+        try:
+            if needs in failed:
+                raise RuntimeError(f"skipped: {needs} not ready")
+            step()
+        except Exception as exc:
+            logger.warning("warm-up step %s failed: %s", name, exc)
+            error = str(exc)
+            failed.append(name)
+        _state["steps"][name] = {
+            "ms": round((time.perf_counter() - t0) * 1000, 1),
+            "ok": error is None,
+            "error": error,
+        }
+    return failed
+
+
+def _run():
+    from django.db import connections
+
+    _state["started_at"] = time.time()
+    try:
+        failed = warm_up()
+        # e.g. Mongo not reachable yet during a rollout: keep retrying, stay not-ready
+        while failed:
+            time.sleep(RETRY_SECONDS)
+            failed = warm_up(failed)
+    finally:
+        # the database / templates steps opened this thread's own connections
+        connections.close_all()
+    _state["finished_at"] = time.time()
+    _state["ready"] = True
+    logger.info("warm-up done in %.0f ms", (_state["finished_at"] - _state["started_at"]) * 1000)
+
+
+def start():
+    """
+    Starts the warm-up thread once per process. Safe to call repeatedly.
+    """
+    global _started
+    if _started:
+        return
+    with _lock:
+        if _started:
+            return
+        _started = True
+    threading.Thread(target=_run, name="warmup", daemon=True).start()
+
+
+def is_ready():
+    return _state["ready"]
+
+
+def status():
+    return {
+        "ready": _state["ready"],
+        "started": _started,
+        "steps": dict(_state["steps"]),
+    }
+
+
+def start_if_enabled():
+    if getattr(settings, "WARMUP_ON_START", True):
+        start()
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'courseapi.settings')
 
 application = get_wsgi_application()
+
+# pre-connect pools / load templates / build catalog caches (see /ready/)
+from courseapi.warmup import start_if_enabled  # noqa: E402
+
+start_if_enabled()
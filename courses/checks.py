@@ -0,0 +1,19 @@
+# courses/checks.py
+from django.conf import settings
+from django.core.checks import Warning, register
+
+
+@register(deploy=True)
+def membership_cache_check(app_configs, **kwargs):
+    # not at import: courses.utils (the Mongo client) loads with the URLconf
+    from courses.services.membership_service import shared_cache
+
+    if settings.MEMBERSHIP_CACHE_SECONDS and not shared_cache():
+        return [Warning(
+            "Enrolled-course sets are cached for MEMBERSHIP_LOCAL_CACHE_SECONDS only: "
+            "the default cache is per process.",
+            hint="Set REDIS_URL (or CACHE_DIR) so MembershipService can keep them "
+                 "and run_jobs' enrollments invalidate every worker.",
+            id="courses.W001",
+        )]
+    return []
@@ -0,0 +1,91 @@
+# courses/management/commands/bench_msgpack.py
+import gzip
+import time
+from datetime import datetime
+
+from bson import ObjectId
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import json
+
+from courses import renderers
+from courses.utils import catalog, courses_collection, get_courses
+
+
+class Command(BaseCommand):
+    help = (
+        "Payload size (raw and gzip) and encode / decode time of catalog pages, "
+        "JSON (DRF JSONRenderer + json.loads) vs MessagePack. Reads real pages "
+        "from Mongo: the API's pages (ObjectIds already strings) and the raw "
+        "documents (native ObjectId / datetime)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--pages", type=int, default=20)
+        parser.add_argument("--limit", type=int, default=10, help="courses per page")
+        parser.add_argument("--rounds", type=int, default=200)
+
+    def handle(self, *args, **opts):
+        if renderers.msgpack is None:
+            raise CommandError("msgpack is not installed")
+
+        api_pages, raw_pages = [], []
+        for page in range(1, opts["pages"] + 1):
+            docs, total = get_courses(page=page, limit=opts["limit"])
+            if not docs:
+                break
+            api_pages.append({"total": total, "page": page, "limit": opts["limit"], "results": docs})
+            raw_pages.append(list(
+                catalog(courses_collection).find().sort("_id", 1)
+                .skip((page - 1) * opts["limit"]).limit(opts["limit"])
+            ))
+        if not api_pages:
+            raise CommandError("no courses in this database")
+        self.stdout.write(f"{len(api_pages)} pages of up to {opts['limit']} courses, {opts['rounds']} rounds")
+
+        json_renderer = JSONRenderer()
+        self._report("api page, JSON", api_pages, json_renderer.render, json.loads, opts["rounds"])
+        self._report("api page, msgpack", api_pages, renderers.packb, renderers.unpackb, opts["rounds"])
+        # raw docs: JSON can't carry ObjectId / datetime, so it pays for str() first
+        self._report(
+            "raw docs, JSON",
+            raw_pages,
+            lambda page: json_renderer.render(_stringify(page)),
+            json.loads,
+            opts["rounds"],
+        )
+        self._report("raw docs, msgpack", raw_pages, renderers.packb, renderers.unpackb, opts["rounds"])
+
+    def _report(self, label, pages, encode, decode, rounds):
+        encoded = [encode(page) for page in pages]
+        raw = sum(len(b) for b in encoded)
+        gz = sum(len(gzip.compress(b, compresslevel=6)) for b in encoded)
+
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for page in pages:
+                encode(page)
+        encode_us = (time.perf_counter() - started) / (rounds * len(pages)) * 1e6
+
+        started = time.perf_counter()
+        for _ in range(rounds):
+            for body in encoded:
+                decode(body)
+        decode_us = (time.perf_counter() - started) / (rounds * len(pages)) * 1e6
+
+        self.stdout.write(
+            f"{label:<20} bytes/page={raw / len(pages):8.0f} gzip={gz / len(pages):7.0f} "
+            f"encode={encode_us:7.1f}us decode={decode_us:7.1f}us"
+        )
+
+
+def _stringify(value):
+    if isinstance(value, dict):
+        return {k: _stringify(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_stringify(v) for v in value]
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
@@ -0,0 +1,98 @@
+# courses/management/commands/bench_validation.py
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from courses.serializers import ContentSerializer, CourseSerializer, TopicSerializer
+from courses.validation import compiled
+
+
+
+def sample_course(i):
+    return {
+        "course_title": f"  Kubernetes for teams {i} ",
+        "course_description": "Deploy, scale and operate containers.",
+        "segment": random.choice(["b2b", "b2c", ""]),
+        "course_type": random.choice(["self_paced", "live", None]),
+        "delivery_mode": "online",
+        "is_locked": bool(i % 2),
+        "course_start_date": "2025-01-01",
+        "metadata": {
+            "category": {"name": "Cloud", "sub_category": {"name": "DevOps"}},
+            "tags": ["k8s", "docker", "helm"],
+            "created_by": "admin",
+        },
+        "module_ids": [f"{i:024x}", f"{i + 1:024x}"],
+        "image_url": "/media/images/k8s.png",
+        "enrollers": i,
+        "progress": 0.5,
+        "display_price": {"currency": "INR", "amount": 4999},
+    }
+
+
+def sample_content(i):
+    return {
+        "topic_id": f"{i:024x}",
+        "versions": [
+            {
+                "versionid": f"v{v}",
+                "type": "video",
+                "title": f"Lecture {i}.{v}",
+                "data": "x" * 200,
+                "url": "/media/videos/kubernetes.mp4",
+                "metadata": {"tags": ["lecture"]},
+            }
+            for v in range(3)
+        ],
+        "metadata": {"category": {"name": "Cloud"}},
+    }
+
+
+def sample_topic(i):
+    return {
+        "module_id": f"{i:024x}",
+        "title": f"Pods and services {i}",
+        "description": "",
+        "media_content_ids": [
+            {"content_ids": [{"content_id": f"{i:024x}", "format": "mp4"}, {"content_id": "c2", "format": "pdf"}]}
+        ],
+        "question_bank_configs": ["6746b8a650e9e527a828b4e8"],
+        "metadata": {"level": "beginner"},
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmarks the compiled validators against DRF on N-document batches "
+        "(parity with DRF is covered by courses.tests.CompiledValidatorParityTests)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=10000)
+
+    def handle(self, *args, **opts):
+        cases = [
+            ("CourseSerializer", CourseSerializer, sample_course),
+            ("ContentSerializer", ContentSerializer, sample_content),
+            ("TopicSerializer", TopicSerializer, sample_topic),
+        ]
+
+        for label, cls, make in cases:
+            docs = [make(i) for i in range(opts["count"])]
+            fast = compiled(cls)
+
+            started = time.perf_counter()
+            for doc in docs:
+                cls(data=doc).is_valid()
+            drf_seconds = time.perf_counter() - started
+
+            started = time.perf_counter()
+            for doc in docs:
+                fast.run(doc)
+            fast_seconds = time.perf_counter() - started
+
+            self.stdout.write(
+                f"{label:18} n={len(docs)} drf={drf_seconds:.3f}s "
+                f"compiled={fast_seconds:.3f}s speedup={drf_seconds / fast_seconds:.1f}x"
+            )
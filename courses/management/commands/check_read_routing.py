@@ -0,0 +1,37 @@
+# courses/management/commands/check_read_routing.py
+from django.core.management.base import BaseCommand, CommandError
+
+from courses.utils import catalog, client, courses_collection, read_primary
+
+
+class Command(BaseCommand):
+    help = (
+        "Shows which replica-set member serves catalog reads vs primary reads. "
+        "Local three-member set for trying it: start three mongod with "
+        "--replSet rs0 on ports 27017-27019, rs.initiate() them, and run with "
+        "MONGO_URI='mongodb://localhost:27017,localhost:27018,localhost:27019/?replicaSet=rs0'."
+    )
+
+    def handle(self, *args, **opts):
+        client.admin.command("ping")
+        if client.primary is None:
+            raise CommandError("no replica set primary found (standalone mongod?)")
+
+        self.stdout.write(f"primary:     {client.primary}")
+        self.stdout.write(f"secondaries: {sorted(client.secondaries)}")
+
+        cursor = catalog(courses_collection).find({}, {"_id": 1}).limit(1)
+        list(cursor)
+        self.stdout.write(f"catalog read        -> {cursor.address}")
+
+        token = read_primary.set(True)
+        try:
+            cursor = catalog(courses_collection).find({}, {"_id": 1}).limit(1)
+            list(cursor)
+            self.stdout.write(f"read-your-writes    -> {cursor.address}")
+        finally:
+            read_primary.reset(token)
+
+        cursor = courses_collection.find({}, {"_id": 1}).limit(1)
+        list(cursor)
+        self.stdout.write(f"enrollment/primary  -> {cursor.address}")
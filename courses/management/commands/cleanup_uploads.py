@@ -0,0 +1,15 @@
+# courses/management/commands/cleanup_uploads.py
+from django.core.management.base import BaseCommand
+
+from courses.services.upload_service import UploadService
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete resumable uploads that were never finalized and are past "
+        "UPLOAD_EXPIRE_HOURS, with their partial files. Run from cron."
+    )
+
+    def handle(self, *args, **opts):
+        removed = UploadService.expire()
+        self.stdout.write(self.style.SUCCESS(f"removed {removed} expired uploads"))
@@ -0,0 +1,12 @@
+# courses/management/commands/ensure_indexes.py
+from django.core.management.base import BaseCommand
+
+from courses.utils import ensure_indexes
+
+
+class Command(BaseCommand):
+    help = "Create the Mongo indexes the API queries rely on (idempotent)."
+
+    def handle(self, *args, **opts):
+        for name in ensure_indexes():
+            self.stdout.write(f"index ok: {name}")
@@ -0,0 +1,49 @@
+# courses/management/commands/index_media.py
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from courses.services.media_service import MediaService
+from courses.utils import media_collection
+
+VIDEO_EXTENSIONS = (".mp4", ".m4v", ".mov")
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfill the media metadata index (duration, resolution, codecs, bitrate "
+        "per sha256) for videos under MEDIA_ROOT. Files already indexed under "
+        "their path are skipped unless --force."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dir", default="videos", help="directory under MEDIA_ROOT")
+        parser.add_argument("--force", action="store_true")
+
+    def handle(self, *args, **opts):
+        root = os.path.join(settings.MEDIA_ROOT, opts["dir"])
+        indexed = skipped = failed = 0
+
+        for dirpath, _, filenames in os.walk(root):
+            for name in sorted(filenames):
+                if not name.lower().endswith(VIDEO_EXTENSIONS):
+                    continue
+                relative = os.path.relpath(os.path.join(dirpath, name), settings.MEDIA_ROOT)
+                if not opts["force"] and media_collection.count_documents({"paths": relative}, limit=1):
+                    skipped += 1
+                    continue
+
+                doc = MediaService.index_file(relative)
+                if "error" in doc:
+                    failed += 1
+                    self.stdout.write(self.style.WARNING(f"{relative}: {doc['error']}"))
+                else:
+                    indexed += 1
+                    self.stdout.write(
+                        f"{relative}: {doc.get('duration_seconds')}s "
+                        f"{doc.get('width')}x{doc.get('height')} {doc.get('video_codec')} "
+                        f"{doc['_id'][:12]}"
+                    )
+
+        self.stdout.write(self.style.SUCCESS(f"indexed {indexed}, skipped {skipped}, unparseable {failed}"))
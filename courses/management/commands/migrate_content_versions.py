@@ -0,0 +1,115 @@
+# courses/management/commands/migrate_content_versions.py
+import time
+from collections import Counter
+from datetime import datetime
+
+from django.core.management.base import BaseCommand
+from pymongo import ASCENDING, UpdateOne
+
+from courses.services.content_service import version_summary
+from courses.utils import content_versions_collection, contents_collection, parse_date
+
+
+class Command(BaseCommand):
+    help = (
+        "Move embedded content `versions` into the content_versions collection "
+        "and leave a current_version pointer (the last embedded version) on the "
+        "content. Batched, resumable and idempotent: versions are upserted by "
+        "(content_id, versionid) and a content's `versions` is only unset when "
+        "it still equals what was copied, so a concurrent edit is retried on the "
+        "next run. Run ensure_indexes first (unique content_id + versionid)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--sleep", type=float, default=0.0, help="pause between batches (seconds)")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **opts):
+        last_id = None
+        moved = versions_moved = changed = 0
+        while True:
+            query = {"versions": {"$exists": True}}
+            if last_id is not None:
+                query["_id"] = {"$gt": last_id}
+            docs = list(
+                contents_collection.find(query, {"versions": 1, "created_at": 1})
+                .sort("_id", ASCENDING)
+                .limit(opts["batch_size"])
+            )
+            if not docs:
+                break
+            last_id = docs[-1]["_id"]
+
+            if opts["dry_run"]:
+                moved += len(docs)
+                versions_moved += sum(len(d["versions"] or []) for d in docs)
+                continue
+
+            version_ops, latest = [], {}
+            for doc in docs:
+                ops, last = self._versions(doc)
+                version_ops.extend(ops)
+                if last is not None:
+                    latest[doc["_id"]] = last
+
+            # versions first: a crash in between leaves the content readable (embedded)
+            if version_ops:
+                content_versions_collection.bulk_write(version_ops, ordered=True)
+                versions_moved += len(version_ops)
+            stored = {
+                (v["content_id"], v["versionid"]): v
+                for v in content_versions_collection.find(
+                    {"content_id": {"$in": list(latest)}}, {"data": 0, "metadata": 0}
+                )
+            }
+
+            counts = Counter(content_id for content_id, _ in stored)
+
+            content_ops = []
+            for doc in docs:
+                update = {"$unset": {"versions": ""}}
+                last = latest.get(doc["_id"])
+                if last is not None:
+                    current = stored[(doc["_id"], last.get("versionid"))]
+                    update["$set"] = {
+                        "current_version": version_summary(current),
+                        "version_count": counts[doc["_id"]],
+                    }
+                content_ops.append(UpdateOne({"_id": doc["_id"], "versions": doc["versions"]}, update))
+            result = contents_collection.bulk_write(content_ops, ordered=False)
+            moved += result.modified_count
+            changed += len(content_ops) - result.modified_count
+
+            self.stdout.write(f"contents: {moved} migrated, {versions_moved} versions (up to {last_id})")
+            if opts["sleep"]:
+                time.sleep(opts["sleep"])
+
+        verb = "would migrate" if opts["dry_run"] else "migrated"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {moved} contents / {versions_moved} versions; "
+            f"{changed} changed during the run (run again)"
+        ))
+
+    @staticmethod
+    def _versions(doc):
+        """
+        (upserts for doc's embedded versions, the last one).
+        """
+        created_at = parse_date(doc.get("created_at")) or datetime.utcnow()
+        ops, last = [], None
+        for version in doc["versions"] or []:
+            if not isinstance(version, dict):
+                continue
+            key = {"content_id": doc["_id"], "versionid": version.get("versionid")}
+            # a repeated versionid: the later entry wins, as it did for readers
+            fields = {
+                k: v for k, v in version.items()
+                if k not in ("_id", "content_id", "versionid", "created_at")
+            }
+            update = {"$setOnInsert": {"created_at": parse_date(version.get("created_at")) or created_at}}
+            if fields:
+                update["$set"] = fields
+            ops.append(UpdateOne(key, update, upsert=True))
+            last = version
+        return ops, last
@@ -0,0 +1,124 @@
+# courses/management/commands/migrate_typed_fields.py
+import time
+
+from bson import ObjectId
+from django.core.management.base import BaseCommand
+from pymongo import ASCENDING, UpdateOne
+
+from courses.utils import (
+    COURSE_DATE_FIELDS,
+    after_id,
+    courses_collection,
+    enrollment_collection,
+    parse_date,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Online migration of string-typed fields: enrollments.course_id -> ObjectId "
+        "(only when that course exists with an ObjectId _id), enrollments.created_at "
+        "and course dates -> BSON dates. Batched, resumable and idempotent: only "
+        "documents that still have a string in one of the fields are touched, and "
+        "each update is conditional on the old value so concurrent writes win."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--sleep", type=float, default=0.0, help="pause between batches (seconds)")
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **opts):
+        self.opts = opts
+        self._migrate(
+            "enrollments",
+            enrollment_collection,
+            ("course_id", "created_at"),
+            self._enrollment_updates,
+        )
+        self._migrate("courses", courses_collection, COURSE_DATE_FIELDS, self._course_updates)
+
+    # ------------------------------------------------------------------
+    def _migrate(self, label, collection, fields, build_updates):
+        query = {"$or": [{field: {"$type": "string"}} for field in fields]}
+        projection = {field: 1 for field in fields}
+
+        last_id = None
+        converted = skipped = 0
+        while True:
+            # courses may have string _ids (client "id" on create), sorted before ObjectIds
+            batch_query = query if last_id is None else {"$and": [query, after_id(last_id)]}
+            docs = list(
+                collection.find(batch_query, projection)
+                .sort("_id", ASCENDING)
+                .limit(self.opts["batch_size"])
+            )
+            if not docs:
+                break
+            last_id = docs[-1]["_id"]
+
+            ops, unconvertible = build_updates(docs)
+            skipped += unconvertible
+            if ops and not self.opts["dry_run"]:
+                result = collection.bulk_write(ops, ordered=False)
+                converted += result.modified_count
+            else:
+                converted += len(ops)
+
+            self.stdout.write(f"{label}: {converted} converted, {skipped} left as-is (up to {last_id})")
+            if self.opts["sleep"]:
+                time.sleep(self.opts["sleep"])
+
+        verb = "would convert" if self.opts["dry_run"] else "converted"
+        self.stdout.write(self.style.SUCCESS(f"{label}: {verb} {converted}, {skipped} values not convertible"))
+
+    def _enrollment_updates(self, docs):
+        # only point at courses that really have an ObjectId _id
+        candidates = {
+            doc["course_id"] for doc in docs
+            if isinstance(doc.get("course_id"), str) and ObjectId.is_valid(doc["course_id"])
+        }
+        existing = {
+            str(c["_id"])
+            for c in courses_collection.find({"_id": {"$in": [ObjectId(x) for x in candidates]}}, {"_id": 1})
+        }
+
+        ops, unconvertible = [], 0
+        for doc in docs:
+            match, update = {"_id": doc["_id"]}, {}
+
+            course_id = doc.get("course_id")
+            if isinstance(course_id, str):
+                if course_id in existing:
+                    match["course_id"] = course_id
+                    update["course_id"] = ObjectId(course_id)
+                else:
+                    unconvertible += 1
+
+            unconvertible += self._date_update(doc, "created_at", match, update)
+            if update:
+                ops.append(UpdateOne(match, {"$set": update}))
+        return ops, unconvertible
+
+    def _course_updates(self, docs):
+        ops, unconvertible = [], 0
+        for doc in docs:
+            match, update = {"_id": doc["_id"]}, {}
+            for field in COURSE_DATE_FIELDS:
+                unconvertible += self._date_update(doc, field, match, update)
+            if update:
+                ops.append(UpdateOne(match, {"$set": update}))
+        return ops, unconvertible
+
+    @staticmethod
+    def _date_update(doc, field, match, update):
+        """Adds field to match/update when it parses; returns 1 for an unparseable string."""
+        value = doc.get(field)
+        if not isinstance(value, str):
+            return 0
+        parsed = parse_date(value)
+        if parsed is None:
+            return 1
+        match[field] = value
+        update[field] = parsed
+        return 0
@@ -0,0 +1,62 @@
+# courses/management/commands/profile_startup.py
+import re
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+OWN_PACKAGES = ("courseapi", "courses", "accounts", "notifications")
+
+
+class Command(BaseCommand):
+    help = (
+        "Import-time profile of `manage.py <command>` (python -X importtime): "
+        "top modules by cumulative time, and this project's own modules. "
+        "--warmup also times each courseapi.warmup step in this process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("target", nargs="?", default="check", help="manage.py command to profile")
+        parser.add_argument("--top", type=int, default=25)
+        parser.add_argument("--warmup", action="store_true")
+
+    def handle(self, *args, **opts):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", str(settings.BASE_DIR / "manage.py"), opts["target"]],
+            capture_output=True,
+            text=True,
+        )
+
+        rows = []
+        for line in proc.stderr.splitlines():
+            m = LINE.match(line)
+            if m:
+                rows.append((int(m.group(2)), int(m.group(1)), m.group(4), len(m.group(3))))
+        if not rows:
+            self.stderr.write(proc.stderr[-2000:])
+            return
+
+        top_level = sum(cum for cum, _, _, depth in rows if depth == 1)
+        self.stdout.write(f"manage.py {opts['target']}: {len(rows)} modules, {top_level / 1000:.1f} ms importing")
+
+        self.stdout.write(f"\ntop {opts['top']} by cumulative ms")
+        for cum, own, name, _ in sorted(rows, reverse=True)[:opts["top"]]:
+            self.stdout.write(f"  {cum / 1000:8.1f} {own / 1000:8.1f}  {name}")
+
+        self.stdout.write("\nproject modules (cumulative / self ms)")
+        for cum, own, name, _ in sorted(rows, reverse=True):
+            if name.split(".")[0] in OWN_PACKAGES:
+                self.stdout.write(f"  {cum / 1000:8.1f} {own / 1000:8.1f}  {name}")
+
+        if opts["warmup"]:
+            from courseapi import warmup
+
+            failed = warmup.warm_up()
+            self.stdout.write("\nwarm-up steps (ms)")
+            for name, step in warmup.status()["steps"].items():
+                note = "" if step["ok"] else f"  FAILED: {step['error']}"
+                self.stdout.write(f"  {step['ms']:8.1f}  {name}{note}")
+            if failed:
+                self.stdout.write(self.style.WARNING(f"failed: {', '.join(failed)}"))
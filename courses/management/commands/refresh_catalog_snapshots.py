@@ -0,0 +1,15 @@
+# courses/management/commands/refresh_catalog_snapshots.py
+from django.core.management.base import BaseCommand
+
+from courses.snapshots import refresh_all_snapshots
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the pre-rendered first catalog pages (segment x course_type). "
+        "Run from cron when CACHES is shared (REDIS_URL)."
+    )
+
+    def handle(self, *args, **opts):
+        built = refresh_all_snapshots()
+        self.stdout.write(f"built {built} catalog snapshots")
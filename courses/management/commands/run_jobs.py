@@ -0,0 +1,38 @@
+# courses/management/commands/run_jobs.py
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+# registers the job handlers
+import accounts.bulk_import  # noqa: F401
+import courses.services.enrollment_service  # noqa: F401
+import courses.services.media_service  # noqa: F401
+from courses.services.job_service import JobService
+
+
+class Command(BaseCommand):
+    help = (
+        "Process queued background jobs (and jobs whose worker died) outside "
+        "the web workers. --forever keeps polling."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--forever", action="store_true")
+        parser.add_argument("--interval", type=float, default=2.0)
+
+    def handle(self, *args, **opts):
+        if settings.EVENTS_BROKER == "local":
+            # nobody holds an /api/events/ stream in this process
+            self.stderr.write(self.style.WARNING(
+                "EVENTS_BROKER=local: enrollment events from jobs run here are dropped; "
+                "set EVENTS_BROKER=redis to push them to the web workers' streams"
+            ))
+        while True:
+            job = JobService.run()
+            if job:
+                self.stdout.write(f"job {job['_id']} ({job['type']}) finished")
+                continue
+            if not opts["forever"]:
+                break
+            time.sleep(opts["interval"])
@@ -0,0 +1,24 @@
+# courses/middleware.py
+from .utils import read_primary
+
+TRUTHY = {"1", "true", "yes"}
+
+
+class ReadPreferenceMiddleware:
+    """
+    `X-Read-Your-Writes: 1` pins this request's catalog reads to the Mongo
+    primary (e.g. a client re-fetching a course it just created).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.headers.get("X-Read-Your-Writes", "").lower() not in TRUTHY:
+            return self.get_response(request)
+
+        token = read_primary.set(True)
+        try:
+            return self.get_response(request)
+        finally:
+            read_primary.reset(token)
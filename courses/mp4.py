@@ -0,0 +1,183 @@
+# courses/mp4.py
+"""
+Minimal ISO-BMFF (MP4 / MOV) reader: walks the top-level boxes, skips mdat
+with a seek and parses only moov, so a multi-GB lecture costs a few KB of
+reads. Pure Python, no ffprobe.
+
+parse(f) -> {
+    "duration_seconds", "width", "height", "video_codec", "audio_codec",
+    "bitrate", "brand", "faststart", "tracks": [...]
+}
+"""
+import struct
+
+# moov is normally a few KB..MB; refuse to buffer anything absurd
+MAX_MOOV_BYTES = 64 * 1024 * 1024
+
+
+class MP4Error(ValueError):
+    pass
+
+
+def _boxes(buf, start=0, end=None):
+    """Yields (type, payload_start, payload_end) for the boxes in buf[start:end]."""
+    end = len(buf) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", buf, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", buf, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            raise MP4Error(f"bad {kind!r} box at {pos}")
+        yield kind, pos + header, pos + size
+        pos += size
+
+
+def _find(buf, start, end, *path):
+    """Payload bounds of the first box at path (e.g. b"mdia", b"mdhd"), or None."""
+    for kind, s, e in _boxes(buf, start, end):
+        if kind == path[0]:
+            return (s, e) if len(path) == 1 else _find(buf, s, e, *path[1:])
+    return None
+
+
+# --------------------------
+# Top level: locate moov without reading mdat
+# --------------------------
+def read_moov(f):
+    """
+    (moov bytes, major brand, faststart) from a binary file object.
+    """
+    f.seek(0, 2)
+    file_size = f.tell()
+    pos, brand, seen_mdat = 0, None, False
+
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        header = f.read(16)
+        size, kind = struct.unpack_from(">I4s", header)
+        header_size = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", header, 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - pos
+        if size < header_size:
+            raise MP4Error(f"bad {kind!r} box at {pos}")
+
+        if kind == b"ftyp":
+            brand = header[header_size:header_size + 4].decode("latin-1")
+        elif kind == b"mdat":
+            seen_mdat = True
+        elif kind == b"moov":
+            if size > MAX_MOOV_BYTES:
+                raise MP4Error(f"moov too large ({size} bytes)")
+            if pos + size > file_size:
+                raise MP4Error("moov runs past the end of the file (truncated)")
+            f.seek(pos + header_size)
+            return f.read(size - header_size), brand, not seen_mdat
+        pos += size
+
+    raise MP4Error("no moov box (not an MP4, or truncated)")
+
+
+# --------------------------
+# moov
+# --------------------------
+def _full_box(buf, start):
+    return buf[start], start + 4   # version, payload after version/flags
+
+
+def _mvhd(buf, start):
+    version, p = _full_box(buf, start)
+    if version == 1:
+        timescale, duration = struct.unpack_from(">IQ", buf, p + 16)
+    else:
+        timescale, duration = struct.unpack_from(">II", buf, p + 8)
+    return timescale, duration
+
+
+def _tkhd_size(buf, start):
+    version, p = _full_box(buf, start)
+    # creation/modification/track_id/reserved/duration, reserved, layer..volume, matrix
+    p += (32 if version == 1 else 20) + 8 + 8 + 36
+    width, height = struct.unpack_from(">II", buf, p)
+    return width >> 16, height >> 16
+
+
+def _track(buf, start, end):
+    track = {}
+
+    tkhd = _find(buf, start, end, b"tkhd")
+    hdlr = _find(buf, start, end, b"mdia", b"hdlr")
+    mdhd = _find(buf, start, end, b"mdia", b"mdhd")
+    stsd = _find(buf, start, end, b"mdia", b"minf", b"stbl", b"stsd")
+
+    if hdlr:
+        handler = buf[hdlr[0] + 8:hdlr[0] + 12].decode("latin-1")
+        track["type"] = {"vide": "video", "soun": "audio"}.get(handler, handler)
+    if mdhd:
+        timescale, duration = _mvhd(buf, mdhd[0])   # same layout up to duration
+        if timescale:
+            track["duration_seconds"] = round(duration / timescale, 3)
+
+    if stsd:
+        # first sample entry after version/flags + entry_count
+        entries = list(_boxes(buf, stsd[0] + 8, stsd[1]))
+        if entries:
+            codec, s, e = entries[0]
+            track["codec"] = codec.decode("latin-1").strip()
+            if track.get("type") == "video" and e - s >= 28:
+                track["width"], track["height"] = struct.unpack_from(">HH", buf, s + 24)
+            elif track.get("type") == "audio" and e - s >= 28:
+                channels, _, _, rate = struct.unpack_from(">HHII", buf, s + 16)
+                track["channels"] = channels
+                track["sample_rate"] = rate >> 16
+
+    if tkhd and track.get("type") == "video" and not track.get("width"):
+        track["width"], track["height"] = _tkhd_size(buf, tkhd[0])
+    return track
+
+
+def parse(f):
+    """
+    Raises MP4Error for anything it can't read, truncated / corrupt boxes
+    included, so callers only have one exception to handle.
+    """
+    try:
+        return _parse(f)
+    except MP4Error:
+        raise
+    except (struct.error, IndexError, ValueError) as exc:
+        raise MP4Error(f"corrupt MP4: {exc}") from exc
+
+
+def _parse(f):
+    moov, brand, faststart = read_moov(f)
+    f.seek(0, 2)
+    file_size = f.tell()
+
+    info = {"brand": brand, "faststart": faststart, "tracks": []}
+
+    mvhd = _find(moov, 0, len(moov), b"mvhd")
+    if mvhd is None:
+        raise MP4Error("moov without mvhd")
+    timescale, duration = _mvhd(moov, mvhd[0])
+    info["duration_seconds"] = round(duration / timescale, 3) if timescale else None
+
+    for kind, s, e in _boxes(moov):
+        if kind == b"trak":
+            info["tracks"].append(_track(moov, s, e))
+
+    video = next((t for t in info["tracks"] if t.get("type") == "video"), {})
+    audio = next((t for t in info["tracks"] if t.get("type") == "audio"), {})
+    info["width"] = video.get("width")
+    info["height"] = video.get("height")
+    info["video_codec"] = video.get("codec")
+    info["audio_codec"] = audio.get("codec")
+    info["bitrate"] = int(file_size * 8 / info["duration_seconds"]) if info["duration_seconds"] else None
+    return info
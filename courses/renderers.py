@@ -0,0 +1,102 @@
+# courses/renderers.py
+"""
+MessagePack for the course API: `Accept: application/msgpack` gets a binary
+body, `Content-Type: application/msgpack` request bodies are parsed.
+
+ObjectId travels as ext type 1 (its 12 bytes) and datetimes as the msgpack
+timestamp ext (-1), decoded back to UTC datetimes. msgpack is optional:
+without it the negotiation simply never offers it (JSON as before).
+
+Views build documents with encode_ids(request, doc): hex strings for JSON,
+ObjectIds left in place for msgpack. Results that the services return already
+converted (enroll / assign) carry string ids in both formats.
+"""
+from datetime import datetime, timezone
+
+from bson import ObjectId
+from django.utils.functional import Promise
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer
+from rest_framework.settings import api_settings
+
+from courses.utils import convert_objectids
+
+try:
+    import msgpack
+except ImportError:   # optional: without it only JSON is offered
+    msgpack = None
+
+MEDIA_TYPE = "application/msgpack"
+OBJECTID_EXT = 1
+
+
+def _default(obj):
+    if isinstance(obj, ObjectId):
+        return msgpack.ExtType(OBJECTID_EXT, obj.binary)
+    if isinstance(obj, datetime):
+        # Mongo / utcnow() datetimes are naive UTC
+        if obj.tzinfo is None:
+            obj = obj.replace(tzinfo=timezone.utc)
+        return msgpack.Timestamp.from_datetime(obj)
+    if isinstance(obj, Promise):   # lazy translation strings in error details
+        return str(obj)
+    raise TypeError(f"can't encode {type(obj).__name__} as msgpack")
+
+
+def _ext_hook(code, data):
+    if code == OBJECTID_EXT:
+        return ObjectId(data)
+    return msgpack.ExtType(code, data)
+
+
+def native_ids(request):
+    return request.accepted_renderer.format == MessagePackRenderer.format
+
+
+def encode_ids(request, data):
+    """
+    convert_objectids(data) unless the response is rendered as msgpack.
+    """
+    return data if native_ids(request) else convert_objectids(data)
+
+
+def packb(data):
+    return msgpack.packb(data, default=_default, use_bin_type=True)
+
+
+def unpackb(payload):
+    # timestamp=3: timestamps come back as aware (UTC) datetimes
+    return msgpack.unpackb(payload, ext_hook=_ext_hook, timestamp=3, raw=False)
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = MEDIA_TYPE
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return packb(data)
+
+
+class MessagePackParser(BaseParser):
+    media_type = MEDIA_TYPE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return unpackb(stream.read())
+        except Exception as exc:
+            raise ParseError(f"MessagePack parse error - {exc}")
+
+
+class MessagePackNegotiation:
+    """
+    Viewset mixin: the project's default renderers / parsers plus MessagePack
+    when the msgpack package is installed.
+    """
+    if msgpack is not None:
+        renderer_classes = [*api_settings.DEFAULT_RENDERER_CLASSES, MessagePackRenderer]
+        parser_classes = [*api_settings.DEFAULT_PARSER_CLASSES, MessagePackParser]
@@ -1,5 +1,6 @@
 # courses/serializers.py
 from rest_framework import serializers
+from django.conf import settings
 from datetime import datetime
 
 
@@ -160,6 +161,13 @@ class CourseSerializer(serializers.Serializer):
     updated_at = serializers.HiddenField(default=now_timestamp)
 
 
+class CourseCloneSerializer(serializers.Serializer):
+    # everything else is copied from the source course
+    course_title = serializers.CharField(max_length=512, required=False)
+    course_start_date = serializers.CharField(required=False, allow_blank=True)
+    course_end_date = serializers.CharField(required=False, allow_blank=True)
+
+
 # ===========================================================
 # ENROLLMENT SERIALIZER
 # ===========================================================
@@ -173,3 +181,59 @@ class EnrollmentSerializer(serializers.Serializer):
     updated_by = serializers.HiddenField(default="Prathyusha")
     created_at = serializers.HiddenField(default=now_timestamp)
     updated_at = serializers.HiddenField(default=now_timestamp)
+
+
+class MembershipCheckSerializer(serializers.Serializer):
+    course_ids = serializers.ListField(child=serializers.CharField(), max_length=500)
+    user_id = serializers.IntegerField(required=False)
+
+
+# ===========================================================
+# PROGRESS EVENTS
+# ===========================================================
+class ProgressEventSerializer(serializers.Serializer):
+    course_id = serializers.CharField()
+    content_id = serializers.CharField()
+    event = serializers.ChoiceField(choices=["viewed", "completed"])
+
+
+class ProgressEventBatchSerializer(serializers.Serializer):
+    events = ProgressEventSerializer(
+        many=True,
+        allow_empty=False,
+        max_length=getattr(settings, "PROGRESS_MAX_EVENTS", 500),
+    )
+
+
+# ===========================================================
+# BATCH SERIALIZERS
+# ===========================================================
+class BatchItemSerializer(serializers.Serializer):
+    id = serializers.CharField(required=False)
+    method = serializers.ChoiceField(
+        choices=["GET", "POST", "PUT", "PATCH", "DELETE"], default="GET"
+    )
+    path = serializers.CharField()   # e.g. "/api/courses/?segment=b2c"
+    body = serializers.JSONField(required=False)
+
+
+class BatchSerializer(serializers.Serializer):
+    requests = BatchItemSerializer(many=True, allow_empty=False)
+    # run items concurrently - only for items that don't depend on each other
+    parallel = serializers.BooleanField(required=False, default=False)
+
+    def validate_requests(self, value):
+        limit = getattr(settings, "BATCH_MAX_REQUESTS", 20)
+        if len(value) > limit:
+            raise serializers.ValidationError(f"At most {limit} requests per batch.")
+        return value
+
+
+# ===========================================================
+# RESUMABLE UPLOADS
+# ===========================================================
+class UploadInitSerializer(serializers.Serializer):
+    filename = serializers.CharField(max_length=255)
+    size = serializers.IntegerField(min_value=1)
+    # optional whole-file checksum, verified at finalize
+    sha256 = serializers.RegexField(r"^[0-9a-fA-F]{64}$", required=False)
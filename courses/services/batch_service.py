@@ -0,0 +1,123 @@
+# courses/services/batch_service.py
+import contextvars
+import io
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "BATCH_MAX_WORKERS", 4),
+    thread_name_prefix="api-batch",
+)
+
+# parent headers that must not leak into sub-requests
+_DROPPED_META = ("CONTENT_TYPE", "CONTENT_LENGTH", "QUERY_STRING", "HTTP_ACCEPT_ENCODING", "HTTP_ACCEPT")
+
+
+class BatchService:
+    @staticmethod
+    def run(request, items, allowed_views, parallel=False):
+        """
+        Runs each {"id", "method", "path", "body"} item in-process against the
+        URLconf and returns [{"id", "status", "body"}] in request order.
+
+        Sub-requests reuse the caller's authenticated user/token, so JWT is
+        decoded once per batch. Only views whose class is in allowed_views run.
+        """
+        if parallel and len(items) > 1:
+            # copy_context: items keep request-scoped state (e.g. read-your-writes)
+            futures = [
+                _executor.submit(
+                    contextvars.copy_context().run,
+                    BatchService._run_in_thread, request, item, allowed_views,
+                )
+                for item in items
+            ]
+            return [f.result() for f in futures]
+
+        return [BatchService._run_one(request, item, allowed_views) for item in items]
+
+    @staticmethod
+    def _run_in_thread(request, item, allowed_views):
+        close_old_connections()
+        try:
+            return BatchService._run_one(request, item, allowed_views)
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def _run_one(request, item, allowed_views):
+        item_id = item.get("id")
+        parts = urlsplit(item["path"])
+
+        try:
+            match = resolve(parts.path)
+        except Resolver404:
+            return {"id": item_id, "status": 404, "body": {"detail": "Not found."}}
+
+        if getattr(match.func, "cls", None) not in allowed_views:
+            return {"id": item_id, "status": 400, "body": {"detail": "Path not allowed in batch."}}
+
+        sub = BatchService._build_request(request, item["method"], parts, item.get("body"))
+        sub.resolver_match = match
+
+        try:
+            response = match.func(sub, *match.args, **match.kwargs)
+        except Exception:
+            logger.exception("batch sub-request failed: %s %s", item["method"], item["path"])
+            return {"id": item_id, "status": 500, "body": {"detail": "Internal server error."}}
+
+        return {
+            "id": item_id,
+            "status": response.status_code,
+            "body": BatchService._response_body(response),
+        }
+
+    @staticmethod
+    def _build_request(parent, method, parts, body):
+        payload = b"" if body is None else json.dumps(body).encode("utf-8")
+
+        sub = HttpRequest()
+        sub.method = method
+        sub.path = sub.path_info = parts.path
+        sub.META = {k: v for k, v in parent.META.items() if k not in _DROPPED_META}
+        sub.META.update({
+            "REQUEST_METHOD": method,
+            "PATH_INFO": parts.path,
+            "QUERY_STRING": parts.query,
+            "CONTENT_TYPE": "application/json",
+            "CONTENT_LENGTH": str(len(payload)),
+            "HTTP_ACCEPT": "application/json",
+        })
+        sub.GET = QueryDict(parts.query)
+        sub.COOKIES = parent.COOKIES
+        sub._stream = io.BytesIO(payload)
+        sub._read_started = False
+
+        # shared authentication: DRF picks these up instead of re-running JWT auth
+        sub.user = parent.user
+        sub._force_auth_user = parent.user
+        sub._force_auth_token = parent.auth
+        return sub
+
+    @staticmethod
+    def _response_body(response):
+        data = getattr(response, "data", None)
+        if data is not None:
+            return data
+
+        content = getattr(response, "content", b"")
+        if not content:
+            return None
+        try:
+            return json.loads(content)
+        except ValueError:
+            return content.decode("utf-8", errors="replace")
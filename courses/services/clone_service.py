@@ -0,0 +1,180 @@
+# courses/services/clone_service.py
+import logging
+from datetime import datetime
+
+from bson import ObjectId
+
+from courses.utils import (
+    content_versions_collection,
+    contents_collection,
+    courses_collection,
+    find_course,
+    id_variants,
+    modules_collection,
+    topics_collection,
+    typed_course,
+)
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+# per-learner state that a new edition starts without
+RESET_FIELDS = {"enrollers": 0, "progress": 0.0, "assigned_users": []}
+
+
+class _Batcher:
+    """insert_many every BATCH_SIZE documents."""
+
+    def __init__(self, collection):
+        self.collection, self.pending, self.count = collection, [], 0
+
+    def add(self, doc):
+        self.pending.append(doc)
+        if len(self.pending) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.collection.insert_many(self.pending, ordered=False)
+            self.count += len(self.pending)
+            self.pending = []
+
+
+class CloneService:
+    """
+    Deep copy of a course: course -> modules -> topics -> contents -> content
+    versions, ids remapped. All new ids are allocated up front from one _id-only
+    read per level, then every level is streamed through once and written with
+    insert_many in batches, so a 2,000-node course is a handful of round trips.
+    The course document is written last: until then the copy is invisible, and
+    a failure anywhere (the course insert included) removes what was written.
+    """
+
+    @staticmethod
+    def clone_course(course_id, overrides=None, user=None):
+        source = find_course(course_id)
+        if not source:
+            return {"error": "course_not_found"}
+
+        module_map = CloneService._id_map(
+            modules_collection, {"course_id": {"$in": id_variants(source["_id"])}}
+        )
+        topic_map = CloneService._id_map(
+            topics_collection, {"module_id": {"$in": list(module_map)}}
+        )
+        content_map = CloneService._id_map(
+            contents_collection, {"topic_id": {"$in": list(topic_map)}}
+        )
+        # versions store their content's _id as is: ObjectId, or a client's string id
+        version_map = CloneService._id_map(
+            content_versions_collection, {"content_id": {"$in": _ids(content_map)}}
+        )
+
+        new_course_id = ObjectId()
+        written = []
+        try:
+            counts = CloneService._copy_tree(
+                str(new_course_id), module_map, topic_map, content_map, version_map, written
+            )
+
+            now = datetime.utcnow()
+            course = {
+                **source,
+                **RESET_FIELDS,
+                **(overrides or {}),
+                "_id": new_course_id,
+                "cloned_from": source["_id"],
+                "created_at": now,
+                "updated_at": now,
+            }
+            if source.get("module_ids"):
+                course["module_ids"] = [_remap(module_map, m) for m in source["module_ids"]]
+            typed_course(course)
+            if user is not None:
+                course["created_by"] = course["updated_by"] = user.username
+            # a failed / timed-out insert may still have landed: remove it too
+            written.append((courses_collection, {str(new_course_id): new_course_id}))
+            courses_collection.insert_one(course)
+        except Exception:
+            CloneService._remove(written)
+            raise
+        return {"course": course, "counts": counts}
+
+    @staticmethod
+    def _id_map(collection, query):
+        """
+        {old id as str: new ObjectId} for every document matching query.
+        """
+        return {str(doc["_id"]): ObjectId() for doc in collection.find(query, {"_id": 1})}
+
+    @staticmethod
+    def _copy_tree(new_course_id, module_map, topic_map, content_map, version_map, written):
+        modules = _Batcher(modules_collection)
+        written.append((modules_collection, module_map))
+        for doc in modules_collection.find({"_id": {"$in": _ids(module_map)}}):
+            doc["_id"] = module_map[str(doc["_id"])]
+            doc["course_id"] = new_course_id
+            doc["topic_ids"] = [_remap(topic_map, t) for t in doc.get("topic_ids") or []]
+            modules.add(doc)
+        modules.flush()
+
+        topics = _Batcher(topics_collection)
+        written.append((topics_collection, topic_map))
+        for doc in topics_collection.find({"_id": {"$in": _ids(topic_map)}}):
+            doc["_id"] = topic_map[str(doc["_id"])]
+            doc["module_id"] = _remap(module_map, doc["module_id"])
+            for group in doc.get("media_content_ids") or []:
+                for ref in group.get("content_ids") or []:
+                    ref["content_id"] = _remap(content_map, ref.get("content_id"))
+            topics.add(doc)
+        topics.flush()
+
+        contents = _Batcher(contents_collection)
+        written.append((contents_collection, content_map))
+        for doc in contents_collection.find({"_id": {"$in": _ids(content_map)}}):
+            doc["_id"] = content_map[str(doc["_id"])]
+            doc["topic_id"] = _remap(topic_map, doc["topic_id"])
+            current = doc.get("current_version")
+            if current:
+                if str(current.get("_id")) in version_map:
+                    current["_id"] = version_map[str(current["_id"])]
+                else:
+                    # not one of this content's versions: never point into the source
+                    del doc["current_version"]
+            contents.add(doc)
+        contents.flush()
+
+        versions = _Batcher(content_versions_collection)
+        written.append((content_versions_collection, version_map))
+        for doc in content_versions_collection.find({"_id": {"$in": _ids(version_map)}}):
+            doc["_id"] = version_map[str(doc["_id"])]
+            doc["content_id"] = content_map[str(doc["content_id"])]
+            versions.add(doc)
+        versions.flush()
+
+        return {
+            "modules": modules.count,
+            "topics": topics.count,
+            "contents": contents.count,
+            "versions": versions.count,
+        }
+
+    @staticmethod
+    def _remove(written):
+        for collection, mapping in written:
+            try:
+                collection.delete_many({"_id": {"$in": list(mapping.values())}})
+            except Exception:
+                logger.exception("cleaning up a failed clone in %s", collection.name)
+
+
+def _remap(mapping, value):
+    """New id (as str, like the stored references) or value unchanged."""
+    new = mapping.get(str(value))
+    return str(new) if new is not None else value
+
+
+def _ids(mapping):
+    """Source _ids for a map (keys are str; stored as ObjectId or str)."""
+    return [value for key in mapping for value in id_variants(key)]
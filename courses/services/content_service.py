@@ -0,0 +1,138 @@
+# courses/services/content_service.py
+from datetime import datetime
+
+from bson import ObjectId
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
+
+from courses.utils import catalog, content_versions_collection, contents_collection, id_filter
+
+# what the content document keeps about its current version (no payload)
+SUMMARY_FIELDS = ("versionid", "type", "title", "url")
+
+
+def version_summary(version):
+    summary = {k: version.get(k) for k in SUMMARY_FIELDS}
+    summary["_id"] = version["_id"]
+    return summary
+
+
+class ContentService:
+    """
+    Content versions live in content_versions, one document each:
+    {content_id, versionid, type, title, data, url, metadata, created_at}.
+    The content document only points at its current one
+    (current_version = summary incl. the version's _id) and counts them, so
+    reading content costs one version's payload however often it was edited.
+
+    Documents not yet moved by `manage.py migrate_content_versions` still
+    embed `versions`; reads fall back to that list (last entry = latest).
+    """
+
+    @staticmethod
+    def _version_doc(content_id, version, now):
+        return {**version, "content_id": content_id, "created_at": now}
+
+    @staticmethod
+    def create(content):
+        """
+        content is ContentSerializer output; its versions go to content_versions.
+        The content doc is written with its current_version already set, then
+        the versions: two inserts. ValueError("duplicate_versionid") before
+        anything is written when two versions share a versionid.
+        """
+        versions = content.pop("versions", [])
+        versionids = [v.get("versionid") for v in versions]
+        if len(set(versionids)) != len(versionids):
+            raise ValueError("duplicate_versionid")
+
+        content.setdefault("_id", ObjectId())
+        now = datetime.utcnow()
+        docs = [ContentService._version_doc(content["_id"], v, now) for v in versions]
+        for doc in docs:
+            doc["_id"] = ObjectId()
+        if docs:
+            content.update(current_version=version_summary(docs[-1]), version_count=len(docs))
+
+        contents_collection.insert_one(content)
+        if docs:
+            try:
+                content_versions_collection.insert_many(docs)
+            except Exception:
+                # no content without its versions
+                content_versions_collection.delete_many({"content_id": content["_id"]})
+                contents_collection.delete_one({"_id": content["_id"]})
+                raise
+        return content, docs
+
+    @staticmethod
+    def add_version(content_id, version):
+        """
+        Stores a new version and makes it current. None if the content doesn't exist.
+        """
+        content = contents_collection.find_one(id_filter(content_id), {"versions": 1})
+        if content is None:
+            return None
+        if "versions" in content:
+            raise ValueError("content_not_migrated")
+
+        doc = ContentService._version_doc(content["_id"], version, datetime.utcnow())
+        try:
+            content_versions_collection.insert_one(doc)
+        except DuplicateKeyError:
+            raise ValueError("duplicate_versionid")
+
+        contents_collection.update_one(
+            {"_id": content["_id"]},
+            {"$set": {"current_version": version_summary(doc)}, "$inc": {"version_count": 1}},
+        )
+        return doc
+
+    @staticmethod
+    def get(content_id):
+        # ObjectId _id, or the string one a client sent as "id" on create
+        return catalog(contents_collection).find_one(id_filter(content_id))
+
+    @staticmethod
+    def latest(content):
+        if "versions" in content:
+            return (content["versions"] or [None])[-1]
+        current = content.get("current_version")
+        if not current:
+            return None
+        return catalog(content_versions_collection).find_one({"_id": current["_id"]})
+
+    @staticmethod
+    def version(content, versionid):
+        if "versions" in content:
+            return next((v for v in reversed(content["versions"]) if v.get("versionid") == versionid), None)
+        return catalog(content_versions_collection).find_one(
+            {"content_id": content["_id"], "versionid": versionid}
+        )
+
+    @staticmethod
+    def history(content):
+        """
+        Every version without its payload, oldest first.
+        """
+        if "versions" in content:
+            return [{k: v for k, v in version.items() if k != "data"} for version in content["versions"]]
+        return list(
+            catalog(content_versions_collection)
+            .find({"content_id": content["_id"]}, {"data": 0})
+            .sort("_id", ASCENDING)
+        )
+
+    @staticmethod
+    def without_versions(content):
+        """
+        Content document for responses: legacy embedded versions collapsed to
+        the same current_version summary a migrated document has.
+        """
+        versions = content.pop("versions", None)
+        if versions:
+            latest = versions[-1]
+            content["current_version"] = {k: latest.get(k) for k in SUMMARY_FIELDS}
+            content["version_count"] = len(versions)
+        return content
+
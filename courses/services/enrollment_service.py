@@ -3,7 +3,41 @@ from typing import List
 from django.conf import settings
 from datetime import datetime
 
+from courseapi import events
+from courseapi.metrics import ENROLLMENT_ERRORS, ENROLLMENTS
 from courses import utils
+from courses.services.job_service import JobService, JobError
+from courses.services.membership_service import MembershipService
+from notifications.services import NotificationService
+
+
+def _counted(source, result, users=()):
+    if "error" in result:
+        ENROLLMENT_ERRORS.inc(source=source, error=result["error"])
+    else:
+        ENROLLMENTS.inc(len(users), source=source)
+        # their cached enrolled-course sets are stale now
+        MembershipService.changed(u.id for u in users)
+        _push(result, users)
+    return result
+
+
+def _push(result, users):
+    """
+    "enrollment" event to each user's open /api/events/ streams.
+    """
+    course = result["course"]
+    enrollments = result["enrollments"] if "enrollments" in result else [result["enrollment"]]
+    by_user = {e["user_id"]: e for e in enrollments}
+    for user in users:
+        enrollment = by_user.get(str(user.id), {})
+        events.publish(user.id, "enrollment", {
+            "course_id": course["_id"],
+            "course_title": course.get("course_title"),
+            "status": enrollment.get("status"),
+            "enrollment_id": enrollment.get("_id"),
+        })
+
 
 class EnrollmentService:
     @staticmethod
@@ -13,9 +47,9 @@ class EnrollmentService:
         Delegates to utils.enroll_user_in_course.
         """
         if not user or not getattr(user, "id", None):
-            return {"error": "invalid_user", "detail": "User not authenticated or invalid"}
+            return _counted("self", {"error": "invalid_user", "detail": "User not authenticated or invalid"})
 
-        return utils.enroll_user_in_course(user, course_id, status="self_enrolled")
+        return _counted("self", utils.enroll_user_in_course(user, course_id, status="self_enrolled"), [user])
 
     @staticmethod
     def assign_user(user, course_id: str, assigned_by_admin: bool = True):
@@ -23,9 +57,9 @@ class EnrollmentService:
         Admin assignment of single user (Option C behavior).
         """
         if not user or not getattr(user, "id", None):
-            return {"error": "invalid_user", "detail": "Invalid user"}
+            return _counted("assign", {"error": "invalid_user", "detail": "Invalid user"})
 
-        return utils.assign_user_to_course(user, course_id)
+        return _counted("assign", utils.assign_user_to_course(user, course_id), [user])
 
     @staticmethod
     def assign_multiple(users: List, course_id: str):
@@ -33,6 +67,53 @@ class EnrollmentService:
         Bulk assign list of Django User objects to a course.
         """
         if not isinstance(users, list):
-            return {"error": "invalid_argument", "detail": "users must be a list"}
+            return _counted("bulk", {"error": "invalid_argument", "detail": "users must be a list"})
+
+        return _counted("bulk", utils.assign_multiple_users_to_course(users, course_id), users)
+
+
+# --------------------------
+# Background bulk assignment (JobService)
+# --------------------------
+@JobService.register("assign_multiple")
+def assign_multiple_chunk(job, chunk):
+    """
+    One chunk of an assign-multiple / CSV cohort job. Items are user ids or
+    emails; unknown ones are counted as failed, users already enrolled in the
+    course are skipped, the rest are enrolled with one insert_many and emailed.
+    """
+    from accounts.models import User
+
+    ids = [int(item) for item in chunk if str(item).isdigit()]
+    emails = [item for item in chunk if isinstance(item, str) and "@" in item]
+
+    users = list(User.objects.filter(id__in=ids) | User.objects.with_emails(emails))
+    found = {str(u.id) for u in users} | {u.email.lower() for u in users}
+    invalid = [item for item in chunk if str(item).lower() not in found]
+
+    # a chunk re-run after a worker died (or a user listed twice, or already
+    # enrolled) must not be enrolled, counted and emailed again
+    course_id = job["payload"]["course_id"]
+    enrolled = utils.enrolled_user_ids(course_id, [str(u.id) for u in users])
+    users = [u for u in users if str(u.id) not in enrolled]
+
+    result = EnrollmentService.assign_multiple(users, course_id)
+    if "error" in result:
+        raise JobError(result["detail"])
+
+    course_title = result["course"]["course_title"]
+    errors = [{"item": item, "error": "invalid_user"} for item in invalid]
+
+    for user in users:
+        JobService.heartbeat(job)   # a chunk of emails can outlast a few minutes
+        try:
+            NotificationService.send(
+                event_name="COURSE_ENROLLED",
+                ctx={"username": user.username, "course": course_title},
+                to_email=user.email,
+                user_id=user.id,
+            )
+        except Exception:
+            errors.append({"item": user.id, "error": "email_failed"})
 
-        return utils.assign_multiple_users_to_course(users, course_id)
+    return {"processed": len(chunk), "failed": len(invalid), "errors": errors}
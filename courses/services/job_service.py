@@ -0,0 +1,183 @@
+# courses/services/job_service.py
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from django.conf import settings
+from django.db import close_old_connections
+from pymongo import ReturnDocument
+
+from courseapi.metrics import JOB_ITEMS
+from courses.utils import jobs_collection, convert_objectids
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, "JOB_WORKERS", 2),
+    thread_name_prefix="jobs",
+)
+
+# a "running" job whose heartbeat is older than this is picked up again. Handlers
+# beat at least every HEARTBEAT_EVERY while they work (JobService.heartbeat), and
+# this is also longer than a whole chunk takes (500 users emailed over SMTP)
+STALE_AFTER = timedelta(seconds=getattr(settings, "JOB_STALE_SECONDS", 30 * 60))
+HEARTBEAT_EVERY = timedelta(seconds=30)
+MAX_STORED_ERRORS = 200
+
+
+class JobError(Exception):
+    """Raised by a handler to fail the whole job (e.g. course not found)."""
+
+
+class JobService:
+    # job type -> handler(job, chunk) -> {"processed": n, "failed": n, "errors": [...]}
+    handlers = {}
+
+    @staticmethod
+    def register(job_type):
+        def decorator(fn):
+            JobService.handlers[job_type] = fn
+            return fn
+        return decorator
+
+    @staticmethod
+    def submit(job_type, items, payload=None, created_by=None):
+        """
+        Stores the job and hands it to the local worker pool. Returns the job doc
+        right away; progress is read back with JobService.get.
+        """
+        now = datetime.utcnow()
+        job = {
+            "type": job_type,
+            "status": "queued",
+            "payload": payload or {},
+            "items": items,
+            "total": len(items),
+            "cursor": 0,
+            "processed": 0,
+            "failed": 0,
+            "errors": [],
+            "created_by": created_by,
+            "created_at": now,
+            "updated_at": now,
+        }
+        jobs_collection.insert_one(job)
+        _executor.submit(JobService.run, job["_id"])
+        return job
+
+    @staticmethod
+    def get(job_id):
+        if not ObjectId.is_valid(job_id):
+            return None
+        # items can be large - status readers don't need them
+        return jobs_collection.find_one({"_id": ObjectId(job_id)}, {"items": 0})
+
+    @staticmethod
+    def public(job):
+        doc = convert_objectids({k: v for k, v in job.items() if k != "items"})
+        doc["id"] = doc.pop("_id")
+        return doc
+
+    # ------------------------------------------------------------------
+    # worker side
+    # ------------------------------------------------------------------
+    @staticmethod
+    def claim(job_id=None):
+        """
+        Atomically moves one job to "running" (queued, or running with a stale
+        heartbeat after a worker died). Only one worker can win a job.
+        """
+        now = datetime.utcnow()
+        query = {"$or": [
+            {"status": "queued"},
+            {"status": "running", "heartbeat_at": {"$lt": now - STALE_AFTER}},
+        ]}
+        if job_id is not None:
+            query["_id"] = job_id
+
+        return jobs_collection.find_one_and_update(
+            query,
+            {"$set": {"status": "running", "heartbeat_at": now, "updated_at": now}},
+            sort=[("created_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    @staticmethod
+    def heartbeat(job):
+        """
+        Called by handlers between items of a long chunk, so claim doesn't
+        take a job that is still being worked on for a dead one. Writes at
+        most every HEARTBEAT_EVERY.
+        """
+        now = datetime.utcnow()
+        if "_id" not in job or now - job.get("heartbeat_at", datetime.min) < HEARTBEAT_EVERY:
+            return
+        job["heartbeat_at"] = now
+        jobs_collection.update_one({"_id": job["_id"]}, {"$set": {"heartbeat_at": now}})
+
+    @staticmethod
+    def run(job_id=None):
+        close_old_connections()
+        try:
+            job = JobService.claim(job_id)
+            if job:
+                JobService._process(job)
+            return job
+        finally:
+            close_old_connections()
+
+    @staticmethod
+    def _process(job):
+        handler = JobService.handlers.get(job["type"])
+        chunk_size = getattr(settings, "JOB_CHUNK_SIZE", 500)
+        items = job["items"]
+
+        try:
+            if handler is None:
+                raise JobError(f"unknown job type {job['type']}")
+
+            # resumes from the last finished chunk if the job was picked up again
+            for start in range(job["cursor"], len(items), chunk_size):
+                chunk = items[start:start + chunk_size]
+                result = handler(job, chunk)
+                failed = result.get("failed", 0)
+                JOB_ITEMS.inc(result.get("processed", 0) - failed, type=job["type"], result="ok")
+                if failed:
+                    JOB_ITEMS.inc(failed, type=job["type"], result="failed")
+
+                now = datetime.utcnow()
+                jobs_collection.update_one(
+                    {"_id": job["_id"]},
+                    {
+                        "$inc": {
+                            "processed": result.get("processed", 0),
+                            "failed": result.get("failed", 0),
+                        },
+                        "$push": {"errors": {
+                            "$each": result.get("errors", []),
+                            "$slice": -MAX_STORED_ERRORS,
+                        }},
+                        "$set": {"cursor": start + len(chunk), "heartbeat_at": now, "updated_at": now},
+                    },
+                )
+                job["heartbeat_at"] = now
+        except Exception as exc:
+            if isinstance(exc, JobError):
+                logger.warning("job %s failed: %s", job["_id"], exc)
+            else:
+                logger.exception("job %s failed", job["_id"])
+            jobs_collection.update_one(
+                {"_id": job["_id"]},
+                {"$set": {
+                    "status": "failed",
+                    "detail": str(exc),
+                    "updated_at": datetime.utcnow(),
+                }},
+            )
+            return
+
+        jobs_collection.update_one(
+            {"_id": job["_id"]},
+            {"$set": {"status": "done", "finished_at": datetime.utcnow(), "updated_at": datetime.utcnow()}},
+        )
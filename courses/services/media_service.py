@@ -0,0 +1,142 @@
+# courses/services/media_service.py
+import hashlib
+import logging
+import os
+from datetime import datetime
+from urllib.parse import unquote, urlsplit
+
+from django.conf import settings
+
+from courses import mp4
+from courses.services.job_service import JobService
+from courses.utils import media_collection
+
+logger = logging.getLogger(__name__)
+
+HASH_CHUNK = 1024 * 1024
+
+# what content responses get (the full doc also has tracks, paths, ...)
+PUBLIC_FIELDS = (
+    "duration_seconds", "width", "height", "video_codec", "audio_codec",
+    "bitrate", "size", "faststart", "sha256",
+)
+
+
+def media_path(url):
+    """
+    "/media/videos/a.mp4" or "http://host/media/videos/a.mp4" -> "videos/a.mp4";
+    None for anything not under MEDIA_URL.
+    """
+    if not url:
+        return None
+    path = unquote(urlsplit(url).path)
+    if not path.startswith(settings.MEDIA_URL):
+        return None
+    relative = os.path.normpath(path[len(settings.MEDIA_URL):])
+    return None if relative.startswith("..") else relative
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_CHUNK), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class MediaService:
+    """
+    Video metadata (duration, resolution, codecs, bitrate) keyed by file
+    sha256, looked up by media path. Filled when a file is uploaded / first
+    referenced and by `manage.py index_media`; reads never open the file.
+    """
+
+    @staticmethod
+    def index_file(relative_path, digest=None):
+        absolute = os.path.join(settings.MEDIA_ROOT, relative_path)
+        stat = os.stat(absolute)
+        digest = digest or file_digest(absolute)
+
+        doc = media_collection.find_one({"_id": digest}, {"paths": 0})
+        if doc is None:
+            with open(absolute, "rb") as f:
+                try:
+                    meta = mp4.parse(f)
+                except mp4.MP4Error as exc:
+                    meta = {"error": str(exc)}
+            doc = {**meta, "size": stat.st_size}
+
+        # same bytes under another name: one doc, several paths
+        media_collection.update_one(
+            {"_id": digest},
+            {
+                "$set": {**{k: v for k, v in doc.items() if k != "_id"}, "indexed_at": datetime.utcnow()},
+                "$addToSet": {"paths": relative_path},
+            },
+            upsert=True,
+        )
+        return {**doc, "_id": digest}
+
+    @staticmethod
+    def for_paths(paths):
+        """
+        {path: public metadata} for the indexed ones, one query.
+        """
+        found = {}
+        if not paths:
+            return found
+        for doc in media_collection.find({"paths": {"$in": list(paths)}}):
+            public = {k: doc.get(k) for k in PUBLIC_FIELDS if k != "sha256"}
+            public["sha256"] = doc["_id"]
+            for path in doc["paths"]:
+                found[path] = public
+        return found
+
+    @staticmethod
+    def attach(contents):
+        """
+        Adds "media" to the versions (embedded, or the current_version
+        summary) of each content whose url points at an indexed file.
+        """
+        versions = []
+        for content in contents:
+            versions.extend(v for v in (content.get("versions") or []) if isinstance(v, dict))
+            if isinstance(content.get("current_version"), dict):
+                versions.append(content["current_version"])
+        MediaService.attach_versions(versions)
+        return contents
+
+    @staticmethod
+    def attach_versions(versions):
+        by_version = [(v, media_path(v.get("url"))) for v in versions]
+        found = MediaService.for_paths({p for _, p in by_version if p})
+        for version, path in by_version:
+            if path in found:
+                version["media"] = found[path]
+        return versions
+
+    @staticmethod
+    def index_later(urls):
+        """
+        Queues indexing for media urls that aren't indexed yet (content writes).
+        """
+        paths = {p for p in map(media_path, urls) if p}
+        if not paths:
+            return None
+        known = set(MediaService.for_paths(paths))
+        missing = sorted(p for p in paths - known
+                         if os.path.isfile(os.path.join(settings.MEDIA_ROOT, p)))
+        if not missing:
+            return None
+        return JobService.submit("index_media", items=missing)
+
+
+@JobService.register("index_media")
+def index_media_chunk(job, chunk):
+    errors = []
+    for path in chunk:
+        try:
+            MediaService.index_file(path)
+        except OSError as exc:
+            errors.append({"item": path, "error": str(exc)})
+    return {"processed": len(chunk), "failed": len(errors), "errors": errors}
@@ -0,0 +1,85 @@
+# courses/services/membership_service.py
+from django.conf import settings
+from django.core.cache import cache
+
+from courses.utils import enrollment_collection
+
+
+def _key(user_id):
+    return f"membership:{user_id}"
+
+
+def shared_cache():
+    """
+    True when the default cache is one every process sees (Redis, files).
+    Enrollments are also written by `run_jobs`, a separate process: with a
+    per-process cache its invalidations never reach the web workers.
+    """
+    backend = settings.CACHES["default"]["BACKEND"]
+    return not backend.endswith((".LocMemCache", ".DummyCache"))
+
+
+def _read(user_id):
+    return frozenset(
+        str(doc["course_id"])
+        for doc in enrollment_collection.find({"user_id": str(user_id)}, {"course_id": 1, "_id": 0})
+    )
+
+
+class MembershipService:
+    """
+    "Is user U enrolled in course C?" from a per-user set of enrolled course
+    ids kept in the cache: one indexed enrollments read per user per
+    MEMBERSHIP_CACHE_SECONDS, then O(1) per check. EnrollmentService drops the
+    set of every user it enrolls, so the next check sees the new enrollment.
+
+    With a per-process cache (locmem) the sets live MEMBERSHIP_LOCAL_CACHE_SECONDS
+    only: an enrollment written by another process (run_jobs) shows up after at
+    most that long, ones written by this process right away.
+    """
+
+    @staticmethod
+    def enrolled_ids(user_id, fresh=False):
+        """
+        frozenset of course ids (str) user_id is enrolled in. fresh=True
+        re-reads Mongo (and re-caches): for denying access on a cached miss.
+        """
+        if shared_cache():
+            timeout = settings.MEMBERSHIP_CACHE_SECONDS
+        else:
+            timeout = settings.MEMBERSHIP_LOCAL_CACHE_SECONDS
+        if not timeout:
+            return _read(user_id)
+
+        key = _key(user_id)
+        ids = None if fresh else cache.get(key)
+        if ids is None:
+            ids = _read(user_id)
+            cache.set(key, ids, timeout=timeout)
+        return ids
+
+    @staticmethod
+    def is_enrolled(user_id, course_id):
+        return str(course_id) in MembershipService.enrolled_ids(user_id)
+
+    @staticmethod
+    def check(user_id, course_ids):
+        enrolled = MembershipService.enrolled_ids(user_id)
+        return {str(c): str(c) in enrolled for c in course_ids}
+
+    @staticmethod
+    def annotate(user_id, docs):
+        """
+        Sets is_enrolled on course docs (already converted: _id is a str).
+        """
+        enrolled = MembershipService.enrolled_ids(user_id)
+        for doc in docs:
+            doc["is_enrolled"] = str(doc.get("_id")) in enrolled
+        return docs
+
+    @staticmethod
+    def changed(user_ids):
+        """
+        Call after enrollments for user_ids were written.
+        """
+        cache.delete_many([_key(u) for u in user_ids])
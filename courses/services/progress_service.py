@@ -0,0 +1,246 @@
+# courses/services/progress_service.py
+import atexit
+import logging
+import threading
+import time
+from datetime import datetime
+
+from django.conf import settings
+from django.db import close_old_connections
+from pymongo import UpdateOne
+
+from courses.utils import (
+    catalog,
+    find_course,
+    progress_collection,
+    modules_collection,
+    topics_collection,
+    contents_collection,
+)
+from courses.services.membership_service import MembershipService
+from notifications.services import NotificationService
+
+logger = logging.getLogger(__name__)
+
+# (percent threshold, flag stored on the progress doc, notification event)
+MILESTONES = [
+    (50.0, "notified_50", "COURSE_50_PERCENT"),
+    (100.0, "notified_completed", "COURSE_COMPLETED"),
+]
+
+
+# --------------------------
+# Course content ids (cached, so heartbeats never hit Mongo)
+# --------------------------
+_content_cache = {}
+_content_lock = threading.Lock()
+
+
+def course_content_ids(course_id):
+    """
+    Set of content ids under course -> modules -> topics -> contents.
+    Cached per process for PROGRESS_CONTENT_CACHE_SECONDS.
+    """
+    now = time.monotonic()
+    cached = _content_cache.get(course_id)
+    if cached and cached[0] > now:
+        return cached[1]
+
+    module_ids = [str(m["_id"]) for m in catalog(modules_collection).find({"course_id": course_id}, {"_id": 1})]
+    topic_ids = [str(t["_id"]) for t in catalog(topics_collection).find({"module_id": {"$in": module_ids}}, {"_id": 1})]
+    content_ids = frozenset(
+        str(c["_id"]) for c in catalog(contents_collection).find({"topic_id": {"$in": topic_ids}}, {"_id": 1})
+    )
+
+    with _content_lock:
+        _content_cache[course_id] = (now + settings.PROGRESS_CONTENT_CACHE_SECONDS, content_ids)
+    return content_ids
+
+
+# --------------------------
+# In-memory coalescing buffer
+# --------------------------
+class ProgressBuffer:
+    """
+    Collects events per (user, course) and writes them with one bulk_write per
+    flush. A player heartbeat every few seconds costs a dict update, not a write.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._thread = None
+
+    def add(self, user, events):
+        accepted = 0
+        with self._lock:
+            for event in events:
+                key = (str(user.id), event["course_id"])
+                entry = self._pending.get(key)
+                if entry is None:
+                    entry = self._pending[key] = {
+                        "username": user.username,
+                        "email": user.email,
+                        "viewed": set(),
+                        "completed": set(),
+                        "last_event_at": event["at"],
+                    }
+                entry["completed" if event["event"] == "completed" else "viewed"].add(event["content_id"])
+                entry["last_event_at"] = max(entry["last_event_at"], event["at"])
+                accepted += 1
+            too_many = len(self._pending) >= settings.PROGRESS_FLUSH_MAX_KEYS
+
+        self._ensure_flusher()
+        if too_many:
+            try:
+                self.flush()
+            except Exception:   # kept in the buffer; the flusher retries
+                logger.exception("progress flush failed")
+        return accepted
+
+    def _ensure_flusher(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._loop, name="progress-flush", daemon=True)
+                    self._thread.start()
+
+    def _loop(self):
+        while True:
+            time.sleep(settings.PROGRESS_FLUSH_SECONDS)
+            # notifications read the ORM from this thread
+            close_old_connections()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("progress flush failed")
+            finally:
+                close_old_connections()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending:
+            try:
+                ProgressService.write(pending)
+            except Exception:
+                self._restore(pending)
+                raise
+        return len(pending)
+
+    def _restore(self, pending):
+        # a failed write goes back into the buffer, merged with what arrived since
+        with self._lock:
+            for key, entry in pending.items():
+                current = self._pending.get(key)
+                if current is None:
+                    self._pending[key] = entry
+                    continue
+                current["viewed"] |= entry["viewed"]
+                current["completed"] |= entry["completed"]
+                current["last_event_at"] = max(current["last_event_at"], entry["last_event_at"])
+
+
+buffer = ProgressBuffer()
+atexit.register(buffer.flush)
+
+
+class NotEnrolled(Exception):
+    def __init__(self, course_ids):
+        super().__init__(f"not enrolled in {', '.join(course_ids)}")
+        self.course_ids = course_ids
+
+
+class ProgressService:
+    @staticmethod
+    def record(user, events):
+        """
+        events: [{"course_id", "content_id", "event": "viewed"|"completed"}].
+        Events for content outside the course are dropped. Returns (accepted, rejected).
+        NotEnrolled (nothing recorded) when the user isn't enrolled in one of the courses.
+        """
+        course_ids = {e["course_id"] for e in events}
+        not_enrolled = course_ids - MembershipService.enrolled_ids(user.id)
+        if not_enrolled:
+            # the cached set may predate an enrollment made through another process
+            not_enrolled = course_ids - MembershipService.enrolled_ids(user.id, fresh=True)
+        if not_enrolled:
+            raise NotEnrolled(sorted(not_enrolled))
+
+        now = datetime.utcnow()
+        valid = []
+        for event in events:
+            if event["content_id"] in course_content_ids(event["course_id"]):
+                valid.append({**event, "at": now})
+
+        buffer.add(user, valid)
+        return len(valid), len(events) - len(valid)
+
+    @staticmethod
+    def write(pending):
+        """
+        One upsert per (user, course), then percent + milestone notifications.
+        """
+        ops = []
+        for (user_id, course_id), entry in pending.items():
+            ops.append(UpdateOne(
+                {"_id": f"{user_id}:{course_id}"},
+                {
+                    "$setOnInsert": {"user_id": user_id, "course_id": course_id},
+                    "$addToSet": {
+                        "completed_content_ids": {"$each": sorted(entry["completed"])},
+                        "viewed_content_ids": {"$each": sorted(entry["viewed"])},
+                    },
+                    "$max": {"last_event_at": entry["last_event_at"]},
+                },
+                upsert=True,
+            ))
+        progress_collection.bulk_write(ops, ordered=False)
+
+        docs = progress_collection.find(
+            {"_id": {"$in": [f"{u}:{c}" for u, c in pending]}},
+            {"user_id": 1, "course_id": 1, "completed_content_ids": 1, "notified_50": 1, "notified_completed": 1},
+        )
+
+        percent_ops = []
+        for doc in docs:
+            total = len(course_content_ids(doc["course_id"]))
+            done = len(doc.get("completed_content_ids", []))
+            percent = round(min(100.0, done * 100.0 / total), 2) if total else 0.0
+            percent_ops.append(UpdateOne({"_id": doc["_id"]}, {"$set": {"percent": percent}}))
+
+            entry = pending[(doc["user_id"], doc["course_id"])]
+            for threshold, flag, event_name in MILESTONES:
+                if percent >= threshold and not doc.get(flag):
+                    ProgressService._notify_once(doc, flag, event_name, entry)
+
+        if percent_ops:
+            progress_collection.bulk_write(percent_ops, ordered=False)
+
+    @staticmethod
+    def _notify_once(doc, flag, event_name, entry):
+        # the conditional update is the "exactly once": only one worker flips the flag
+        res = progress_collection.update_one(
+            {"_id": doc["_id"], flag: {"$ne": True}},
+            {"$set": {flag: True}},
+        )
+        if res.modified_count != 1:
+            return
+
+        course = find_course(doc["course_id"]) or {}
+        try:
+            NotificationService.send(
+                event_name=event_name,
+                ctx={"username": entry["username"], "course": course.get("course_title", "")},
+                to_email=entry["email"],
+                user_id=doc["user_id"],
+            )
+        except Exception:
+            logger.exception("progress notification %s failed for %s", event_name, doc["_id"])
+
+    @staticmethod
+    def for_user(user, course_id=None):
+        query = {"user_id": str(user.id)}
+        if course_id:
+            query["course_id"] = course_id
+        return list(progress_collection.find(query, {"viewed_content_ids": 0}))
@@ -0,0 +1,122 @@
+# courses/services/ranking_service.py
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+
+from django.conf import settings
+
+from courses.utils import catalog, courses_collection, enrollment_collection, convert_objectids
+
+logger = logging.getLogger(__name__)
+
+# fields a rail needs - not the whole course document
+RAIL_PROJECTION = {
+    "course_title": 1,
+    "segment": 1,
+    "course_type": 1,
+    "image_url": 1,
+    "enrollers": 1,
+    "difficulty_level": 1,
+    "course_duration": 1,
+    "display_price": 1,
+    "metadata.category.name": 1,
+}
+
+
+class RankingService:
+    """
+    Top-K "popular" (by enrollers) and "trending" (enrollments in the last
+    RANKINGS_TRENDING_DAYS) per segment x category, held in memory and rebuilt
+    every RANKINGS_REFRESH_SECONDS. Reads are dict lookups + a slice.
+    """
+    _lock = threading.Lock()
+    _refreshing = False
+    _expires = 0.0
+    _rails = {"popular": {}, "trending": {}}
+
+    @staticmethod
+    def popular(segment=None, category=None, limit=None):
+        return RankingService._read("popular", segment, category, limit)
+
+    @staticmethod
+    def trending(segment=None, category=None, limit=None):
+        return RankingService._read("trending", segment, category, limit)
+
+    @staticmethod
+    def _read(kind, segment, category, limit):
+        RankingService._ensure_fresh()
+        k = settings.RANKINGS_TOP_K
+        limit = k if limit is None else max(1, min(limit, k))
+        return RankingService._rails[kind].get((segment, category), [])[:limit]
+
+    @staticmethod
+    def _ensure_fresh():
+        if RankingService._expires > time.monotonic():
+            return
+
+        if not RankingService._rails["popular"]:
+            # first use in this process: build synchronously
+            with RankingService._lock:
+                if RankingService._expires <= time.monotonic():
+                    RankingService.refresh()
+            return
+
+        # stale: keep serving the old rails while one thread rebuilds them
+        with RankingService._lock:
+            if RankingService._refreshing:
+                return
+            RankingService._refreshing = True
+        threading.Thread(target=RankingService._refresh_in_background, daemon=True).start()
+
+    @staticmethod
+    def _refresh_in_background():
+        try:
+            RankingService.refresh()
+        except Exception:
+            logger.exception("rankings refresh failed")
+        finally:
+            RankingService._refreshing = False
+
+    @staticmethod
+    def refresh():
+        k = settings.RANKINGS_TOP_K
+        courses = [convert_objectids(c) for c in catalog(courses_collection).find({}, RAIL_PROJECTION)]
+
+        cutoff = datetime.utcnow() - timedelta(days=settings.RANKINGS_TRENDING_DAYS)
+        recent = {}
+        # created_at / course_id may still be strings on unmigrated enrollments
+        for row in catalog(enrollment_collection).aggregate([
+            {"$match": {"$or": [
+                {"created_at": {"$gte": cutoff}},
+                {"created_at": {"$gte": cutoff.isoformat()}},
+            ]}},
+            {"$group": {"_id": "$course_id", "count": {"$sum": 1}}},
+        ]):
+            course_id = str(row["_id"])
+            recent[course_id] = recent.get(course_id, 0) + row["count"]
+
+        # every course lands in 4 buckets: all, its segment, its category, both
+        buckets = {}
+        for course in courses:
+            segment = course.get("segment") or None
+            category = ((course.get("metadata") or {}).get("category") or {}).get("name")
+            for key in {(None, None), (segment, None), (None, category), (segment, category)}:
+                buckets.setdefault(key, []).append(course)
+
+        popular, trending = {}, {}
+        for key, docs in buckets.items():
+            popular[key] = heapq.nlargest(k, docs, key=lambda c: c.get("enrollers") or 0)
+
+            hot = [c for c in docs if recent.get(c["_id"])]
+            trending[key] = [
+                {**c, "recent_enrollments": recent[c["_id"]]}
+                for c in heapq.nlargest(
+                    k, hot, key=lambda c: (recent[c["_id"]], c.get("enrollers") or 0)
+                )
+            ]
+
+        RankingService._rails = {"popular": popular, "trending": trending}
+        RankingService._expires = time.monotonic() + settings.RANKINGS_REFRESH_SECONDS
+        return len(courses)
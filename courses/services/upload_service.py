@@ -0,0 +1,221 @@
+# courses/services/upload_service.py
+import hashlib
+import logging
+import os
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from django.conf import settings
+from pymongo import ReturnDocument
+
+from courses.services.media_service import MediaService, file_digest
+from courses.utils import uploads_collection
+
+logger = logging.getLogger(__name__)
+
+READ_BLOCK = 1024 * 1024
+
+
+class UploadError(Exception):
+    def __init__(self, code, detail, status=400):
+        super().__init__(detail)
+        self.code, self.detail, self.status = code, detail, status
+
+
+def _part_path(upload_id):
+    return os.path.join(settings.MEDIA_ROOT, settings.UPLOAD_TMP_DIR, f"{upload_id}.part")
+
+
+def _extension(path):
+    """
+    Stored extension from the file's first bytes, never from the client's
+    filename: ISO BMFF (ftyp box) -> .mp4 / .mov, WebM -> .webm, else .bin.
+    """
+    with open(path, "rb") as f:
+        head = f.read(12)
+    if head[4:8] == b"ftyp":
+        return ".mov" if head[8:12] == b"qt  " else ".mp4"
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return ".webm"
+    return ".bin"
+
+
+class UploadService:
+    """
+    Resumable chunked uploads straight to disk.
+
+    init -> PUT chunk i (any order, in parallel) -> finalize. Chunk i covers
+    bytes [i * chunk_size, (i + 1) * chunk_size) of a sparse .part file and is
+    written with os.pwrite as it streams in, so memory per request is one
+    READ_BLOCK. Each chunk's sha256 is checked against X-Chunk-Sha256 and
+    recorded; status tells a client which chunks to (re)send after a drop.
+    Finalize moves the file to videos/<sha256><ext> (content addressed: the
+    same bytes uploaded twice are stored once, no _AbC123 renames). The target
+    path is recorded before the rename, so a finalize that failed after it is
+    retried from the stored file.
+    """
+
+    @staticmethod
+    def init(user, filename, size, sha256=None):
+        if size <= 0 or size > settings.UPLOAD_MAX_BYTES:
+            raise UploadError("invalid_size", f"size must be 1..{settings.UPLOAD_MAX_BYTES} bytes")
+
+        chunk_size = settings.UPLOAD_CHUNK_BYTES
+        now = datetime.utcnow()
+        upload = {
+            "filename": os.path.basename(filename),
+            "size": size,
+            "chunk_size": chunk_size,
+            "chunk_count": -(-size // chunk_size),
+            "sha256": sha256.lower() if sha256 else None,
+            "chunks": {},       # "index" -> sha256 of the bytes received
+            "status": "open",
+            "created_by": str(user.id),
+            "created_at": now,
+            "expires_at": now + timedelta(hours=settings.UPLOAD_EXPIRE_HOURS),
+        }
+        uploads_collection.insert_one(upload)
+
+        part = _part_path(upload["_id"])
+        os.makedirs(os.path.dirname(part), exist_ok=True)
+        with open(part, "wb") as f:
+            f.truncate(size)   # sparse: no disk blocks until chunks land
+        return upload
+
+    @staticmethod
+    def get(user, upload_id):
+        if not ObjectId.is_valid(upload_id):
+            raise UploadError("not_found", "Upload not found", status=404)
+        upload = uploads_collection.find_one({"_id": ObjectId(upload_id), "created_by": str(user.id)})
+        if upload is None:
+            raise UploadError("not_found", "Upload not found", status=404)
+        return upload
+
+    @staticmethod
+    def write_chunk(user, upload_id, index, stream, length, expected_sha256=None):
+        upload = UploadService.get(user, upload_id)
+        if upload["status"] != "open":
+            raise UploadError("not_open", f"upload is {upload['status']}", status=409)
+        if not 0 <= index < upload["chunk_count"]:
+            raise UploadError("invalid_chunk", f"chunk index must be 0..{upload['chunk_count'] - 1}")
+
+        offset = index * upload["chunk_size"]
+        expected_length = min(upload["chunk_size"], upload["size"] - offset)
+        if length != expected_length:
+            raise UploadError("invalid_length", f"chunk {index} must be {expected_length} bytes")
+
+        digest = hashlib.sha256()
+        written = 0
+        fd = os.open(_part_path(upload["_id"]), os.O_WRONLY)
+        try:
+            while written < length:
+                block = stream.read(min(READ_BLOCK, length - written))
+                if not block:
+                    break
+                digest.update(block)
+                os.pwrite(fd, block, offset + written)
+                written += len(block)
+        finally:
+            os.close(fd)
+
+        if written != length:
+            raise UploadError("incomplete_chunk", f"got {written} of {length} bytes; resend chunk {index}")
+        sha256 = digest.hexdigest()
+        if expected_sha256 and expected_sha256.lower() != sha256:
+            raise UploadError("checksum_mismatch", f"chunk {index} sha256 is {sha256}; resend it")
+
+        # per-chunk key: parallel chunk requests never overwrite each other
+        uploads_collection.update_one(
+            {"_id": upload["_id"], "status": "open"},
+            {"$set": {f"chunks.{index}": sha256}},
+        )
+        return {"index": index, "sha256": sha256}
+
+    @staticmethod
+    def status(upload):
+        received = sorted(int(i) for i in upload.get("chunks", {}))
+        done = set(received)
+        return {
+            "id": str(upload["_id"]),
+            "filename": upload["filename"],
+            "size": upload["size"],
+            "chunk_size": upload["chunk_size"],
+            "chunk_count": upload["chunk_count"],
+            "status": upload["status"],
+            "received": received,
+            "missing": [i for i in range(upload["chunk_count"]) if i not in done],
+            "url": upload.get("url"),
+            "expires_at": upload["expires_at"],
+        }
+
+    @staticmethod
+    def finalize(user, upload_id):
+        upload = UploadService.get(user, upload_id)
+        if upload["status"] == "done":
+            return upload
+
+        missing = UploadService.status(upload)["missing"]
+        if missing:
+            raise UploadError("incomplete", f"missing chunks: {missing[:20]}", status=409)
+
+        # only one finalize runs; the others see "finalizing"
+        upload = uploads_collection.find_one_and_update(
+            {"_id": upload["_id"], "status": "open"},
+            {"$set": {"status": "finalizing"}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if upload is None:
+            raise UploadError("not_open", "upload is already being finalized", status=409)
+
+        try:
+            return UploadService._finalize(upload)
+        except Exception:
+            uploads_collection.update_one({"_id": upload["_id"]}, {"$set": {"status": "open"}})
+            raise
+
+    @staticmethod
+    def _finalize(upload):
+        part = _part_path(upload["_id"])
+        relative = upload.get("path")
+        if relative is None:
+            sha256 = file_digest(part)
+            if upload["sha256"] and upload["sha256"] != sha256:
+                raise UploadError("checksum_mismatch", f"file sha256 is {sha256}, expected {upload['sha256']}")
+            relative = os.path.join(settings.UPLOAD_DEST_DIR, f"{sha256}{_extension(part)}")
+            uploads_collection.update_one({"_id": upload["_id"]}, {"$set": {"path": relative, "sha256": sha256}})
+        else:
+            sha256 = upload["sha256"]   # an earlier finalize got past the rename
+
+        final = os.path.join(settings.MEDIA_ROOT, relative)
+        if os.path.exists(part):
+            os.makedirs(os.path.dirname(final), exist_ok=True)
+            if os.path.exists(final):
+                os.remove(part)           # same bytes already stored
+            else:
+                os.replace(part, final)   # same filesystem: atomic rename, no copy
+
+        media = MediaService.index_file(relative, digest=sha256)
+        url = settings.MEDIA_URL + relative.replace(os.sep, "/")
+        uploads_collection.update_one(
+            {"_id": upload["_id"]},
+            {"$set": {"status": "done", "url": url, "finished_at": datetime.utcnow()}},
+        )
+        return {**upload, "status": "done", "url": url, "path": relative, "sha256": sha256, "media": media}
+
+    @staticmethod
+    def expire():
+        """
+        Drops unfinished uploads past expires_at and their .part files.
+        """
+        removed = 0
+        for upload in uploads_collection.find(
+            {"status": {"$in": ["open", "finalizing"]}, "expires_at": {"$lt": datetime.utcnow()}},
+            {"_id": 1},
+        ):
+            try:
+                os.remove(_part_path(upload["_id"]))
+            except FileNotFoundError:
+                pass
+            uploads_collection.delete_one({"_id": upload["_id"]})
+            removed += 1
+        return removed
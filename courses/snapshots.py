@@ -0,0 +1,153 @@
+# courses/snapshots.py
+"""
+Pre-rendered first catalog page per (segment, course_type).
+
+Each snapshot is the exact JSON bytes CourseViewSet.list would render, plus
+gzip and brotli variants, kept in the Django cache. Rows carry
+is_enrolled: false, so a snapshot is only served to users enrolled in none of
+its course_ids (the view checks); everyone else gets the live query. Course writes bump a
+generation counter (all snapshots go stale at once); the TTL and
+`manage.py refresh_catalog_snapshots` cover enrollers counters changing.
+"""
+import gzip
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.renderers import JSONRenderer
+
+from .utils import catalog, catalog_filter, courses_collection, get_courses
+
+SNAPSHOT_LIMIT = 10
+SNAPSHOT_PARAMS = {"segment", "course_type", "page", "limit"}
+GENERATION_KEY = "catalog-snapshot:generation"
+
+
+# --------------------------
+# Keys / invalidation
+# --------------------------
+def _generation():
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        cache.add(GENERATION_KEY, 1, timeout=None)
+        generation = cache.get(GENERATION_KEY, 1)
+    return generation
+
+
+def _key(segment, course_type):
+    return f"catalog-snapshot:{_generation()}:{segment or '*'}:{course_type or '*'}"
+
+
+def invalidate_snapshots():
+    """
+    Call after any course write. O(1): old keys just stop being read.
+    """
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.add(GENERATION_KEY, 1, timeout=None)
+
+
+# --------------------------
+# Build / read
+# --------------------------
+def _brotli():
+    # imported on first build, not at worker start
+    try:
+        import brotli
+    except ImportError:   # optional: without it only gzip/identity are served
+        return None
+    return brotli
+
+
+def snapshot_params(params):
+    """
+    (segment, course_type) when a list request is a first catalog page we
+    snapshot, otherwise None.
+    """
+    if not set(params.keys()) <= SNAPSHOT_PARAMS:
+        return None
+    if params.get("page", "1") != "1" or params.get("limit", str(SNAPSHOT_LIMIT)) != str(SNAPSHOT_LIMIT):
+        return None
+
+    values = []
+    for name in ("segment", "course_type"):
+        value = params.get(name)
+        if value is not None:
+            value = value.strip("[]")
+            # multi-value filters ("a,b") are not snapshotted
+            if not value or "," in value:
+                return None
+        values.append(value)
+    return tuple(values)
+
+
+def build_snapshot(segment=None, course_type=None):
+    params = {}
+    if segment:
+        params["segment"] = segment
+    if course_type:
+        params["course_type"] = course_type
+
+    docs, total = get_courses(page=1, limit=SNAPSHOT_LIMIT, extra_query=catalog_filter(params))
+    for doc in docs:
+        doc["is_enrolled"] = False
+
+    # same payload + renderer as CourseViewSet.list
+    body = JSONRenderer().render({
+        "total": total,
+        "page": 1,
+        "limit": SNAPSHOT_LIMIT,
+        "results": docs
+    })
+
+    snapshot = {
+        "course_ids": frozenset(doc["_id"] for doc in docs),
+        "identity": body,
+        "gzip": gzip.compress(body, compresslevel=6),
+    }
+    brotli = _brotli()
+    if brotli is not None:
+        snapshot["br"] = brotli.compress(body, quality=9)
+
+    cache.set(_key(segment, course_type), snapshot, timeout=settings.CATALOG_SNAPSHOT_TTL)
+    return snapshot
+
+
+def get_snapshot(segment=None, course_type=None):
+    snapshot = cache.get(_key(segment, course_type))
+    if snapshot is None or "course_ids" not in snapshot:
+        snapshot = build_snapshot(segment, course_type)
+    return snapshot
+
+
+def refresh_all_snapshots():
+    """
+    Rebuild every segment x course_type combination (plus the unfiltered ones).
+    """
+    courses = catalog(courses_collection)
+    segments = [None] + [s for s in courses.distinct("segment") if s]
+    course_types = [None] + [t for t in courses.distinct("course_type") if t]
+
+    built = 0
+    for segment in segments:
+        for course_type in course_types:
+            build_snapshot(segment, course_type)
+            built += 1
+    return built
+
+
+# --------------------------
+# Content-Encoding negotiation
+# --------------------------
+def pick_encoding(snapshot, accept_encoding):
+    accepted = set()
+    for part in (accept_encoding or "").split(","):
+        name, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0"):
+            continue
+        accepted.add(name.strip().lower())
+
+    for encoding in ("br", "gzip"):
+        if encoding in snapshot and (encoding in accepted or "*" in accepted):
+            return encoding
+    return "identity"
@@ -1,3 +1,1425 @@
-from django.test import TestCase
+# courses/tests.py
+"""
+Course API tests. The course data lives in Mongo: by default mongomock (in
+memory), swapped in for pymongo.MongoClient before courses.utils creates its
+client, so no mongod is needed.
 
-# Create your tests here.
+MONGO_TEST_URI=mongodb://localhost:27017/ runs the same tests against a real
+mongod instead (database MONGO_TEST_DB, default courseapi_test, emptied before
+every test) and enables the query-plan tests, which need explain() and the
+profiler.
+"""
+import os
+
+import mongomock
+import pymongo
+
+MONGO_TEST_URI = os.environ.get("MONGO_TEST_URI")
+if MONGO_TEST_URI:
+    os.environ["MONGO_URI"] = MONGO_TEST_URI
+    os.environ["MONGO_DB"] = os.environ.get("MONGO_TEST_DB", "courseapi_test")
+else:
+    pymongo.MongoClient = mongomock.MongoClient
+
+    def _without_sort(add):
+        # pymongo >= 4.11 passes sort= to UpdateOne / ReplaceOne in bulk_write;
+        # mongomock 4.3's bulk builder predates it (the app never sets one)
+        def wrapper(self, *args, sort=None, **kwargs):
+            if sort is not None:
+                raise NotImplementedError("mongomock: sort in bulk updates")
+            return add(self, *args, **kwargs)
+        return wrapper
+
+    for _name in ("add_update", "add_replace"):
+        setattr(mongomock.collection.BulkOperationBuilder, _name,
+                _without_sort(getattr(mongomock.collection.BulkOperationBuilder, _name)))
+
+import asyncio  # noqa: E402
+import copy  # noqa: E402
+import io  # noqa: E402
+import itertools  # noqa: E402
+import random  # noqa: E402
+import struct  # noqa: E402
+import tempfile  # noqa: E402
+from datetime import datetime, timedelta, timezone  # noqa: E402
+from unittest import mock, skipUnless  # noqa: E402
+
+from bson import ObjectId  # noqa: E402
+from django.contrib.auth import get_user_model  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.test import SimpleTestCase, TestCase, override_settings  # noqa: E402
+from rest_framework.test import APIClient  # noqa: E402
+
+from courses import mp4, renderers, utils  # noqa: E402
+from courses.management.commands.bench_validation import (  # noqa: E402
+    sample_content,
+    sample_course,
+    sample_topic,
+)
+from courses.serializers import ContentSerializer, CourseSerializer, TopicSerializer  # noqa: E402
+from courses.validation import compiled  # noqa: E402
+
+if utils.db.name == "bookdb" and not isinstance(utils.client, mongomock.MongoClient):
+    # courses.utils was imported before this module could point it elsewhere
+    raise RuntimeError("courses tests would run against the bookdb database")
+
+# pymongo's or mongomock's Collection, whichever the tests run on
+Collection = type(utils.courses_collection)
+
+User = get_user_model()
+
+
+class MongoRoundTrips:
+    """
+    Counts the Mongo operations sent inside the block: one per outermost
+    collection call (mongomock's own nested calls, e.g. find_one -> find,
+    aren't round trips).
+    """
+    OPERATIONS = (
+        "find", "find_one", "find_one_and_update", "find_one_and_delete",
+        "insert_one", "insert_many", "update_one", "update_many", "replace_one",
+        "delete_one", "delete_many", "bulk_write", "aggregate", "distinct",
+        "count_documents", "estimated_document_count",
+    )
+
+    def __enter__(self):
+        self.calls = []
+        self._depth = 0
+        self._patches = [
+            mock.patch.object(Collection, name, self._counted(name, getattr(Collection, name)))
+            for name in self.OPERATIONS
+        ]
+        for patch in self._patches:
+            patch.start()
+        return self
+
+    def __exit__(self, *exc):
+        for patch in self._patches:
+            patch.stop()
+
+    def _counted(self, name, method):
+        def counted(collection, *args, **kwargs):
+            if self._depth == 0:
+                self.calls.append(f"{collection.name}.{name}")
+            self._depth += 1
+            try:
+                return method(collection, *args, **kwargs)
+            finally:
+                self._depth -= 1
+        return counted
+
+
+class MongoTestCase(TestCase):
+    """
+    Empty Mongo database (indexes created) and cache for every test; self.api is an
+    authenticated client for self.user (client_for(self.admin) for admin calls).
+    """
+
+    def setUp(self):
+        for name in utils.db.list_collection_names():
+            utils.db.drop_collection(name)
+        utils.ensure_indexes()
+        cache.clear()
+        self.user = User.objects.create_user("learner", "learner@example.com", "pw")
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "pw")
+        self.api = self.client_for(self.user)
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def make_course(self, **fields):
+        course = {"course_title": "Python", "segment": "tech", "course_type": "self_paced",
+                  "enrollers": 0, "assigned_users": [], **fields}
+        utils.courses_collection.insert_one(course)
+        return course
+
+
+# --------------------------
+# Write paths: Mongo round trips
+# --------------------------
+class WriteRoundTripTests(MongoTestCase):
+
+    def test_create_module_is_one_insert(self):
+        with MongoRoundTrips() as trips:
+            response = self.api.post("/api/modules/", {"course_id": "c1", "title": "Intro"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(trips.calls, ["modules.insert_one"])
+        self.assertEqual(response.json()["title"], "Intro")
+
+    def test_create_course_is_one_insert(self):
+        admin_api = self.client_for(self.admin)
+        with MongoRoundTrips() as trips:
+            response = admin_api.post("/api/courses/", {"course_title": "Go", "segment": "tech"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(trips.calls, ["courses.insert_one"])
+
+    def test_enroll_is_update_plus_insert(self):
+        course = self.make_course()
+        with MongoRoundTrips() as trips:
+            result = utils.enroll_user_in_course(self.user, str(course["_id"]))
+        self.assertEqual(trips.calls, ["courses.find_one_and_update", "enrollments.insert_one"])
+        self.assertEqual(result["course"]["enrollers"], 1)
+
+    def test_assign_is_update_plus_insert(self):
+        course = self.make_course()
+        with MongoRoundTrips() as trips:
+            result = utils.assign_user_to_course(self.user, str(course["_id"]))
+        self.assertEqual(trips.calls, ["courses.find_one_and_update", "enrollments.insert_one"])
+        self.assertEqual(result["enrollment"]["status"], "assigned")
+
+    def test_assign_multiple_is_two_round_trips_for_any_number_of_users(self):
+        course = self.make_course()
+        users = [User.objects.create_user(f"u{i}", f"u{i}@example.com", "pw") for i in range(5)]
+        with MongoRoundTrips() as trips:
+            result = utils.assign_multiple_users_to_course(users, str(course["_id"]))
+        self.assertEqual(trips.calls, ["courses.find_one_and_update", "enrollments.insert_many"])
+        self.assertEqual(len(result["enrollments"]), 5)
+        self.assertEqual(result["course"]["enrollers"], 5)
+
+    def test_enroll_unknown_course_is_one_round_trip(self):
+        with MongoRoundTrips() as trips:
+            result = utils.enroll_user_in_course(self.user, str(ObjectId()))
+        self.assertEqual(result["error"], "course_not_found")
+        self.assertEqual(trips.calls, ["courses.find_one_and_update"])
+
+    def test_failed_enrollment_insert_uncounts_the_course(self):
+        course = self.make_course()
+        with mock.patch.object(Collection, "insert_one", side_effect=pymongo.errors.AutoReconnect("down")):
+            with self.assertRaises(pymongo.errors.AutoReconnect):
+                utils.enroll_user_in_course(self.user, str(course["_id"]))
+        stored = utils.courses_collection.find_one({"_id": course["_id"]})
+        self.assertEqual(stored["enrollers"], 0)
+        self.assertEqual(stored["assigned_users"], [])
+
+    def test_failed_bulk_insert_keeps_only_inserted_users(self):
+        course = self.make_course()
+        users = [User.objects.create_user(f"u{i}", f"u{i}@example.com", "pw") for i in range(3)]
+        # the first enrollment made it before the batch failed
+        utils.enrollment_collection.insert_one({"user_id": str(users[0].id), "course_id": course["_id"]})
+        error = pymongo.errors.BulkWriteError({"nInserted": 1, "writeErrors": []})
+        with mock.patch.object(Collection, "insert_many", side_effect=error):
+            with self.assertRaises(pymongo.errors.BulkWriteError):
+                utils.assign_multiple_users_to_course(users, str(course["_id"]))
+        stored = utils.courses_collection.find_one({"_id": course["_id"]})
+        self.assertEqual(stored["enrollers"], 1)
+        self.assertEqual([e["id"] for e in stored["assigned_users"]], [str(users[0].id)])
+
+
+# --------------------------
+# Read routing: catalog reads may use a secondary, write flows read the primary
+# --------------------------
+class ReadRoutingTests(MongoTestCase):
+
+    def find_one_read_preferences(self, call):
+        seen = []
+        find_one = Collection.find_one
+
+        def recording(coll, *args, **kwargs):
+            seen.append(coll.read_preference.name)
+            return find_one(coll, *args, **kwargs)
+
+        with mock.patch.object(Collection, "find_one", recording):
+            result = call()
+        return result, seen
+
+    def test_find_course_reads_the_primary(self):
+        course = self.make_course()
+        for course_id in (str(course["_id"]), "missing"):
+            _, seen = self.find_one_read_preferences(lambda: utils.find_course(course_id))
+            self.assertEqual(set(seen), {"Primary"})
+
+    def test_course_page_is_a_catalog_read(self):
+        course = self.make_course()
+        response, seen = self.find_one_read_preferences(lambda: self.api.get(f"/api/courses/{course['_id']}/"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(seen, ["SecondaryPreferred"])
+
+    def test_assign_multiple_accepts_a_course_created_a_moment_ago(self):
+        course = self.make_course()
+        with mock.patch("courses.views.JobService.submit", return_value={"_id": ObjectId()}), \
+                mock.patch.object(utils, "catalog", side_effect=AssertionError("catalog read")):
+            response = self.client_for(self.admin).post(
+                f"/api/courses/{course['_id']}/assign-multiple/", {"user_ids": [self.user.id]}, format="json"
+            )
+        self.assertEqual(response.status_code, 202)
+
+
+# --------------------------
+# /api/batch/
+# --------------------------
+class BatchTests(MongoTestCase):
+
+    def batch(self, requests, client=None, **extra):
+        return (client or self.api).post("/api/batch/", {"requests": requests, **extra}, format="json")
+
+    def test_items_get_their_own_status_and_body_in_order(self):
+        course = self.make_course()
+        response = self.batch([
+            {"id": "course", "path": f"/api/courses/{course['_id']}/"},
+            {"id": "missing", "path": f"/api/courses/{ObjectId()}/"},
+            {"id": "module", "method": "POST", "path": "/api/modules/",
+             "body": {"course_id": str(course["_id"]), "title": "Intro"}},
+            {"id": "invalid", "method": "POST", "path": "/api/modules/", "body": {"title": "no course"}},
+            {"id": "list", "path": f"/api/modules/?course_id={course['_id']}"},
+        ])
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual([(r["id"], r["status"]) for r in results],
+                         [("course", 200), ("missing", 404), ("module", 201), ("invalid", 400), ("list", 200)])
+        self.assertEqual(results[0]["body"]["_id"], str(course["_id"]))
+        self.assertEqual(results[1]["body"], {"detail": "Course not found"})
+        self.assertIn("course_id", results[3]["body"])
+        self.assertEqual([m["title"] for m in results[4]["body"]["results"]], ["Intro"])
+
+    def test_paths_outside_the_batchable_views_are_rejected(self):
+        response = self.batch([
+            {"id": "progress", "path": "/api/progress/"},
+            {"id": "jobs", "path": f"/api/jobs/{ObjectId()}/"},
+            {"id": "batch", "method": "POST", "path": "/api/batch/", "body": {"requests": []}},
+            {"id": "metrics", "path": "/metrics"},
+            {"id": "nowhere", "path": "/api/nowhere/"},
+        ])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(r["id"], r["status"]) for r in response.json()["results"]],
+                         [("progress", 400), ("jobs", 400), ("batch", 400), ("metrics", 400), ("nowhere", 404)])
+        self.assertEqual(response.json()["results"][0]["body"], {"detail": "Path not allowed in batch."})
+
+    def test_parallel_items_keep_request_order(self):
+        courses = [self.make_course(course_title=f"c{i}") for i in range(6)]
+        requests = [{"id": str(i), "path": f"/api/courses/{c['_id']}/"} for i, c in enumerate(courses)]
+        requests.append({"id": "write", "method": "POST", "path": "/api/modules/",
+                         "body": {"course_id": str(courses[0]["_id"]), "title": "m"}})
+
+        results = self.batch(requests, parallel=True).json()["results"]
+        self.assertEqual([r["id"] for r in results], [r["id"] for r in requests])
+        self.assertEqual([r["body"]["course_title"] for r in results[:6]], [f"c{i}" for i in range(6)])
+        self.assertEqual(results[6]["status"], 201)
+        self.assertEqual(utils.modules_collection.count_documents({}), 1)
+
+    def test_items_run_as_the_caller(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        course = self.make_course()
+        requests = [
+            {"id": "mine", "path": "/api/enrollments/my/"},
+            {"id": "clone", "method": "POST", "path": f"/api/courses/{course['_id']}/clone/", "body": {}},
+        ]
+        self.assertEqual(APIClient().post("/api/batch/", {"requests": requests}, format="json").status_code, 401)
+
+        for user, clone_status in ((self.user, 403), (self.admin, 201)):
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+            for parallel in (False, True):
+                results = self.batch(requests, client=client, parallel=parallel).json()["results"]
+                self.assertEqual(results[0]["body"]["username"], user.username)
+                self.assertEqual(results[1]["status"], clone_status)
+
+    def test_number_of_items_is_limited(self):
+        item = {"path": "/api/enrollments/my/"}
+        with override_settings(BATCH_MAX_REQUESTS=3):
+            self.assertEqual(self.batch([item] * 3).status_code, 200)
+            response = self.batch([item] * 4)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["requests"], ["At most 3 requests per batch."])
+        self.assertEqual(self.batch([]).status_code, 400)
+
+
+# --------------------------
+# Cursor pagination
+# --------------------------
+class CursorPaginationTests(MongoTestCase):
+
+    def walk(self, url):
+        seen, pages = [], 0
+        while url:
+            response = self.api.get(url)
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            seen.extend(doc["_id"] for doc in body["results"])
+            pages += 1
+            url = f"/api/modules/?course_id=c1&limit=2&after={body['next']}" if body["next"] else None
+        return seen, pages
+
+    def test_pages_cover_string_and_objectid_keys(self):
+        # client-supplied string ids sort before every ObjectId
+        ids = ["intro", "setup", "wrapup"] + [ObjectId() for _ in range(3)]
+        utils.modules_collection.insert_many([{"_id": i, "course_id": "c1"} for i in ids])
+        utils.modules_collection.insert_one({"_id": "other", "course_id": "c2"})
+
+        seen, pages = self.walk("/api/modules/?course_id=c1&limit=2")
+        self.assertEqual(seen, [str(i) for i in ids])
+        self.assertEqual(pages, 3)
+
+    def test_cursor_keeps_the_key_type(self):
+        oid = ObjectId()
+        self.assertEqual(utils.decode_cursor(utils.encode_cursor(oid)), oid)
+        # a string id that happens to look like an ObjectId stays a string
+        self.assertEqual(utils.decode_cursor(utils.encode_cursor(str(oid))), str(oid))
+
+    def test_unknown_cursor_is_400(self):
+        response = self.api.get("/api/modules/?course_id=c1&after=nope")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], "invalid_cursor")
+
+
+# --------------------------
+# Compiled validators vs DRF
+# --------------------------
+# HiddenField defaults that change on every call (timestamps) - compared by presence only
+VOLATILE_KEYS = {"created_at", "updated_at"}
+
+# (path, bad value) pairs applied to valid docs for the error-parity cases
+MUTATIONS = [
+    ((), []),
+    (("course_title",), None),
+    (("course_title",), ""),
+    (("course_title",), "x" * 600),
+    (("course_title",), ["not", "a", "string"]),
+    (("enrollers",), "12.5"),
+    (("enrollers",), True),
+    (("progress",), "fast"),
+    (("progress",), float("nan")),
+    (("is_locked",), "maybe"),
+    (("module_ids",), "abc"),
+    (("module_ids",), ["ok", None]),
+    (("metadata",), "flat"),
+    (("metadata", "category"), {"sub_category": {"name": ""}}),
+    (("metadata", "tags"), [1, {"x": 1}]),
+    (("display_price",), ["INR"]),
+    (("versions",), {}),
+    (("versions",), [{"type": "video"}]),
+    (("versions", 0, "data"), "bad\x00byte"),
+    (("topic_id",), None),
+    (("module_id",), 42),
+    (("media_content_ids",), [{"content_ids": [{"content_id": "c"}]}]),
+    (("media_content_ids",), "nope"),
+    (("question_bank_configs",), [None]),
+]
+
+
+def mutate(doc, path, value):
+    doc = copy.deepcopy(doc)
+    if not path:
+        return value
+    target = doc
+    for key in path[:-1]:
+        if isinstance(target, dict) and key not in target:
+            return None
+        target = target[key]
+    if isinstance(target, dict) or (isinstance(target, list) and path[-1] < len(target)):
+        target[path[-1]] = value
+        return doc
+    return None
+
+
+def strip_volatile(data):
+    if isinstance(data, dict):
+        return {k: strip_volatile(v) for k, v in data.items() if k not in VOLATILE_KEYS}
+    if isinstance(data, list):
+        return [strip_volatile(v) for v in data]
+    return data
+
+
+class CompiledValidatorParityTests(TestCase):
+    """
+    compiled(Serializer).run(doc) must agree with Serializer(data=doc) on
+    validity, validated data and the error structure.
+    """
+
+    def assert_parity(self, cls, make):
+        fast = compiled(cls)
+        docs = [make(i) for i in range(50)]
+        docs += [d for d in (mutate(make(i), p, v) for i, (p, v) in enumerate(MUTATIONS)) if d is not None]
+
+        for doc in docs:
+            with self.subTest(doc=doc):
+                serializer = cls(data=doc)
+                drf_ok = serializer.is_valid()
+                validated, errors = fast.run(doc)
+
+                self.assertEqual(drf_ok, not errors)
+                if drf_ok:
+                    self.assertEqual(strip_volatile(validated), strip_volatile(serializer.validated_data))
+                else:
+                    self.assertEqual(errors, dict(serializer.errors))
+
+    def test_course(self):
+        self.assert_parity(CourseSerializer, sample_course)
+
+    def test_content(self):
+        self.assert_parity(ContentSerializer, sample_content)
+
+    def test_topic(self):
+        self.assert_parity(TopicSerializer, sample_topic)
+
+    def test_hidden_timestamps_are_set(self):
+        validated, errors = compiled(CourseSerializer).run(sample_course(1))
+        self.assertEqual(errors, {})
+        self.assertTrue(VOLATILE_KEYS <= set(validated))
+
+
+# --------------------------
+# Background cohort assignment
+# --------------------------
+class AssignJobTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.admin_api = self.client_for(self.admin)
+
+    def test_unknown_course_is_rejected_before_the_job(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+
+        missing = str(ObjectId())
+        response = self.admin_api.post(
+            f"/api/courses/{missing}/assign-multiple/", {"user_ids": [self.user.id]}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["error"], "course_not_found")
+
+        upload = SimpleUploadedFile("cohort.csv", b"user_id\n1\n", content_type="text/csv")
+        response = self.admin_api.post(f"/api/courses/{missing}/assign-csv/", {"file": upload})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(utils.jobs_collection.count_documents({}), 0)
+
+    def test_rerun_chunk_does_not_enroll_twice(self):
+        from courses.services.enrollment_service import assign_multiple_chunk
+
+        course = self.make_course()
+        other = User.objects.create_user("other", "other@example.com", "pw")
+        job = {"payload": {"course_id": str(course["_id"])}}
+        chunk = [str(self.user.id), "other@example.com", "nobody@example.com"]
+
+        first = assign_multiple_chunk(job, chunk)
+        second = assign_multiple_chunk(job, chunk)   # worker died before saving the cursor
+
+        self.assertEqual(first["failed"], 1)
+        self.assertEqual(second["failed"], 1)
+        self.assertEqual(utils.enrollment_collection.count_documents({}), 2)
+        stored = utils.courses_collection.find_one({"_id": course["_id"]})
+        self.assertEqual(stored["enrollers"], 2)
+        self.assertEqual(sorted(e["id"] for e in stored["assigned_users"]), sorted([str(self.user.id), str(other.id)]))
+
+    def test_long_chunk_keeps_its_job_from_being_claimed_again(self):
+        from courses.services.enrollment_service import assign_multiple_chunk
+        from courses.services.job_service import STALE_AFTER, JobService
+
+        course = self.make_course()
+        # a running job whose last chunk-level heartbeat is already stale
+        job = {"type": "assign_multiple", "status": "running", "payload": {"course_id": str(course["_id"])},
+               "heartbeat_at": datetime.utcnow() - STALE_AFTER - timedelta(seconds=1), "created_at": datetime.utcnow()}
+        utils.jobs_collection.insert_one(job)
+
+        claims = []
+        with mock.patch("courses.services.enrollment_service.NotificationService.send",
+                        side_effect=lambda **kw: claims.append(JobService.claim())):
+            assign_multiple_chunk(job, [str(self.user.id)])
+        self.assertEqual(claims, [None])
+
+
+# --------------------------
+# migrate_typed_fields
+# --------------------------
+class MigrateTypedFieldsTests(MongoTestCase):
+
+    def test_batches_continue_from_string_ids_to_objectids(self):
+        from django.core.management import call_command
+
+        string_ids = ["a-course", "b-course"]
+        for _id in string_ids:
+            self.make_course(_id=_id, created_at="2024-01-02")
+        object_ids = [self.make_course(created_at="2024-01-02")["_id"] for _ in range(3)]
+
+        call_command("migrate_typed_fields", batch_size=1, stdout=io.StringIO())
+
+        for _id in string_ids + object_ids:
+            self.assertEqual(utils.courses_collection.find_one({"_id": _id})["created_at"], datetime(2024, 1, 2))
+
+
+# --------------------------
+# MP4 metadata
+# --------------------------
+def _box(kind, payload):
+    return struct.pack(">I4s", len(payload) + 8, kind) + payload
+
+
+def faststart_mp4():
+    """
+    ftyp + the moov of the sample lecture + an empty mdat (moov first, so
+    cutting the bytes anywhere truncates moov itself).
+    """
+    with open(settings.BASE_DIR / "media" / "videos" / "kubernetes.mp4", "rb") as f:
+        moov, _, _ = mp4.read_moov(f)
+    return _box(b"ftyp", b"isom\0\0\0\0") + _box(b"moov", moov) + _box(b"mdat", b"\0" * 8)
+
+
+class MP4ParseTests(SimpleTestCase):
+
+    def test_sample_file(self):
+        info = mp4.parse(io.BytesIO(faststart_mp4()))
+        self.assertEqual((info["width"], info["height"], info["video_codec"]), (1920, 1080, "avc1"))
+        self.assertTrue(info["faststart"])
+
+    def test_truncated_files_raise_mp4error(self):
+        data = faststart_mp4()
+        # anywhere up to the end of moov (a cut inside mdat loses no metadata)
+        for cut in range(0, len(data) - 16, 7):
+            with self.subTest(cut=cut):
+                with self.assertRaises(mp4.MP4Error):
+                    mp4.parse(io.BytesIO(data[:cut]))
+
+    def test_garbage_raises_mp4error(self):
+        rng = random.Random(7)
+        samples = [
+            b"",
+            b"\x00\x00\x00\x10moov\x00\x00\x00\x08mvhd",
+            b"\x00\x00\x00\x01moov\x00\x00",     # 64-bit size, header cut short
+            b"not a video at all",
+        ] + [bytes(rng.randrange(256) for _ in range(rng.randrange(8, 400))) for _ in range(200)]
+        for data in samples:
+            with self.subTest(data=data[:24]):
+                with self.assertRaises(mp4.MP4Error):
+                    mp4.parse(io.BytesIO(data))
+
+
+class MediaIndexTests(MongoTestCase):
+
+    def test_corrupt_file_is_indexed_with_its_error(self):
+        from courses.services.media_service import MediaService, index_media_chunk
+
+        with tempfile.TemporaryDirectory() as root, override_settings(MEDIA_ROOT=root):
+            with open(f"{root}/broken.mp4", "wb") as f:
+                f.write(b"\x00\x00\x00\x10moov\x00\x00\x00\x08mvhd")
+            with open(f"{root}/good.mp4", "wb") as f:
+                f.write(faststart_mp4())
+
+            result = index_media_chunk({}, ["broken.mp4", "good.mp4"])
+
+        self.assertEqual(result["failed"], 0)
+        found = MediaService.for_paths(["good.mp4"])
+        self.assertEqual(found["good.mp4"]["width"], 1920)
+        broken = utils.media_collection.find_one({"paths": "broken.mp4"})
+        self.assertIn("corrupt MP4", broken["error"])
+
+
+class UploadFinalizeTests(MongoTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.root = tempfile.TemporaryDirectory()
+        self.addCleanup(self.root.cleanup)
+        media_root = override_settings(MEDIA_ROOT=self.root.name)
+        media_root.enable()
+        self.addCleanup(media_root.disable)
+
+    def uploaded(self, filename, data):
+        from courses.services.upload_service import UploadService
+
+        upload = UploadService.init(self.user, filename, len(data))
+        UploadService.write_chunk(self.user, str(upload["_id"]), 0, io.BytesIO(data), len(data))
+        return str(upload["_id"])
+
+    def test_failed_finalize_is_retried_from_the_stored_file(self):
+        from courses.services.upload_service import UploadService
+
+        upload_id = self.uploaded("lecture.mp4", faststart_mp4())
+        with mock.patch("courses.services.upload_service.MediaService.index_file", side_effect=OSError("disk")):
+            with self.assertRaises(OSError):
+                UploadService.finalize(self.user, upload_id)
+        self.assertEqual(UploadService.get(self.user, upload_id)["status"], "open")
+
+        done = UploadService.finalize(self.user, upload_id)
+        self.assertEqual(done["status"], "done")
+        self.assertTrue(os.path.exists(os.path.join(self.root.name, done["path"])))
+        self.assertEqual(done["media"]["width"], 1920)
+
+    def test_stored_extension_comes_from_the_content(self):
+        from courses.services.upload_service import UploadService
+
+        video = UploadService.finalize(self.user, self.uploaded("lecture.php", faststart_mp4()))
+        other = UploadService.finalize(self.user, self.uploaded("notes.mp4", b"plain text"))
+        self.assertTrue(video["path"].endswith(".mp4"))
+        self.assertTrue(other["path"].endswith(".bin"))
+
+
+# --------------------------
+# Content versions
+# --------------------------
+class ContentCreateTests(MongoTestCase):
+
+    def payload(self, *versionids):
+        return {"topic_id": "t1", "versions": [
+            {"versionid": v, "type": "text", "title": f"v{v}", "data": "body"} for v in versionids
+        ]}
+
+    def test_create_is_two_inserts_with_current_version(self):
+        with MongoRoundTrips() as trips:
+            response = self.api.post("/api/contents/", self.payload("1", "2"), format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(trips.calls, ["contents.insert_one", "content_versions.insert_many"])
+
+        stored = utils.contents_collection.find_one({"_id": ObjectId(response.json()["_id"])})
+        self.assertEqual(stored["current_version"]["versionid"], "2")
+        self.assertEqual(stored["version_count"], 2)
+        latest = utils.content_versions_collection.find_one({"_id": stored["current_version"]["_id"]})
+        self.assertEqual(latest["data"], "body")
+
+    def test_duplicate_versionids_are_409_and_write_nothing(self):
+        response = self.api.post("/api/contents/", self.payload("1", "1"), format="json")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()["error"], "duplicate_versionid")
+        self.assertEqual(utils.contents_collection.count_documents({}), 0)
+        self.assertEqual(utils.content_versions_collection.count_documents({}), 0)
+
+    def test_failed_version_insert_removes_the_content(self):
+        from courses.services.content_service import ContentService
+
+        error = pymongo.errors.BulkWriteError({"nInserted": 0, "writeErrors": []})
+        with mock.patch.object(Collection, "insert_many", side_effect=error):
+            with self.assertRaises(pymongo.errors.BulkWriteError):
+                ContentService.create(self.payload("1"))
+        self.assertEqual(utils.contents_collection.count_documents({}), 0)
+
+    def test_content_with_a_client_id_is_readable_and_versionable(self):
+        response = self.api.post("/api/contents/", {**self.payload("1"), "id": "intro-text"}, format="json")
+        self.assertEqual(response.status_code, 201)
+
+        self.assertEqual(self.api.get("/api/contents/intro-text/").json()["current_version"]["versionid"], "1")
+        response = self.api.post("/api/contents/intro-text/versions/",
+                                 {"versionid": "2", "type": "text", "title": "v2", "data": "new"}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.api.get("/api/contents/intro-text/versions/latest/").json()["data"], "new")
+        self.assertEqual([v["versionid"] for v in self.api.get("/api/contents/intro-text/versions/").json()["results"]],
+                         ["1", "2"])
+
+
+# --------------------------
+# Learner progress
+# --------------------------
+class ProgressTests(MongoTestCase):
+
+    def setUp(self):
+        from courses.services import progress_service
+
+        super().setUp()
+        self.buffer = progress_service.ProgressBuffer()
+        for patcher in (mock.patch.object(progress_service, "buffer", self.buffer),
+                        mock.patch.object(progress_service.ProgressBuffer, "_ensure_flusher")):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.course = self.make_course()
+        module = {"course_id": str(self.course["_id"]), "title": "m"}
+        utils.modules_collection.insert_one(module)
+        topic = {"module_id": str(module["_id"]), "title": "t"}
+        utils.topics_collection.insert_one(topic)
+        self.content = {"topic_id": str(topic["_id"]), "title": "c"}
+        utils.contents_collection.insert_one(self.content)
+
+    def post_completed(self):
+        event = {"course_id": str(self.course["_id"]), "content_id": str(self.content["_id"]), "event": "completed"}
+        return self.api.post("/api/progress/", {"events": [event]}, format="json")
+
+    def test_events_for_a_course_the_user_is_not_enrolled_in_are_403(self):
+        response = self.post_completed()
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(response.json(), {"error": "not_enrolled", "course_ids": [str(self.course["_id"])]})
+        self.assertEqual(self.buffer.flush(), 0)
+
+    def test_enrollment_from_another_process_is_accepted_despite_a_cached_set(self):
+        from courses.services.membership_service import MembershipService
+
+        self.assertFalse(MembershipService.is_enrolled(self.user.id, self.course["_id"]))   # cached
+        utils.enrollment_collection.insert_one({"user_id": str(self.user.id), "course_id": str(self.course["_id"])})
+        self.assertEqual(self.post_completed().status_code, 202)
+
+    def test_failed_write_keeps_the_events_for_the_next_flush(self):
+        utils.enroll_user_in_course(self.user, str(self.course["_id"]))
+        self.assertEqual(self.post_completed().json(), {"accepted": 1, "rejected": 0})
+
+        with mock.patch.object(Collection, "bulk_write", side_effect=pymongo.errors.AutoReconnect("down")):
+            with self.assertRaises(pymongo.errors.AutoReconnect):
+                self.buffer.flush()
+        with mock.patch("courses.services.progress_service.NotificationService.send") as send:
+            self.assertEqual(self.buffer.flush(), 1)
+
+        doc = utils.progress_collection.find_one({"_id": f"{self.user.id}:{self.course['_id']}"})
+        self.assertEqual((doc["completed_content_ids"], doc["percent"]), ([str(self.content["_id"])], 100.0))
+        self.assertEqual(sorted(c.kwargs["event_name"] for c in send.call_args_list),
+                         ["COURSE_50_PERCENT", "COURSE_COMPLETED"])
+
+
+# --------------------------
+# Course clone
+# --------------------------
+class CloneTests(MongoTestCase):
+
+    def make_tree(self):
+        """
+        course -> 2 modules -> 2 topics each -> 1 content each -> 2 versions each,
+        references stored as str like the API writes them.
+        """
+        course = self.make_course(enrollers=3, assigned_users=[{"id": "1", "username": "x"}])
+        module_ids = []
+        for m in range(2):
+            module = {"course_id": str(course["_id"]), "title": f"m{m}", "topic_ids": []}
+            utils.modules_collection.insert_one(module)
+            module_ids.append(str(module["_id"]))
+            for t in range(2):
+                content = {"topic_id": None, "title": f"c{m}{t}"}
+                utils.contents_collection.insert_one(content)
+                versions = [{"content_id": content["_id"], "versionid": str(v), "data": "x"} for v in range(2)]
+                utils.content_versions_collection.insert_many(versions)
+                topic = {
+                    "module_id": str(module["_id"]),
+                    "title": f"t{m}{t}",
+                    "media_content_ids": [{"content_ids": [{"content_id": str(content["_id"]), "format": "mp4"}]}],
+                }
+                utils.topics_collection.insert_one(topic)
+                utils.contents_collection.update_one({"_id": content["_id"]}, {"$set": {
+                    "topic_id": str(topic["_id"]),
+                    "current_version": {"_id": versions[-1]["_id"], "versionid": "1"},
+                }})
+                utils.modules_collection.update_one({"_id": module["_id"]}, {"$push": {"topic_ids": str(topic["_id"])}})
+        utils.courses_collection.update_one({"_id": course["_id"]}, {"$set": {"module_ids": module_ids}})
+        return course
+
+    def test_clone_remaps_every_reference(self):
+        source = self.make_tree()
+        response = self.client_for(self.admin).post(
+            f"/api/courses/{source['_id']}/clone/", {"course_title": "Python, 2027"}, format="json"
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["copied"], {"modules": 2, "topics": 4, "contents": 4, "versions": 8})
+
+        clone = utils.courses_collection.find_one({"_id": ObjectId(response.json()["course"]["_id"])})
+        self.assertEqual(clone["course_title"], "Python, 2027")
+        self.assertEqual(clone["cloned_from"], source["_id"])
+        self.assertEqual((clone["enrollers"], clone["assigned_users"]), (0, []))
+
+        modules = list(utils.modules_collection.find({"course_id": str(clone["_id"])}))
+        self.assertEqual(sorted(clone["module_ids"]), sorted(str(m["_id"]) for m in modules))
+        for module in modules:
+            topics = list(utils.topics_collection.find({"module_id": str(module["_id"])}))
+            self.assertEqual(sorted(module["topic_ids"]), sorted(str(t["_id"]) for t in topics))
+            for topic in topics:
+                content_id = topic["media_content_ids"][0]["content_ids"][0]["content_id"]
+                content = utils.contents_collection.find_one({"_id": ObjectId(content_id)})
+                self.assertEqual(content["topic_id"], str(topic["_id"]))
+                current = utils.content_versions_collection.find_one({"_id": content["current_version"]["_id"]})
+                self.assertEqual(current["content_id"], content["_id"])
+                self.assertEqual(utils.content_versions_collection.count_documents({"content_id": content["_id"]}), 2)
+
+        # the source tree is untouched
+        self.assertEqual(utils.modules_collection.count_documents({"course_id": str(source["_id"])}), 2)
+        self.assertEqual(utils.modules_collection.count_documents({}), 4)
+
+    def test_contents_with_string_ids_keep_their_versions(self):
+        from courses.services.clone_service import CloneService
+        from courses.services.content_service import ContentService
+
+        source = self.make_course()
+        module = {"course_id": str(source["_id"]), "title": "m"}
+        utils.modules_collection.insert_one(module)
+        topic = {"module_id": str(module["_id"]), "title": "t"}
+        utils.topics_collection.insert_one(topic)
+        ContentService.create({"_id": "intro", "topic_id": str(topic["_id"]),
+                               "versions": [{"versionid": v, "data": v} for v in ("1", "2")]})
+
+        result = CloneService.clone_course(str(source["_id"]))
+        self.assertEqual(result["counts"]["versions"], 2)
+        clone = utils.contents_collection.find_one({"topic_id": {"$ne": str(topic["_id"])}})
+        current = ContentService.latest(clone)
+        self.assertEqual((current["content_id"], current["data"]), (clone["_id"], "2"))
+
+    def test_failed_course_insert_removes_the_copied_tree(self):
+        from courses.services.clone_service import CloneService
+
+        source = self.make_tree()
+        counts = {name: utils.db[name].count_documents({}) for name in
+                  ("courses", "modules", "topics", "contents", "content_versions")}
+        with mock.patch.object(Collection, "insert_one", side_effect=pymongo.errors.AutoReconnect("down")):
+            with self.assertRaises(pymongo.errors.AutoReconnect):
+                CloneService.clone_course(str(source["_id"]))
+        for name, count in counts.items():
+            self.assertEqual(utils.db[name].count_documents({}), count, name)
+
+
+# --------------------------
+# Membership (is_enrolled) and the catalog snapshot bypass
+# --------------------------
+def shared_cache_settings(directory):
+    return {"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": directory}}
+
+
+class MembershipTests(MongoTestCase):
+
+    def enrolled_flags(self, url="/api/courses/"):
+        response = self.api.get(url)
+        self.assertEqual(response.status_code, 200)
+        return {doc["_id"]: doc["is_enrolled"] for doc in response.json()["results"]}
+
+    def test_locmem_sees_enrollments_of_another_process_after_the_short_ttl(self):
+        import time
+        from courses.services.membership_service import MembershipService
+
+        course = self.make_course()
+        self.assertFalse(MembershipService.is_enrolled(self.user.id, course["_id"]))
+        # what run_jobs does: enrollment written, its cache invalidation never arrives
+        utils.enrollment_collection.insert_one({"user_id": str(self.user.id), "course_id": course["_id"]})
+        with MongoRoundTrips() as trips:
+            self.assertFalse(MembershipService.is_enrolled(self.user.id, course["_id"]))
+        self.assertEqual(trips.calls, [])
+
+        later = time.time() + settings.MEMBERSHIP_LOCAL_CACHE_SECONDS + 1
+        with mock.patch("django.core.cache.backends.locmem.time.time", return_value=later):
+            self.assertTrue(MembershipService.is_enrolled(self.user.id, course["_id"]))
+
+    def test_locmem_snapshot_hits_do_not_query_enrollments(self):
+        self.make_course()
+        url = "/api/courses/?segment=tech"
+        self.enrolled_flags(url)
+        with MongoRoundTrips() as trips:
+            self.enrolled_flags(url)
+        self.assertEqual(trips.calls, [])
+
+    def test_shared_cache_is_used_and_invalidated_on_enroll(self):
+        from courses.services.enrollment_service import EnrollmentService
+
+        course = self.make_course()
+        with tempfile.TemporaryDirectory() as directory, override_settings(CACHES=shared_cache_settings(directory)):
+            self.assertEqual(self.enrolled_flags(), {str(course["_id"]): False})
+            with MongoRoundTrips() as trips:
+                self.enrolled_flags()
+            self.assertNotIn("enrollments.find", trips.calls)   # served from the cached set
+
+            EnrollmentService.self_enroll(self.user, str(course["_id"]))
+            self.assertEqual(self.enrolled_flags(), {str(course["_id"]): True})
+
+    def test_assign_job_invalidates_through_the_shared_cache(self):
+        from courses.services.enrollment_service import assign_multiple_chunk
+
+        course = self.make_course()
+        with tempfile.TemporaryDirectory() as directory, override_settings(CACHES=shared_cache_settings(directory)):
+            self.assertEqual(self.enrolled_flags(), {str(course["_id"]): False})
+            assign_multiple_chunk({"payload": {"course_id": str(course["_id"])}}, [str(self.user.id)])
+            self.assertEqual(self.enrolled_flags(), {str(course["_id"]): True})
+
+    def test_snapshot_is_skipped_once_the_user_is_enrolled_in_one_of_its_courses(self):
+        from courses.services.enrollment_service import EnrollmentService
+
+        courses = [self.make_course(course_title=f"c{i}") for i in range(3)]
+        url = "/api/courses/?segment=tech"
+
+        self.assertEqual(set(self.enrolled_flags(url).values()), {False})   # builds the snapshot
+        with MongoRoundTrips() as trips:
+            self.assertEqual(set(self.enrolled_flags(url).values()), {False})
+        self.assertNotIn("courses.find", trips.calls)   # pre-rendered page
+
+        EnrollmentService.self_enroll(self.user, str(courses[1]["_id"]))
+        with MongoRoundTrips() as trips:
+            flags = self.enrolled_flags(url)
+        self.assertIn("courses.find", trips.calls)   # live query, not the snapshot
+        self.assertEqual(flags, {str(c["_id"]): c is courses[1] for c in courses})
+
+
+# --------------------------
+# MessagePack renderer / parser
+# --------------------------
+@skipUnless(renderers.msgpack is not None, "msgpack not installed")
+class MessagePackTests(MongoTestCase):
+    MSGPACK = "application/msgpack"
+
+    def get_msgpack(self, url):
+        response = self.api.get(url, HTTP_ACCEPT=self.MSGPACK)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], self.MSGPACK)
+        return renderers.unpackb(response.content)
+
+    def test_round_trip_keeps_objectids_and_returns_aware_utc_datetimes(self):
+        oid = ObjectId()
+        doc = {"_id": oid, "ids": [oid], "at": datetime(2024, 5, 6, 7, 8, 9, 123000), "n": 1, "s": "x"}
+
+        decoded = renderers.unpackb(renderers.packb(doc))
+        self.assertEqual(decoded["_id"], oid)
+        self.assertIsInstance(decoded["ids"][0], ObjectId)
+        self.assertEqual(decoded["at"], datetime(2024, 5, 6, 7, 8, 9, 123000, tzinfo=timezone.utc))
+        self.assertEqual((decoded["n"], decoded["s"]), (1, "x"))
+
+    def test_error_details_and_lazy_strings_are_plain_strings(self):
+        from django.utils.translation import gettext_lazy
+        from rest_framework.exceptions import ErrorDetail
+
+        data = {"title": [ErrorDetail("This field is required.", code="required")], "detail": gettext_lazy("Not found.")}
+        self.assertEqual(renderers.unpackb(renderers.packb(data)),
+                         {"title": ["This field is required."], "detail": "Not found."})
+
+    def test_unknown_types_are_refused(self):
+        with self.assertRaises(TypeError):
+            renderers.packb({"x": object()})
+
+    def test_responses_carry_native_objectids(self):
+        course = self.make_course()
+        module = {"course_id": str(course["_id"]), "title": "m1"}
+        utils.modules_collection.insert_one(module)
+
+        self.assertEqual(self.get_msgpack(f"/api/courses/{course['_id']}/")["_id"], course["_id"])
+        self.assertEqual(self.get_msgpack("/api/courses/")["results"][0]["_id"], course["_id"])
+        self.assertEqual(self.get_msgpack(f"/api/modules/?course_id={course['_id']}")["results"][0]["_id"],
+                         module["_id"])
+        # JSON is unchanged: hex strings
+        self.assertEqual(self.api.get(f"/api/courses/{course['_id']}/").json()["_id"], str(course["_id"]))
+
+    def test_msgpack_request_body(self):
+        course = self.make_course()
+        body = renderers.packb({"course_id": str(course["_id"]), "title": "m1"})
+
+        response = self.api.post("/api/modules/", body, content_type=self.MSGPACK, HTTP_ACCEPT=self.MSGPACK)
+        self.assertEqual(response.status_code, 201)
+        saved = renderers.unpackb(response.content)
+        self.assertIsInstance(saved["_id"], ObjectId)
+        self.assertEqual(utils.modules_collection.find_one({"_id": saved["_id"]})["title"], "m1")
+
+    def test_bad_bodies_are_400_in_the_requested_format(self):
+        response = self.api.post("/api/modules/", b"\xc1", content_type=self.MSGPACK, HTTP_ACCEPT=self.MSGPACK)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("MessagePack parse error", renderers.unpackb(response.content)["detail"])
+
+        response = self.api.post("/api/modules/", renderers.packb({"title": "m1"}),
+                                 content_type=self.MSGPACK, HTTP_ACCEPT=self.MSGPACK)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("course_id", renderers.unpackb(response.content))
+
+
+# --------------------------
+# /metrics
+# --------------------------
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user("learner", "learner@example.com", "pw")
+        self.admin = User.objects.create_superuser("admin", "admin@example.com", "pw")
+
+    def scrape(self, authorization=None):
+        headers = {"HTTP_AUTHORIZATION": authorization} if authorization else {}
+        return self.client.get("/metrics", **headers).status_code
+
+    def test_staff_or_the_scrape_token_only(self):
+        from rest_framework_simplejwt.tokens import AccessToken
+
+        self.assertEqual(self.scrape(), 401)
+        self.assertEqual(self.scrape(f"Bearer {AccessToken.for_user(self.user)}"), 401)
+        self.assertEqual(self.scrape("Bearer not-a-jwt"), 401)
+        self.assertEqual(self.scrape(f"Bearer {AccessToken.for_user(self.admin)}"), 200)
+        with override_settings(METRICS_TOKEN="scrape-secret"):
+            self.assertEqual(self.scrape("Bearer scrape-secret"), 200)
+            self.assertEqual(self.scrape("Bearer wrong"), 401)
+
+    def test_concurrent_flushes_of_one_process(self):
+        import threading
+        from courseapi import metrics
+
+        errors = []
+        with tempfile.TemporaryDirectory() as directory, override_settings(METRICS_DIR=directory):
+            start = threading.Barrier(4)
+
+            def flush_often():
+                start.wait()
+                for _ in range(50):
+                    try:
+                        metrics.flush()
+                    except Exception as exc:
+                        errors.append(exc)
+
+            threads = [threading.Thread(target=flush_often) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            self.assertEqual(os.listdir(directory), [f"{os.getpid()}.json"])
+        self.assertEqual(errors, [])
+
+
+# --------------------------
+# Server-sent events: local broker, stream body, tickets
+# --------------------------
+@override_settings(EVENTS_BROKER="local")
+class LocalBrokerTests(SimpleTestCase):
+
+    def setUp(self):
+        from courseapi import events
+
+        for patcher in (mock.patch.object(events, "_broker_instance", None),
+                        mock.patch.dict(events._subscribers, clear=True)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_publish_reaches_subscribers_of_that_user_until_unsubscribe(self):
+        from courseapi import events
+
+        async def scenario():
+            mine, other = events.subscribe(7), events.subscribe(8)
+            self.assertEqual(events.subscriber_count(), 2)
+            # publish runs in sync code (a view, a job thread)
+            await asyncio.to_thread(events.publish, 7, "enrolled", {"at": datetime(2024, 1, 2)})
+            event = await asyncio.wait_for(mine.queue.get(), timeout=1)
+            self.assertEqual(event["type"], "enrolled")
+            self.assertEqual(event["data"], {"at": "2024-01-02T00:00:00"})   # JSON-safe
+            await asyncio.sleep(0)
+            self.assertTrue(other.queue.empty())
+
+            events.unsubscribe(mine)
+            events.unsubscribe(other)
+            self.assertEqual(events.subscriber_count(), 0)
+            await asyncio.to_thread(events.publish, 7, "enrolled", {})
+            await asyncio.sleep(0)
+            self.assertTrue(mine.queue.empty())
+
+        asyncio.run(scenario())
+
+    def test_full_queue_drops_the_oldest_event(self):
+        from courseapi import events
+
+        async def scenario():
+            subscription = events.subscribe(7)
+            try:
+                for i in range(3):
+                    events.publish(7, "tick", i)
+                await asyncio.sleep(0)
+                self.assertEqual([subscription.queue.get_nowait()["data"] for _ in range(2)], [1, 2])
+            finally:
+                events.unsubscribe(subscription)
+
+        with override_settings(EVENTS_QUEUE_SIZE=2):
+            asyncio.run(scenario())
+
+    def test_stream_body_and_unsubscribe_on_close(self):
+        from courseapi import events
+
+        async def scenario():
+            subscription = events.subscribe(7)
+            body = events.stream(subscription)
+            self.assertEqual(await anext(body), "retry: 5000\n\n")
+            events.publish(7, "enrolled", {"course_id": "c1"})
+            chunk = await anext(body)
+            self.assertRegex(chunk, r'^id: \d+\nevent: enrolled\ndata: \{"course_id": "c1"\}\n\n$')
+            await body.aclose()
+            self.assertEqual(events.subscriber_count(), 0)
+
+        asyncio.run(scenario())
+
+    def test_run_jobs_warns_when_the_broker_is_local(self):
+        from django.core.management import call_command
+
+        stderr = io.StringIO()
+        with mock.patch("courses.management.commands.run_jobs.JobService.run", return_value=None):
+            call_command("run_jobs", stdout=io.StringIO(), stderr=stderr)
+        self.assertIn("EVENTS_BROKER=local", stderr.getvalue())
+
+
+class EventTicketTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user("learner", "learner@example.com", "pw")
+
+    def stream_user(self, query):
+        from django.test import RequestFactory
+        from courseapi.views import _stream_user
+
+        return _stream_user(RequestFactory().get("/api/events/", query))
+
+    def test_ticket_opens_the_stream_until_it_expires(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post("/api/events/ticket/")
+        self.assertEqual(response.status_code, 200)
+        ticket = response.json()["ticket"]
+        self.assertEqual(self.stream_user({"ticket": ticket}), self.user)
+
+        with override_settings(EVENTS_TICKET_SECONDS=-1):
+            self.assertIsNone(self.stream_user({"ticket": ticket}))
+
+    def test_tampered_ticket_and_access_token_in_the_url_are_rejected(self):
+        from django.core import signing
+        from rest_framework_simplejwt.tokens import AccessToken
+        from courseapi import events
+
+        ticket = events.issue_ticket(self.user.id)
+        self.assertIsNone(self.stream_user({"ticket": ticket.replace(str(self.user.id), "999", 1)}))
+        # a value signed for another purpose (same SECRET_KEY) isn't a ticket
+        self.assertIsNone(self.stream_user({"ticket": signing.TimestampSigner().sign(str(self.user.id))}))
+        self.assertIsNone(self.stream_user({"token": str(AccessToken.for_user(self.user))}))
+
+    def test_ticket_needs_authentication(self):
+        self.assertEqual(APIClient().post("/api/events/ticket/").status_code, 401)
+
+    async def test_stream_rejects_a_bad_ticket(self):
+        response = await self.async_client.get("/api/events/", {"ticket": "nope"})
+        self.assertEqual(response.status_code, 401)
+
+
+# --------------------------
+# Query plans (real mongod only)
+# --------------------------
+# stages that mean the plan used an index (or needed no scan at all)
+INDEX_STAGES = {
+    "IXSCAN", "IDHACK", "EXPRESS_IXSCAN", "EXPRESS_CLUSTERED_IXSCAN",
+    "COUNT_SCAN", "DISTINCT_SCAN", "RECORD_STORE_FAST_COUNT",
+}
+# session / routing fields the profiler records but explain rejects
+PROFILE_ONLY_FIELDS = {
+    "lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "autocommit",
+    "startTransaction", "writeConcern", "readConcern", "$audit", "$client",
+}
+PLANNED_COMMANDS = ("find", "aggregate", "count", "distinct", "findAndModify", "update", "delete")
+# shapes that read a whole collection on purpose: RankingService.refresh loads every course
+FULL_SCANS = {("courses", "find", "{filter: {}, sort: NoneType}")}
+# docs examined per doc returned (+ skipped) before a plan counts as a scan
+MAX_EXAMINED_RATIO = 8
+
+SEGMENTS = ["school", "college", "professional"]
+COURSE_TYPES = ["free", "paid"]
+CATEGORIES = {
+    "Maths": ["Algebra", "Geometry"],
+    "Science": ["Physics", "Chemistry"],
+    "Computers": ["Python", "Databases"],
+    "Languages": ["English", "French"],
+}
+
+
+def _first(doc, key):
+    """
+    First value of key anywhere in an explain document (find and aggregate
+    nest it differently).
+    """
+    if isinstance(doc, dict):
+        if key in doc:
+            return doc[key]
+        children = doc.values()
+    elif isinstance(doc, list):
+        children = doc
+    else:
+        return None
+    for child in children:
+        found = _first(child, key)
+        if found is not None:
+            return found
+    return None
+
+
+def _stages(plan):
+    stages = set()
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.add(plan["stage"])
+        for key, value in plan.items():
+            if key != "slotBasedPlan":
+                stages |= _stages(value)
+    elif isinstance(plan, list):
+        for value in plan:
+            stages |= _stages(value)
+    return stages
+
+
+def _query_of(cmd):
+    name = next(iter(cmd))
+    if name == "find":
+        return {"filter": cmd.get("filter"), "sort": cmd.get("sort")}
+    if name == "aggregate":
+        return cmd.get("pipeline")
+    if name in ("update", "delete"):
+        return cmd[name + "s"][0].get("q")
+    return cmd.get("query")
+
+
+def _shape(value):
+    """
+    Filter with literal values replaced by their type, e.g.
+    {"segment": {"$in": ["str"]}}.
+    """
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{k}: {_shape(v)}" for k, v in sorted(value.items())) + "}"
+    if isinstance(value, list):
+        return "[" + ", ".join(sorted({_shape(v) for v in value})) + "]"
+    if isinstance(value, ObjectId):
+        return "oid"
+    return type(value).__name__
+
+
+@skipUnless(MONGO_TEST_URI, "query plans need a real mongod (set MONGO_TEST_URI)")
+class QueryPlanTests(MongoTestCase):
+    """
+    Seeds the test database, records every query the catalog / outline /
+    enrollment / rankings / progress paths send (profiler level 2), then
+    explain()s each distinct query shape. A shape fails on COLLSCAN, an
+    in-memory SORT or more than MAX_EXAMINED_RATIO docs examined per doc
+    returned, so a new query shape without an index fails here.
+
+    Needs a throwaway mongod (the profiler is switched on for the test db):
+
+        docker run -d --rm -p 27017:27017 mongo:7
+        MONGO_TEST_URI=mongodb://localhost:27017/ python manage.py test courses.tests.QueryPlanTests
+
+    Run it with every change that adds or alters a query.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.course_ids = self.seed(courses=3000, enrollments=5000)
+
+    def seed(self, courses, enrollments):
+        rng = random.Random(42)
+        docs = []
+        for i in range(courses):
+            category = rng.choice(list(CATEGORIES))
+            docs.append({
+                "course_title": f"Course {i}",
+                "segment": rng.choice(SEGMENTS),
+                "course_type": rng.choice(COURSE_TYPES),
+                "metadata": {"category": {
+                    "name": category,
+                    "sub_category": {"name": rng.choice(CATEGORIES[category])},
+                }},
+                "enrollers": rng.randint(0, 500),
+                "assigned_users": [],
+            })
+        utils.courses_collection.insert_many(docs)
+        course_ids = [c["_id"] for c in docs]
+
+        # outline for a few courses
+        for course_id in course_ids[:20]:
+            modules = [{"course_id": str(course_id), "title": f"m{i}"} for i in range(5)]
+            utils.modules_collection.insert_many(modules)
+            topics = [{"module_id": str(m["_id"]), "title": f"t{i}"} for m in modules for i in range(3)]
+            utils.topics_collection.insert_many(topics)
+            utils.contents_collection.insert_many(
+                [{"topic_id": str(t["_id"]), "title": f"c{i}"} for t in topics for i in range(3)]
+            )
+
+        now = datetime.utcnow()
+        utils.enrollment_collection.insert_many([{
+            "user_id": str(rng.randint(1, 500)),
+            "course_id": rng.choice(course_ids),
+            "status": "self_enrolled",
+            "created_at": now - timedelta(days=rng.randint(0, 60)),
+        } for _ in range(enrollments)])
+        return course_ids
+
+    def drive(self):
+        """
+        Every request / service call here lands in system.profile.
+        """
+        from courses.services.enrollment_service import EnrollmentService
+        from courses.services.progress_service import ProgressService
+        from courses.services.ranking_service import RankingService
+
+        # X-Read-Your-Writes skips the catalog snapshots so get_courses runs each time
+        headers = {"HTTP_X_READ_YOUR_WRITES": "1"}
+        values = {
+            "segment": ["school", "school,college"],
+            "category": ["Maths", "Maths,Science"],
+            "sub_category": ["Algebra"],
+            "course_type": ["paid", "free,paid"],
+        }
+        names = list(utils.CATALOG_FILTERS)
+        for size in range(len(names) + 1):
+            for combo in itertools.combinations(names, size):
+                for picks in itertools.product(*(values[name] for name in combo)):
+                    params = dict(zip(combo, picks))
+                    for page in (1, 2):
+                        self.api.get("/api/courses/", {**params, "page": page}, **headers)
+
+        course = str(self.course_ids[0])
+        module = str(utils.modules_collection.find_one({"course_id": course})["_id"])
+        topic = str(utils.topics_collection.find_one({"module_id": module})["_id"])
+
+        self.api.get(f"/api/courses/{course}/", **headers)
+        page = self.api.get(f"/api/modules/?course_id={course}&limit=2", **headers).json()
+        self.api.get(f"/api/modules/?course_id={course}&limit=2&after={page['next']}", **headers)
+        self.api.get(f"/api/topics/?module_id={module}", **headers)
+        self.api.get(f"/api/contents/?topic_id={topic}", **headers)
+        self.api.post(f"/api/courses/{course}/enroll/", {}, format="json")
+        self.api.get("/api/enrollments/my/")
+
+        utils.find_course(course)
+        utils.find_course("not-an-object-id")
+        others = [User.objects.create_user(f"plans{i}", f"plans{i}@example.com", "pw") for i in range(3)]
+        EnrollmentService.assign_user(others[0], str(self.course_ids[1]))
+        EnrollmentService.assign_multiple(others[1:], str(self.course_ids[2]))
+        utils.enrolled_user_ids(str(self.course_ids[2]), [str(u.id) for u in others])
+
+        # trending window aggregate (and the full course read of FULL_SCANS)
+        RankingService.refresh()
+
+        # progress: buffered upserts, percent / milestone updates, reads
+        content = utils.contents_collection.find_one({"topic_id": topic})
+        ProgressService.write({(str(self.user.id), course): {
+            "username": self.user.username, "email": self.user.email, "viewed": set(),
+            "completed": {str(content["_id"])}, "last_event_at": datetime.utcnow(),
+        }})
+        self.api.get("/api/progress/")
+        self.api.get(f"/api/progress/?course_id={course}")
+
+    def profiled_shapes(self):
+        """
+        One representative command per (collection, command, filter shape).
+        """
+        db = utils.db
+        db.command("profile", 0)
+        db["system.profile"].drop()
+        db.command("profile", 2)
+        try:
+            self.drive()
+        finally:
+            db.command("profile", 0)
+
+        shapes = {}
+        for entry in db["system.profile"].find({"ns": {"$regex": r"^[^.]+\.(?!system\.)"}}):
+            collection = entry["ns"].split(".", 1)[1]
+            cmd = self.explainable(entry, collection)
+            if cmd is None:
+                continue
+            key = (collection, next(iter(cmd)), _shape(_query_of(cmd)))
+            shapes.setdefault(key, cmd)
+        return shapes
+
+    @staticmethod
+    def explainable(entry, collection):
+        op, cmd = entry["op"], entry.get("command") or {}
+        if op == "update":
+            # the profiler records the statement; explain wants the command
+            cmd = {"update": collection, "updates": [{k: cmd[k] for k in ("q", "u", "multi", "upsert") if k in cmd}]}
+        elif op == "remove":
+            cmd = {"delete": collection, "deletes": [{"q": cmd["q"], "limit": cmd.get("limit", 0)}]}
+        elif op not in ("query", "command"):
+            return None   # insert / getmore: nothing to plan
+        cmd = {k: v for k, v in cmd.items() if k not in PROFILE_ONLY_FIELDS}
+        if not cmd or next(iter(cmd)) not in PLANNED_COMMANDS:
+            return None
+        return cmd
+
+    def test_every_query_shape_is_index_backed(self):
+        shapes = self.profiled_shapes()
+        # catalog filters, outline lists, enrollments, course updates at least
+        self.assertGreater(len(shapes), 10)
+
+        for (collection, name, shape), cmd in sorted(shapes.items()):
+            if (collection, name, shape) in FULL_SCANS:
+                continue
+            with self.subTest(collection=collection, command=name, shape=shape):
+                explain = utils.db.command("explain", cmd, verbosity="executionStats")
+                stages = _stages(_first(explain, "winningPlan"))
+                stats = _first(explain, "executionStats") or {}
+
+                self.assertNotIn("COLLSCAN", stages)
+                if stages - {"EOF"}:
+                    self.assertTrue(stages & INDEX_STAGES, f"no index stage in {sorted(stages)}")
+                self.assertNotIn("SORT", stages, "in-memory SORT")
+                # counts / groups return one row however much they read
+                if name not in ("aggregate", "count", "distinct"):
+                    examined = stats.get("totalDocsExamined", 0)
+                    returned = stats.get("nReturned", 0) + cmd.get("skip", 0)
+                    self.assertLessEqual(examined, max(1, returned) * MAX_EXAMINED_RATIO)
@@ -8,6 +8,10 @@ from .views import (
     TopicViewSet,
     ContentViewSet,
     EnrollmentViewSet,
+    JobViewSet,
+    ProgressViewSet,
+    UploadViewSet,
+    BatchView,
 )
 
 router = DefaultRouter()
@@ -16,7 +20,11 @@ router.register(r"modules", ModuleViewSet, basename="module")
 router.register(r"topics", TopicViewSet, basename="topic")
 router.register(r"contents", ContentViewSet, basename="content")
 router.register(r"enrollments", EnrollmentViewSet, basename="enrollment")
+router.register(r"jobs", JobViewSet, basename="job")
+router.register(r"progress", ProgressViewSet, basename="progress")
+router.register(r"uploads", UploadViewSet, basename="upload")
 
 urlpatterns = [
+    path("batch/", BatchView.as_view(), name="batch"),
     path("", include(router.urls)),   # prefix handled by project urls (api/)
 ]
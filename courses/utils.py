@@ -1,6 +1,10 @@
 # courses/utils.py
-from pymongo import MongoClient
+from pymongo import ASCENDING, MongoClient, ReturnDocument
+from pymongo.errors import BulkWriteError
+from pymongo.read_preferences import SecondaryPreferred
 from bson import ObjectId
+from contextvars import ContextVar
+from courseapi.metrics import mongo_pool_listener
 from datetime import datetime
 import os
 
@@ -8,16 +12,154 @@ import os
 # Mongo connection / collections
 # --------------------------
 MONGO_URI = os.environ.get("MONGO_URI", "mongodb://localhost:27017/")
-client = MongoClient(MONGO_URI)
+MONGO_MIN_POOL_SIZE = int(os.environ.get("MONGO_MIN_POOL_SIZE", 0))
 
-# FIXED DATABASE NAME
-db = client["bookdb"]
+# connect=False: importing this module (manage.py, migrations) doesn't open
+# sockets; courseapi.warmup connects the pool when a worker starts
+client = MongoClient(
+    MONGO_URI,
+    connect=False,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    event_listeners=[mongo_pool_listener()],   # pool gauges on /metrics
+)
+
+# FIXED DATABASE NAME (MONGO_DB only for scratch databases, e.g. the tests on a real mongod)
+MONGO_DB = os.environ.get("MONGO_DB", "bookdb")
+db = client[MONGO_DB]
 
 courses_collection = db["courses"]
 enrollment_collection = db["enrollments"]
 modules_collection = db["modules"]
 topics_collection = db["topics"]
 contents_collection = db["contents"]
+content_versions_collection = db["content_versions"]   # one doc per content version
+jobs_collection = db["jobs"]
+progress_collection = db["progress"]     # _id = "<user_id>:<course_id>"
+media_collection = db["media_metadata"]  # _id = sha256 of the file
+uploads_collection = db["uploads"]       # resumable upload sessions
+
+
+# --------------------------
+# Read routing (replica set)
+# --------------------------
+# Catalog reads (list / search / retrieve / outline) may come from a secondary
+# that is at most MONGO_MAX_STALENESS_SECONDS behind (90 is the server minimum).
+# Enrollment flows and anything that reads its own writes use the plain
+# collections, i.e. the primary. Standalone mongod: everything hits the one node.
+MONGO_MAX_STALENESS_SECONDS = int(os.environ.get("MONGO_MAX_STALENESS_SECONDS", 90))
+CATALOG_READ_PREFERENCE = SecondaryPreferred(max_staleness=MONGO_MAX_STALENESS_SECONDS)
+
+# set per request by courses.middleware.ReadPreferenceMiddleware (X-Read-Your-Writes)
+read_primary = ContextVar("read_primary", default=False)
+
+_catalog_handles = {}
+
+
+def catalog(collection):
+    """
+    Handle for catalog reads on collection: secondaryPreferred, or the primary
+    when the current request asked for read-your-writes.
+    """
+    if read_primary.get():
+        return collection
+    handle = _catalog_handles.get(collection.name)
+    if handle is None:
+        handle = _catalog_handles[collection.name] = collection.with_options(
+            read_preference=CATALOG_READ_PREFERENCE
+        )
+    return handle
+
+
+# --------------------------
+# Indexes (run via `manage.py ensure_indexes`)
+# --------------------------
+INDEXES = {
+    # catalog filters (get_courses): equality/$in on the filter + _id order for
+    # pages; segment x course_type is the snapshot key. QueryPlanTests
+    # fails when a query shape has no index here.
+    "courses": [
+        [("segment", ASCENDING), ("_id", ASCENDING)],
+        [("segment", ASCENDING), ("course_type", ASCENDING), ("_id", ASCENDING)],
+        [("course_type", ASCENDING), ("_id", ASCENDING)],
+        [("metadata.category.name", ASCENDING), ("_id", ASCENDING)],
+        [("metadata.category.sub_category.name", ASCENDING), ("_id", ASCENDING)],
+    ],
+    # outline lists: equality on the parent id + _id order for cursor pagination
+    "modules": [[("course_id", ASCENDING), ("_id", ASCENDING)]],
+    "topics": [[("module_id", ASCENDING), ("_id", ASCENDING)]],
+    "contents": [[("topic_id", ASCENDING), ("_id", ASCENDING)]],
+    # ContentService: one versionid per content; history in insertion order
+    "content_versions": [
+        ([("content_id", ASCENDING), ("versionid", ASCENDING)], {"unique": True}),
+        [("content_id", ASCENDING), ("_id", ASCENDING)],
+    ],
+    "enrollments": [
+        [("user_id", ASCENDING)],
+        # RankingService trending window
+        [("created_at", ASCENDING)],
+    ],
+    "progress": [[("user_id", ASCENDING), ("course_id", ASCENDING)]],
+    # JobService.claim: oldest queued / stale running job
+    "jobs": [[("status", ASCENDING), ("created_at", ASCENDING)]],
+    # content responses look media up by the path in a version's url
+    "media_metadata": [[("paths", ASCENDING)]],
+    # UploadService.expire
+    "uploads": [[("status", ASCENDING), ("expires_at", ASCENDING)]],
+}
+
+
+def ensure_indexes():
+    created = []
+    for collection_name, indexes in INDEXES.items():
+        for spec in indexes:
+            # plain key list, or (keys, create_index options)
+            keys, options = spec if isinstance(spec, tuple) else (spec, {})
+            created.append(db[collection_name].create_index(keys, **options))
+    return created
+
+
+# --------------------------
+# Typed fields (ObjectId references, BSON dates)
+# --------------------------
+# string-typed values still exist until `manage.py migrate_typed_fields` ran;
+# readers accept both, writers store the typed form
+COURSE_DATE_FIELDS = ("course_start_date", "course_end_date", "created_at", "updated_at")
+
+
+def parse_date(value):
+    """
+    ISO string -> datetime; datetimes pass through; anything else -> None.
+    """
+    if isinstance(value, datetime):
+        return value
+    if not isinstance(value, str) or not value:
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+def typed_course(data):
+    """
+    Course doc with its date fields as datetimes (unparseable values kept).
+    """
+    for field in COURSE_DATE_FIELDS:
+        parsed = parse_date(data.get(field))
+        if parsed is not None:
+            data[field] = parsed
+    return data
+
+
+def id_variants(value):
+    """
+    [ObjectId, str] for a hex id, so one $in matches both stored forms.
+    """
+    if isinstance(value, ObjectId):
+        return [value, str(value)]
+    if ObjectId.is_valid(value):
+        return [ObjectId(value), value]
+    return [value]
 
 
 # --------------------------
@@ -36,56 +178,208 @@ def convert_objectids(obj):
 # --------------------------
 # Fix for String IDs or ObjectId IDs
 # --------------------------
-def find_course(course_id):
+def find_course(course_id, collection=None):
     """
     Accepts both:
     - ObjectId("...")
     - "string_id"
+    Reads the primary: write flows (assign, clone, progress) must see a course
+    created a moment ago. Course pages use find_catalog_course.
     """
+    if collection is None:
+        collection = courses_collection
 
     # Try as ObjectId
     try:
         obj_id = ObjectId(course_id)
-        course = courses_collection.find_one({"_id": obj_id})
+        course = collection.find_one({"_id": obj_id})
         if course:
             return course
     except:
         pass
 
     # Try direct string match
-    course = courses_collection.find_one({"_id": course_id})
+    course = collection.find_one({"_id": course_id})
     return course
 
 
+def find_catalog_course(course_id):
+    """
+    find_course for catalog reads (may be served by a secondary).
+    """
+    return find_course(course_id, catalog(courses_collection))
+
+
+# --------------------------
+# Catalog filters (?segment=&category=&sub_category=&course_type=)
+# --------------------------
+CATALOG_FILTERS = {
+    "segment": "segment",
+    "category": "metadata.category.name",
+    "sub_category": "metadata.category.sub_category.name",
+    "course_type": "course_type",
+}
+
+
+def catalog_filter(params):
+    """
+    Query-string params -> Mongo filter. Values may be "a,b" or "[a,b]".
+    """
+    query = {}
+    for param, field in CATALOG_FILTERS.items():
+        if param in params:
+            query[field] = {"$in": params.get(param).strip("[]").split(",")}
+    return query
+
+
 # --------------------------
 # Pagination
 # --------------------------
-def get_courses(page=1, limit=10, params=None, extra_query=None):
+def get_courses(page=1, limit=10, params=None, extra_query=None, convert=True):
+    """
+    convert=False leaves ObjectIds in the docs (msgpack responses encode them natively).
+    """
     if params is None:
         params = {}
     if extra_query is None:
         extra_query = {}
 
     skip = (page - 1) * limit
-    cursor = courses_collection.find(extra_query).skip(skip).limit(limit)
-    docs = [convert_objectids(d) for d in cursor]
-    total = courses_collection.count_documents(extra_query)
+    courses = catalog(courses_collection)
+    # _id order keeps pages stable and is served by the (filter, _id) indexes
+    cursor = courses.find(extra_query).sort("_id", ASCENDING).skip(skip).limit(limit)
+    docs = [convert_objectids(d) for d in cursor] if convert else list(cursor)
+    # unfiltered: collection metadata count instead of scanning every course
+    total = courses.count_documents(extra_query) if extra_query else courses.estimated_document_count()
     return docs, total
 
 
 # --------------------------
-# ENROLL USER
+# Cursor pagination (for scoped lists)
+# --------------------------
+# _ids are ObjectIds, or strings when the client sent an "id" on create. The
+# cursor keeps the type: ObjectId -> its hex, string -> "s:<value>".
+STRING_CURSOR_PREFIX = "s:"
+
+
+def encode_cursor(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    return f"{STRING_CURSOR_PREFIX}{value}"
+
+
+def decode_cursor(cursor):
+    """
+    Cursor -> the _id it points at; ValueError for anything we didn't issue.
+    """
+    if cursor.startswith(STRING_CURSOR_PREFIX):
+        return cursor[len(STRING_CURSOR_PREFIX):]
+    if ObjectId.is_valid(cursor):
+        return ObjectId(cursor)
+    raise ValueError(f"invalid cursor {cursor!r}")
+
+
+def after_id(last_id):
+    """
+    Filter for the documents after last_id in _id order. $gt only compares
+    within a BSON type, and every string sorts before every ObjectId: after a
+    string _id the ObjectId keys are all still ahead.
+    """
+    if isinstance(last_id, ObjectId):
+        return {"_id": {"$gt": last_id}}
+    return {"$or": [{"_id": {"$gt": last_id}}, {"_id": {"$type": "objectId"}}]}
+
+
+def get_page_by_cursor(collection, query, after=None, limit=20, projection=None, convert=True):
+    """
+    Keyset pagination on _id: walks the (scope, _id) index, never skips.
+    after is a cursor from a previous page (see encode_cursor).
+    Returns (docs, next_cursor); next_cursor is None on the last page.
+    convert=False leaves ObjectIds in the docs.
+    """
+    if after:
+        query = {**query, **after_id(decode_cursor(after))}
+
+    cursor = collection.find(query, projection).sort("_id", ASCENDING).limit(limit + 1)
+    docs = list(cursor)
+
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_cursor(docs[-1]["_id"])
+
+    return (convert_objectids(docs) if convert else docs), next_cursor
+
+
 # --------------------------
+# Course updates (one round trip)
+# --------------------------
+def id_filter(value):
+    """
+    _id filter matching an ObjectId _id or a client-supplied string one.
+    """
+    if isinstance(value, ObjectId):
+        return {"_id": value}
+    variants = id_variants(value)
+    return {"_id": {"$in": variants}} if len(variants) > 1 else {"_id": value}
+
+
+def course_id_filter(course_id):
+    """
+    Same matching rules as find_course (ObjectId or string _id), as one filter.
+    """
+    return id_filter(course_id)
+
+
+def update_course(course_id, update):
+    """
+    Applies update and returns the course as it is afterwards, or None when the
+    course doesn't exist. Replaces update_one + find_one.
+    """
+    return courses_collection.find_one_and_update(
+        course_id_filter(course_id),
+        update,
+        return_document=ReturnDocument.AFTER,
+    )
+
+
+def enrolled_user_ids(course_id, user_ids):
+    """
+    The subset of user_ids (str) that have an enrollment in course_id.
+    """
+    return set(enrollment_collection.distinct(
+        "user_id",
+        {"course_id": {"$in": id_variants(course_id)}, "user_id": {"$in": list(user_ids)}},
+    ))
+
+
+def _uncount_enrollments(course_real_id, entries, not_inserted):
+    """
+    The course update ($inc enrollers / $addToSet assigned_users) runs before
+    the enrollment insert. When that insert fails, take back what it counted:
+    not_inserted from enrollers, and the assigned_users entries of users that
+    have no enrollment in the course after all.
+    """
+    enrolled = enrolled_user_ids(course_real_id, [e["id"] for e in entries])
+    update = {"$inc": {"enrollers": -not_inserted}}
+    missing = [e for e in entries if e["id"] not in enrolled]
+    if missing:
+        update["$pull"] = {"assigned_users": {"$in": missing}}
+    courses_collection.update_one({"_id": course_real_id}, update)
+
+
+def _insert_enrollment(course_real_id, entry, enrollment_doc):
+    try:
+        enrollment_collection.insert_one(enrollment_doc)
+    except Exception:
+        _uncount_enrollments(course_real_id, [entry], 1)
+        raise
+
+
 # --------------------------
 # ENROLL USER
 # --------------------------
 def enroll_user_in_course(user, course_id: str, status="self_enrolled"):
-
-    course = find_course(course_id)
-    if not course:
-        return {"error": "course_not_found", "detail": "Course not found"}
-
-    course_real_id = course["_id"]
     user_id_str = str(user.id)
 
     assigned_entry = {
@@ -93,47 +387,34 @@ def enroll_user_in_course(user, course_id: str, status="self_enrolled"):
         "username": user.username
     }
 
+    # UPDATE course (also tells us whether it exists)
+    updated = update_course(course_id, {
+        "$inc": {"enrollers": 1},
+        "$addToSet": {"assigned_users": assigned_entry}
+    })
+    if not updated:
+        return {"error": "course_not_found", "detail": "Course not found"}
+
     enrollment_doc = {
         "user_id": user_id_str,
-        "course_id": str(course_real_id),
+        "course_id": updated["_id"],
         "status": status,
-        "created_at": datetime.utcnow().isoformat()
+        "created_at": datetime.utcnow()
     }
 
-    res = enrollment_collection.insert_one(enrollment_doc)
-    saved_enrollment = enrollment_collection.find_one({"_id": res.inserted_id})
-
-    # UPDATE course
-    courses_collection.update_one(
-        {"_id": course_real_id},
-        {
-            "$inc": {"enrollers": 1},
-            "$addToSet": {"assigned_users": assigned_entry}
-        }
-    )
-
-    updated = courses_collection.find_one({"_id": course_real_id})
+    # insert_one fills in _id, no need to read it back
+    _insert_enrollment(updated["_id"], assigned_entry, enrollment_doc)
 
     return {
         "course": convert_objectids(updated),
-        "enrollment": convert_objectids(saved_enrollment)
+        "enrollment": convert_objectids(enrollment_doc)
     }
 
 
-
-# --------------------------
-# ASSIGN SINGLE USER
-# --------------------------
 # --------------------------
 # ASSIGN SINGLE USER
 # --------------------------
 def assign_user_to_course(user, course_id: str):
-
-    course = find_course(course_id)
-    if not course:
-        return {"error": "course_not_found", "detail": "Course not found"}
-
-    course_real_id = course["_id"]
     user_id_str = str(user.id)
 
     assigned_entry = {
@@ -141,81 +422,74 @@ def assign_user_to_course(user, course_id: str):
         "username": user.username
     }
 
+    updated = update_course(course_id, {
+        "$inc": {"enrollers": 1},
+        "$addToSet": {"assigned_users": assigned_entry}
+    })
+    if not updated:
+        return {"error": "course_not_found", "detail": "Course not found"}
+
     enrollment_doc = {
         "user_id": user_id_str,
-        "course_id": str(course_real_id),
+        "course_id": updated["_id"],
         "status": "assigned",
         "assigned_by": "admin",
-        "created_at": datetime.utcnow().isoformat()
+        "created_at": datetime.utcnow()
     }
 
-    res = enrollment_collection.insert_one(enrollment_doc)
-    saved = enrollment_collection.find_one({"_id": res.inserted_id})
-
-    courses_collection.update_one(
-        {"_id": course_real_id},
-        {
-            "$inc": {"enrollers": 1},
-            "$addToSet": {"assigned_users": assigned_entry}
-        }
-    )
-
-    updated = courses_collection.find_one({"_id": course_real_id})
+    _insert_enrollment(updated["_id"], assigned_entry, enrollment_doc)
 
     return {
         "course": convert_objectids(updated),
-        "enrollment": convert_objectids(saved)
+        "enrollment": convert_objectids(enrollment_doc)
     }
+
+
 # --------------------------
 # ASSIGN MULTIPLE USERS
 # --------------------------
 def assign_multiple_users_to_course(users, course_id: str):
 
-    course = find_course(course_id)
-    if not course:
-        return {"error": "course_not_found", "detail": "Course not found"}
-
-    course_real_id = course["_id"]
-
-    all_enrollments = []
-    user_ids = []
-    assigned_users = []
-
-    for user in users:
-        user_id_str = str(user.id)
-        user_ids.append(user_id_str)
-
-        enrollment_doc = {
-            "user_id": user_id_str,
-            "username": user.username,       # ⭐ NEW
-            "course_id": str(course_real_id),
-            "status": "assigned",
-            "created_at": datetime.utcnow().isoformat()
-        }
+    assigned_users = [
+        {"id": str(user.id), "username": user.username}
+        for user in users
+    ]
 
-        res = enrollment_collection.insert_one(enrollment_doc)
-        saved = enrollment_collection.find_one({"_id": res.inserted_id})
-        all_enrollments.append(convert_objectids(saved))
+    # Update course: increment enrollers + add list of users
+    updated_course = update_course(course_id, {
+        "$inc": {"enrollers": len(assigned_users)},
+        "$addToSet": {"assigned_users": {"$each": assigned_users}}
+    })
+    if not updated_course:
+        return {"error": "course_not_found", "detail": "Course not found"}
 
-        # Add to assigned_users list (username + id)
-        assigned_users.append({
-            "id": user_id_str,
-            "username": user.username
-        })
+    course_real_id = updated_course["_id"]
+    created_at = datetime.utcnow()
 
-    # Update course: increment enrollers + add list of users
-    courses_collection.update_one(
-        {"_id": course_real_id},
+    enrollment_docs = [
         {
-            "$inc": {"enrollers": len(all_enrollments)},
-            "$addToSet": {"assigned_users": {"$each": assigned_users}}
+            "user_id": entry["id"],
+            "username": entry["username"],
+            "course_id": course_real_id,
+            "status": "assigned",
+            "created_at": created_at
         }
-    )
-
-    updated_course = courses_collection.find_one({"_id": course_real_id})
+        for entry in assigned_users
+    ]
+
+    # one round trip for all users; insert_many fills in each _id
+    if enrollment_docs:
+        try:
+            enrollment_collection.insert_many(enrollment_docs)
+        except BulkWriteError as exc:
+            # ordered insert: the first nInserted docs made it
+            _uncount_enrollments(course_real_id, assigned_users, len(enrollment_docs) - exc.details["nInserted"])
+            raise
+        except Exception:
+            _uncount_enrollments(course_real_id, assigned_users, len(enrollment_docs))
+            raise
 
     return {
         "course": convert_objectids(updated_course),
-        "enrollments": all_enrollments
+        "enrollments": convert_objectids(enrollment_docs)
     }
-
@@ -0,0 +1,350 @@
+# courses/validation.py
+"""
+Fast-path validation for the hot write serializers.
+
+compiled(SerializerClass) walks the DRF field tree once and builds a plain
+Python function per field. For well-formed JSON input the compiled functions
+produce exactly what serializer.validated_data would. Anything they are not
+sure about (a bad value, None, an unknown field type) is handed back to the
+DRF field itself, so error messages and error structure are DRF's own.
+"""
+import re
+from functools import lru_cache
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.validators import (
+    MaxLengthValidator,
+    MaxValueValidator,
+    MinLengthValidator,
+    MinValueValidator,
+)
+from rest_framework import serializers
+from rest_framework.fields import (
+    ProhibitNullCharactersValidator,
+    ProhibitSurrogateCharactersValidator,
+    SkipField,
+    _UnvalidatedField,
+    empty,
+    get_error_detail,
+)
+
+
+class _Slow(Exception):
+    """Fast path can't decide - let DRF validate this field."""
+
+
+_SURROGATES = re.compile("[\ud800-\udfff]")
+
+
+# --------------------------
+# Field compilers
+# --------------------------
+def _limits(field):
+    """
+    (min, max) taken from the field's validators, or None when the field has a
+    validator we don't reproduce (then it always goes through DRF).
+    """
+    low = high = None
+    for validator in field.validators:
+        if isinstance(validator, (MaxLengthValidator, MaxValueValidator)):
+            high = validator.limit_value
+        elif isinstance(validator, (MinLengthValidator, MinValueValidator)):
+            low = validator.limit_value
+        elif isinstance(validator, (ProhibitNullCharactersValidator, ProhibitSurrogateCharactersValidator)):
+            continue
+        else:
+            return None
+    return low, high
+
+
+def _always_slow(value):
+    raise _Slow
+
+
+def _compile_char(field, low, high):
+    allow_blank = field.allow_blank
+    trim = field.trim_whitespace
+
+    def validate(value):
+        if type(value) is not str:
+            raise _Slow
+        if trim:
+            value = value.strip()
+        if not value:
+            if allow_blank:
+                return ""
+            raise _Slow
+        if "\x00" in value or (not value.isascii() and _SURROGATES.search(value)):
+            raise _Slow
+        if (high is not None and len(value) > high) or (low is not None and len(value) < low):
+            raise _Slow
+        return value
+
+    return validate
+
+
+def _compile_number(cast, accepted, low, high):
+    def validate(value):
+        if type(value) not in accepted:
+            raise _Slow
+        try:
+            value = cast(value)
+        except OverflowError:
+            raise _Slow
+        if (high is not None and value > high) or (low is not None and value < low):
+            raise _Slow
+        if value != value or value in (float("inf"), float("-inf")):
+            raise _Slow
+        return value
+
+    return validate
+
+
+def _compile_choice(field):
+    choices = field.choice_strings_to_values
+
+    def validate(value):
+        if type(value) is not str or value not in choices:
+            raise _Slow
+        return choices[value]
+
+    return validate
+
+
+def _compile_bool(value):
+    if value is True or value is False:
+        return value
+    raise _Slow
+
+
+def _compile_list(field, low, high):
+    child = _compile_value(field.child)
+    allow_empty = field.allow_empty
+
+    def validate(value):
+        if type(value) is not list or (not value and not allow_empty):
+            raise _Slow
+        if (high is not None and len(value) > high) or (low is not None and len(value) < low):
+            raise _Slow
+        return [child(item) for item in value]
+
+    return validate
+
+
+def _compile_dict(field):
+    child = _compile_value(field.child)
+    allow_empty = field.allow_empty
+
+    def validate(value):
+        if type(value) is not dict or (not value and not allow_empty):
+            raise _Slow
+        return {str(k): child(v) for k, v in value.items()}
+
+    return validate
+
+
+def _compile_list_serializer(field):
+    child = _compile_value(field.child)
+    if field.validators or type(field).validate is not serializers.ListSerializer.validate:
+        return _always_slow
+    allow_empty = field.allow_empty
+    low, high = field.min_length, field.max_length
+
+    def validate(value):
+        if type(value) is not list or (not value and not allow_empty):
+            raise _Slow
+        if (high is not None and len(value) > high) or (low is not None and len(value) < low):
+            raise _Slow
+        return [child(item) for item in value]
+
+    return validate
+
+
+def _compile_nested(serializer):
+    plan = _compile_plan(serializer)
+    if plan is None:
+        return _always_slow
+
+    def validate(value):
+        if type(value) is not dict:
+            raise _Slow
+        ret = {}
+        for name, fast, _field, source_attrs in plan:
+            try:
+                validated = fast(value.get(name, empty))
+            except SkipField:
+                continue
+            _store(ret, source_attrs, validated)
+        return ret
+
+    return validate
+
+
+def _unvalidated(value):
+    return value
+
+
+def _compile_value(field):
+    """
+    fn(primitive) -> internal value for a present, non-None primitive.
+    """
+    if isinstance(field, serializers.ListSerializer):
+        return _compile_list_serializer(field)
+    if isinstance(field, serializers.Serializer):
+        return _compile_nested(field)
+    if type(field) is _UnvalidatedField:
+        return _unvalidated
+
+    limits = _limits(field)
+    if limits is None:
+        return _always_slow
+    low, high = limits
+
+    kind = type(field)
+    if kind is serializers.CharField:
+        return _compile_char(field, low, high)
+    if kind is serializers.IntegerField:
+        return _compile_number(int, (int,), low, high)
+    if kind is serializers.FloatField:
+        return _compile_number(float, (int, float), low, high)
+    if kind is serializers.BooleanField and not field.validators:
+        return _compile_bool
+    if kind is serializers.ChoiceField and not field.validators:
+        return _compile_choice(field)
+    if kind is serializers.ListField:
+        return _compile_list(field, low, high)
+    if kind is serializers.DictField and not field.validators:
+        return _compile_dict(field)
+    return _always_slow
+
+
+def _compile_field(field):
+    """
+    Wraps _compile_value with DRF's empty/None handling (validate_empty_values).
+    """
+    if isinstance(field, serializers.HiddenField):
+        return lambda value: field.get_default()
+
+    value_fn = _compile_value(field)
+    required = field.required
+    has_default = field.default is not empty
+
+    def validate(value):
+        if value is empty:
+            if required:
+                raise _Slow
+            if has_default:
+                return field.get_default()
+            raise SkipField
+        if value is None:
+            raise _Slow
+        return value_fn(value)
+
+    return validate
+
+
+def _compile_plan(serializer):
+    """
+    [(field_name, fast_fn, field, source_attrs)] for the writable fields, or
+    None when the serializer has custom validation we must not bypass.
+    """
+    cls = type(serializer)
+    if cls.validate is not serializers.Serializer.validate or serializer.validators:
+        return None
+
+    plan = []
+    for field in serializer._writable_fields:
+        if hasattr(serializer, "validate_" + field.field_name):
+            return None
+        plan.append((field.field_name, _compile_field(field), field, field.source_attrs))
+    return plan
+
+
+def _store(ret, source_attrs, value):
+    # same as Serializer.set_value: source="a.b" nests, source="*" merges
+    if not source_attrs:
+        ret.update(value)
+        return
+    for key in source_attrs[:-1]:
+        ret = ret.setdefault(key, {})
+    ret[source_attrs[-1]] = value
+
+
+# --------------------------
+# Public API
+# --------------------------
+class CompiledSerializer:
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+        self.plan = _compile_plan(serializer_class())
+
+    def run(self, data):
+        """
+        Returns (validated_data, errors) - errors is {} when the data is valid
+        and has the same shape as serializer.errors otherwise.
+        """
+        if self.plan is None or type(data) is not dict:
+            serializer = self.serializer_class(data=data)
+            if serializer.is_valid():
+                return serializer.validated_data, {}
+            return None, dict(serializer.errors)
+
+        ret, errors = {}, {}
+        for name, fast, field, source_attrs in self.plan:
+            primitive = data.get(name, empty)
+            try:
+                try:
+                    validated = fast(primitive)
+                except _Slow:
+                    validated = field.run_validation(primitive)
+            except serializers.ValidationError as exc:
+                errors[name] = exc.detail
+            except DjangoValidationError as exc:
+                errors[name] = get_error_detail(exc)
+            except SkipField:
+                pass
+            else:
+                _store(ret, source_attrs, validated)
+
+        if errors:
+            return None, errors
+        return ret, {}
+
+    def validate(self, data):
+        validated, errors = self.run(data)
+        if errors:
+            raise serializers.ValidationError(errors)
+        return validated
+
+    def validate_many(self, items):
+        """
+        Same contract as Serializer(data=items, many=True): list of validated
+        docs, or ValidationError with one error dict per item ({} when valid).
+        """
+        if not isinstance(items, list):
+            serializer = self.serializer_class(data=items, many=True)
+            serializer.is_valid(raise_exception=True)
+            return serializer.validated_data
+
+        results = [self.run(item) for item in items]
+        if any(errors for _, errors in results):
+            raise serializers.ValidationError([errors for _, errors in results])
+        return [validated for validated, _ in results]
+
+
+@lru_cache(maxsize=None)
+def compiled(serializer_class):
+    return CompiledSerializer(serializer_class)
+
+
+def validate_request(serializer_class, data, fast=True):
+    """
+    Drop-in for `s = X(data=data); s.is_valid(raise_exception=True); s.validated_data`.
+    fast=False keeps the plain DRF path (per-view switch).
+    """
+    if fast:
+        return compiled(serializer_class).validate(data)
+
+    serializer = serializer_class(data=data)
+    serializer.is_valid(raise_exception=True)
+    return serializer.validated_data
@@ -1,20 +1,29 @@
 # courses/views.py
 
 from rest_framework import viewsets
+from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from rest_framework.decorators import action
 
-from bson import ObjectId
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
 from datetime import datetime
 
 # Serializers
 from .serializers import (
     CourseSerializer,
+    CourseCloneSerializer,
     EnrollmentSerializer,
+    MembershipCheckSerializer,
     ModuleSerializer,
     TopicSerializer,
-    ContentSerializer
+    ContentSerializer,
+    ContentVersionSerializer,
+    BatchSerializer,
+    ProgressEventBatchSerializer,
+    UploadInitSerializer,
 )
 
 # Mongo Utils
@@ -25,132 +34,281 @@ from .utils import (
     contents_collection,
     enrollment_collection,
     get_courses,
-    convert_objectids,
-    find_course
+    get_page_by_cursor,
+    decode_cursor,
+    catalog_filter,
+    catalog,
+    read_primary,
+    typed_course,
+    find_course,
+    find_catalog_course,
 )
 
+# Fast-path validation
+from .validation import validate_request
+
+# Catalog snapshots
+from .snapshots import snapshot_params, get_snapshot, pick_encoding, invalidate_snapshots
+
 # Service Layer
 from .services.enrollment_service import EnrollmentService
+from .services.batch_service import BatchService
+from .services.job_service import JobService
+from .services.progress_service import NotEnrolled, ProgressService
+from .services.ranking_service import RankingService
+from .services.media_service import MediaService
+from .services.content_service import ContentService
+from .services.clone_service import CloneService
+from .services.membership_service import MembershipService
+from .services.upload_service import UploadError, UploadService
 
 # Notification
 from notifications.services import NotificationService
 
+# Metrics
+from courseapi.metrics import ViewMetricsMixin
+
+# MessagePack negotiation (Accept / Content-Type: application/msgpack)
+from .renderers import MessagePackNegotiation, encode_ids, native_ids
+
+
+# =====================================================================
+# SCOPED LISTS (modules / topics / contents of one parent)
+# =====================================================================
+MAX_LIST_LIMIT = 100
+
+
+def scoped_list(request, collection, scope_field, decorate=None):
+    """
+    ?<scope_field>=<id> (required) &limit=20 &after=<cursor> &fields=title,description
+    decorate(docs) may add derived fields to the page before it is returned.
+    """
+    scope_value = request.GET.get(scope_field)
+    if not scope_value:
+        return Response({"error": f"{scope_field}_required"}, status=400)
+
+    try:
+        limit = max(1, min(int(request.GET.get("limit", 20)), MAX_LIST_LIMIT))
+    except ValueError:
+        return Response({"error": "invalid_limit"}, status=400)
+
+    after = request.GET.get("after")
+    if after:
+        try:
+            decode_cursor(after)
+        except ValueError:
+            return Response({"error": "invalid_cursor"}, status=400)
+
+    projection = None
+    if request.GET.get("fields"):
+        projection = {f: 1 for f in request.GET.get("fields").split(",") if f}
+
+    docs, next_cursor = get_page_by_cursor(
+        catalog(collection),
+        {scope_field: scope_value},
+        after=after,
+        limit=limit,
+        projection=projection,
+        convert=not native_ids(request),
+    )
+    if decorate is not None:
+        docs = decorate(docs)
+
+    return Response({
+        "limit": limit,
+        "next": next_cursor,
+        "results": docs
+    })
+
 
 # =====================================================================
 # MODULES
 # =====================================================================
-class ModuleViewSet(viewsets.ViewSet):
+class ModuleViewSet(MessagePackNegotiation, ViewMetricsMixin, viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
+    fast_validation = True   # compiled validator instead of DRF field-by-field
 
     def list(self, request):
-        docs = list(modules_collection.find())
-        return Response(convert_objectids(docs))
+        return scoped_list(request, modules_collection, "course_id")
 
     def create(self, request):
-        serializer = ModuleSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+        saved = validate_request(ModuleSerializer, request.data, fast=self.fast_validation)
 
-        res = modules_collection.insert_one(serializer.validated_data)
-        saved = modules_collection.find_one({"_id": res.inserted_id})
-        return Response(convert_objectids(saved), status=201)
+        # insert_one adds _id to the dict, so it is the saved document
+        modules_collection.insert_one(saved)
+        return Response(encode_ids(request, saved), status=201)
 
 
 # =====================================================================
 # TOPICS
 # =====================================================================
-class TopicViewSet(viewsets.ViewSet):
+class TopicViewSet(MessagePackNegotiation, ViewMetricsMixin, viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
+    fast_validation = True
+
+    def list(self, request):
+        return scoped_list(request, topics_collection, "module_id")
 
     def create(self, request):
-        serializer = TopicSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+        saved = validate_request(TopicSerializer, request.data, fast=self.fast_validation)
 
-        res = topics_collection.insert_one(serializer.validated_data)
-        saved = topics_collection.find_one({"_id": res.inserted_id})
-        return Response(convert_objectids(saved), status=201)
+        # insert_one adds _id to the dict, so it is the saved document
+        topics_collection.insert_one(saved)
+        return Response(encode_ids(request, saved), status=201)
 
 
 # =====================================================================
 # CONTENT
 # =====================================================================
-class ContentViewSet(viewsets.ViewSet):
+class ContentViewSet(MessagePackNegotiation, ViewMetricsMixin, viewsets.ViewSet):
+    """
+    Content documents carry only a current_version summary; payloads are
+    fetched one version at a time:
+    GET  /contents/<id>/versions/            -> history (no data)
+    POST /contents/<id>/versions/            -> new version, becomes current
+    GET  /contents/<id>/versions/latest/     -> current version with data
+    GET  /contents/<id>/versions/<versionid>/
+    """
     permission_classes = [IsAuthenticated]
+    fast_validation = True
+
+    def list(self, request):
+        # video metadata comes from the media index, never from the files
+        return scoped_list(request, contents_collection, "topic_id", decorate=self._decorate)
+
+    @staticmethod
+    def _decorate(docs):
+        return MediaService.attach([ContentService.without_versions(d) for d in docs])
 
     def create(self, request):
-        serializer = ContentSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+        saved = validate_request(ContentSerializer, request.data, fast=self.fast_validation)
 
-        res = contents_collection.insert_one(serializer.validated_data)
-        saved = contents_collection.find_one({"_id": res.inserted_id})
-        return Response(convert_objectids(saved), status=201)
+        try:
+            content, versions = ContentService.create(saved)
+        except ValueError as exc:
+            return Response({"error": str(exc)}, status=409)
+        MediaService.index_later(v.get("url") for v in versions)
+        return Response(encode_ids(request, self._decorate([content])[0]), status=201)
+
+    def retrieve(self, request, pk=None):
+        content = ContentService.get(pk)
+        if not content:
+            return Response({"error": "Content not found"}, status=404)
+        return Response(encode_ids(request, self._decorate([content])[0]))
+
+    @action(detail=True, methods=["get", "post"])
+    def versions(self, request, pk=None):
+        if request.method == "POST":
+            data = validate_request(ContentVersionSerializer, request.data, fast=self.fast_validation)
+            try:
+                version = ContentService.add_version(pk, data)
+            except ValueError as exc:
+                return Response({"error": str(exc)}, status=409)
+            if version is None:
+                return Response({"error": "Content not found"}, status=404)
+            MediaService.index_later([version.get("url")])
+            return Response(encode_ids(request, MediaService.attach_versions([version])[0]), status=201)
+
+        content = ContentService.get(pk)
+        if not content:
+            return Response({"error": "Content not found"}, status=404)
+        history = MediaService.attach_versions(ContentService.history(content))
+        return Response({"content_id": pk, "results": encode_ids(request, history)})
+
+    @action(detail=True, methods=["get"], url_path=r"versions/(?P<versionid>[^/]+)")
+    def version(self, request, pk=None, versionid=None):
+        content = ContentService.get(pk)
+        if not content:
+            return Response({"error": "Content not found"}, status=404)
+
+        if versionid == "latest":
+            version = ContentService.latest(content)
+        else:
+            version = ContentService.version(content, versionid)
+        if not version:
+            return Response({"error": "Version not found"}, status=404)
+        return Response(encode_ids(request, MediaService.attach_versions([version])[0]))
 
 
 # =====================================================================
 # COURSES MAIN
 # =====================================================================
-class CourseViewSet(viewsets.ViewSet):
+class CourseViewSet(MessagePackNegotiation, ViewMetricsMixin, viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
+    fast_validation = True
 
     # ---------------------------------------------------------
     # LIST COURSES
     # ---------------------------------------------------------
     def list(self, request):
+        # first catalog page per segment x course_type: pre-rendered bytes
+        # (only for users enrolled in none of its courses: it says is_enrolled false)
+        snapshot_key = snapshot_params(request.GET)
+        if snapshot_key and request.accepted_renderer.format == "json" and not read_primary.get():
+            snapshot = get_snapshot(*snapshot_key)
+            if not snapshot["course_ids"] & MembershipService.enrolled_ids(request.user.id):
+                return self._snapshot_response(request, snapshot)
+
         page = int(request.GET.get("page", 1))
         limit = int(request.GET.get("limit", 10))
 
-        extra_query = {}
-
-        if "segment" in request.GET:
-            extra_query["segment"] = {
-                "$in": request.GET.get("segment").strip("[]").split(",")
-            }
-
-        if "category" in request.GET:
-            extra_query["metadata.category.name"] = {
-                "$in": request.GET.get("category").strip("[]").split(",")
-            }
-
-        if "sub_category" in request.GET:
-            extra_query["metadata.category.sub_category.name"] = {
-                "$in": request.GET.get("sub_category").strip("[]").split(",")
-            }
-
-        if "course_type" in request.GET:
-            extra_query["course_type"] = {
-                "$in": request.GET.get("course_type").strip("[]").split(",")
-            }
+        extra_query = catalog_filter(request.GET)
 
         docs, total = get_courses(
             page=page,
             limit=limit,
             params=request.GET,
             extra_query=extra_query,
+            convert=not native_ids(request),
         )
 
         return Response({
             "total": total,
             "page": page,
             "limit": limit,
-            "results": docs
+            "results": MembershipService.annotate(request.user.id, docs)
         })
 
+    def _snapshot_response(self, request, snapshot):
+        encoding = pick_encoding(snapshot, request.META.get("HTTP_ACCEPT_ENCODING"))
+
+        response = HttpResponse(snapshot[encoding], content_type="application/json")
+        if encoding != "identity":
+            response["Content-Encoding"] = encoding
+        patch_vary_headers(response, ["Accept-Encoding"])
+        return response
+
     # ---------------------------------------------------------
-    # GET ONE COURSE (supports both ObjectId + string IDs)
+    # POPULAR / TRENDING RAILS (precomputed top-K)
     # ---------------------------------------------------------
-    def retrieve(self, request, pk=None):
+    @action(detail=False, methods=["get"])
+    def popular(self, request):
+        return self._rail(request, RankingService.popular)
+
+    @action(detail=False, methods=["get"])
+    def trending(self, request):
+        return self._rail(request, RankingService.trending)
 
-        # Try ObjectId
+    def _rail(self, request, source):
         try:
-            doc = courses_collection.find_one({"_id": ObjectId(pk)})
-            if doc:
-                return Response(convert_objectids(doc))
-        except:
-            pass
-
-        # Try string _id
-        doc = courses_collection.find_one({"_id": pk})
+            limit = int(request.GET["limit"]) if "limit" in request.GET else None
+        except ValueError:
+            return Response({"error": "invalid_limit"}, status=400)
+
+        results = source(
+            segment=request.GET.get("segment") or None,
+            category=request.GET.get("category") or None,
+            limit=limit,
+        )
+        return Response({"results": results})
+
+    # ---------------------------------------------------------
+    # GET ONE COURSE (supports both ObjectId + string IDs)
+    # ---------------------------------------------------------
+    def retrieve(self, request, pk=None):
+        doc = find_catalog_course(pk)
         if doc:
-            return Response(convert_objectids(doc))
+            return Response(MembershipService.annotate(request.user.id, [encode_ids(request, doc)])[0])
 
         return Response({"detail": "Course not found"}, status=404)
 
@@ -158,17 +316,31 @@ class CourseViewSet(viewsets.ViewSet):
     # CREATE COURSE
     # ---------------------------------------------------------
     def create(self, request):
-        serializer = CourseSerializer(data=request.data)
-        serializer.is_valid(raise_exception=True)
+        data = validate_request(CourseSerializer, request.data, fast=self.fast_validation)
+        data["created_at"] = data["updated_at"] = datetime.utcnow()
+        typed_course(data)
+
+        courses_collection.insert_one(data)
+        invalidate_snapshots()
 
-        data = serializer.validated_data
-        data["created_at"] = datetime.utcnow().isoformat()
-        data["updated_at"] = datetime.utcnow().isoformat()
+        return Response(encode_ids(request, data), status=201)
 
-        res = courses_collection.insert_one(data)
-        saved = courses_collection.find_one({"_id": res.inserted_id})
+    # ---------------------------------------------------------
+    # CLONE (new cohort edition: course + whole outline, new ids)
+    # ---------------------------------------------------------
+    @action(detail=True, methods=["post"], permission_classes=[IsAdminUser])
+    def clone(self, request, pk=None):
+        overrides = validate_request(CourseCloneSerializer, request.data, fast=self.fast_validation)
 
-        return Response(convert_objectids(saved), status=201)
+        result = CloneService.clone_course(pk, overrides=overrides, user=request.user)
+        if "error" in result:
+            return Response({"detail": "Course not found"}, status=404)
+
+        invalidate_snapshots()
+        return Response(
+            {"course": encode_ids(request, result["course"]), "copied": result["counts"]},
+            status=201,
+        )
 
     # ---------------------------------------------------------
     # USER SELF ENROLL
@@ -186,7 +358,8 @@ class CourseViewSet(viewsets.ViewSet):
         NotificationService.send(
             event_name="COURSE_ENROLLED",
             ctx={"username": request.user.username, "course": course_title},
-            to_email=request.user.email
+            to_email=request.user.email,
+            user_id=request.user.id,
         )
 
         return Response(result["enrollment"], status=201)
@@ -217,7 +390,8 @@ class CourseViewSet(viewsets.ViewSet):
         NotificationService.send(
             event_name="COURSE_ENROLLED",
             ctx={"username": user.username, "course": course_title},
-            to_email=user.email
+            to_email=user.email,
+            user_id=user.id,
         )
 
         return Response(result, status=201)
@@ -237,41 +411,128 @@ class CourseViewSet(viewsets.ViewSet):
 
         if not isinstance(user_ids, list) or len(user_ids) == 0:
             return Response({"error": "user_ids must be a non-empty list"}, status=400)
+        if not find_course(pk):
+            return Response({"error": "course_not_found", "detail": "Course not found"}, status=400)
+
+        # enrollments + emails run in the background, in chunks
+        job = JobService.submit(
+            "assign_multiple",
+            items=user_ids,
+            payload={"course_id": pk},
+            created_by=request.user.id,
+        )
+        return Response(JobService.public(job), status=202)
 
-        from accounts.models import User
-        users, invalid = [], []
+    # ---------------------------------------------------------
+    # ADMIN ASSIGN A COHORT FROM CSV (user_id or email column)
+    # ---------------------------------------------------------
+    @action(
+        detail=True,
+        methods=["post"],
+        permission_classes=[IsAdminUser],
+        url_path="assign-csv"
+    )
+    def assign_csv(self, request, pk=None):
+        upload = request.FILES.get("file")
+        if not upload:
+            return Response({"error": "file_required"}, status=400)
+        if not find_course(pk):
+            return Response({"error": "course_not_found", "detail": "Course not found"}, status=400)
+
+        import csv   # only this upload path needs csv/io
+        import io
+
+        reader = csv.DictReader(io.TextIOWrapper(upload.file, encoding="utf-8-sig"))
+        column = next((c for c in ("user_id", "email") if c in (reader.fieldnames or [])), None)
+        if not column:
+            return Response({"error": "csv needs a user_id or email column"}, status=400)
+
+        items = [row[column].strip() for row in reader if (row.get(column) or "").strip()]
+        if not items:
+            return Response({"error": "csv has no rows"}, status=400)
+
+        job = JobService.submit(
+            "assign_multiple",
+            items=items,
+            payload={"course_id": pk, "source": upload.name},
+            created_by=request.user.id,
+        )
+        return Response(JobService.public(job), status=202)
 
-        for uid in user_ids:
-            try:
-                users.append(User.objects.get(id=uid))
-            except User.DoesNotExist:
-                invalid.append(uid)
 
-        result = EnrollmentService.assign_multiple(users, pk)
+# =====================================================================
+# RESUMABLE VIDEO UPLOADS
+# =====================================================================
+class UploadViewSet(MessagePackNegotiation, ViewMetricsMixin, viewsets.ViewSet):
+    """
+    POST /uploads/ {filename, size, sha256?}        -> session + chunk_size
+    PUT  /uploads/<id>/chunks/<i>/ (raw bytes)      -> X-Chunk-Sha256 checked
+    GET  /uploads/<id>/                             -> received / missing chunks
+    POST /uploads/<id>/finalize/                    -> url + media metadata
+    """
+    permission_classes = [IsAuthenticated]
 
-        if "error" in result:
-            return Response(result, status=400)
+    def create(self, request):
+        data = validate_request(UploadInitSerializer, request.data)
+        try:
+            upload = UploadService.init(request.user, data["filename"], data["size"], data.get("sha256"))
+        except UploadError as exc:
+            return Response({"error": exc.code, "detail": exc.detail}, status=exc.status)
+        return Response(UploadService.status(upload), status=201)
 
-        course_title = result["course"]["course_title"]
+    def retrieve(self, request, pk=None):
+        try:
+            return Response(UploadService.status(UploadService.get(request.user, pk)))
+        except UploadError as exc:
+            return Response({"error": exc.code, "detail": exc.detail}, status=exc.status)
 
-        # Send emails to each assigned user
-        for user in users:
-            NotificationService.send(
-                event_name="COURSE_ENROLLED",
-                ctx={"username": user.username, "course": course_title},
-                to_email=user.email
+    @action(detail=True, methods=["put"], url_path=r"chunks/(?P<index>\d+)")
+    def chunk(self, request, pk=None, index=None):
+        # raw body, streamed to disk: request.data is never touched
+        try:
+            length = int(request.META.get("CONTENT_LENGTH") or 0)
+            result = UploadService.write_chunk(
+                request.user, pk, int(index), request.stream, length,
+                expected_sha256=request.headers.get("X-Chunk-Sha256"),
             )
+        except UploadError as exc:
+            return Response({"error": exc.code, "detail": exc.detail}, status=exc.status)
+        return Response(result)
 
-        if invalid:
-            result["invalid_user_ids"] = invalid
+    @action(detail=True, methods=["post"])
+    def finalize(self, request, pk=None):
+        try:
+            upload = UploadService.finalize(request.user, pk)
+        except UploadError as exc:
+            return Response({"error": exc.code, "detail": exc.detail}, status=exc.status)
 
-        return Response(result, status=201)
+        media = upload.get("media") or {}
+        return Response({
+            "id": str(upload["_id"]),
+            "url": upload["url"],
+            "sha256": upload["sha256"],
+            "size": upload["size"],
+            "media": {k: v for k, v in media.items() if k not in ("_id", "paths", "indexed_at")},
+        })
+
+
+# =====================================================================
+# BACKGROUND JOBS (status of assign-multiple / CSV uploads)
+# =====================================================================
+class JobViewSet(MessagePackNegotiation, ViewMetricsMixin, viewsets.ViewSet):
+    permission_classes = [IsAdminUser]
+
+    def retrieve(self, request, pk=None):
+        job = JobService.get(pk)
+        if not job:
+            return Response({"detail": "Job not found"}, status=404)
+        return Response(JobService.public(job))
 
 
 # =====================================================================
 # ENROLLMENT VIEWSET
 # =====================================================================
-class EnrollmentViewSet(viewsets.ViewSet):
+class EnrollmentViewSet(MessagePackNegotiation, ViewMetricsMixin, viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
 
     def create(self, request):
@@ -289,5 +550,72 @@ class EnrollmentViewSet(viewsets.ViewSet):
 
         return Response({
             "username": request.user.username,
-            "enrolled_courses": convert_objectids(docs)
+            "enrolled_courses": encode_ids(request, docs)
         })
+
+    @action(detail=False, methods=["post"])
+    def check(self, request):
+        """
+        {"course_ids": [...], "user_id": (admins only)} -> {"results": {course_id: bool}}
+        """
+        data = validate_request(MembershipCheckSerializer, request.data)
+        user_id = request.user.id
+        if data.get("user_id") is not None and data["user_id"] != user_id:
+            if not request.user.is_staff:
+                return Response({"error": "forbidden"}, status=403)
+            user_id = data["user_id"]
+
+        return Response({"user_id": user_id, "results": MembershipService.check(user_id, data["course_ids"])})
+
+
+
+# =====================================================================
+# LEARNER PROGRESS
+# =====================================================================
+class ProgressViewSet(MessagePackNegotiation, ViewMetricsMixin, viewsets.ViewSet):
+    permission_classes = [IsAuthenticated]
+
+    def list(self, request):
+        docs = ProgressService.for_user(request.user, request.GET.get("course_id"))
+        return Response(encode_ids(request, docs))
+
+    def create(self, request):
+        """
+        Batched player events; written in coalesced bulk upserts, so percent
+        shows up within PROGRESS_FLUSH_SECONDS.
+        """
+        data = validate_request(ProgressEventBatchSerializer, request.data)
+
+        try:
+            accepted, rejected = ProgressService.record(request.user, data["events"])
+        except NotEnrolled as exc:
+            return Response({"error": "not_enrolled", "course_ids": exc.course_ids}, status=403)
+        return Response({"accepted": accepted, "rejected": rejected}, status=202)
+
+
+# =====================================================================
+# BATCH (many API calls in one HTTP round trip)
+# =====================================================================
+class BatchView(MessagePackNegotiation, ViewMetricsMixin, APIView):
+    permission_classes = [IsAuthenticated]
+
+    # viewsets a batch item may hit
+    batchable_views = (
+        CourseViewSet,
+        ModuleViewSet,
+        TopicViewSet,
+        ContentViewSet,
+        EnrollmentViewSet,
+    )
+
+    def post(self, request):
+        serializer = BatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        results = BatchService.run(
+            request,
+            serializer.validated_data["requests"],
+            allowed_views=self.batchable_views,
+            parallel=serializer.validated_data["parallel"],
+        )
+        return Response({"results": results})
@@ -1,26 +1,75 @@
+import threading
+import time
+
+from django.conf import settings
 from django.template import Template, Context
 from django.core.mail import send_mail
+
+from courseapi.metrics import NOTIFICATION_LATENCY, NOTIFICATIONS
 from .models import NotificationTemplate
 
+
 class NotificationService:
+    # event_name -> (compiled subject, compiled body); reloaded every
+    # NOTIFICATION_TEMPLATE_CACHE_SECONDS and cleared when a template is saved
+    _templates = {}
+    _loaded_at = None
+    _lock = threading.Lock()
+
+    @staticmethod
+    def load_templates():
+        compiled = {
+            t.event_name: (Template(t.subject), Template(t.body))
+            for t in NotificationTemplate.objects.all()
+        }
+        with NotificationService._lock:
+            NotificationService._templates = compiled
+            NotificationService._loaded_at = time.monotonic()
+        return len(compiled)
 
     @staticmethod
-    def send(event_name: str, ctx: dict, to_email: str):
-        try:
-            template = NotificationTemplate.objects.get(event_name=event_name)
-        except NotificationTemplate.DoesNotExist:
+    def clear_templates():
+        NotificationService._loaded_at = None
+
+    @staticmethod
+    def get_template(event_name):
+        loaded_at = NotificationService._loaded_at
+        max_age = getattr(settings, "NOTIFICATION_TEMPLATE_CACHE_SECONDS", 300)
+        if loaded_at is None or time.monotonic() - loaded_at > max_age:
+            NotificationService.load_templates()
+        return NotificationService._templates.get(event_name)
+
+    @staticmethod
+    def send(event_name: str, ctx: dict, to_email: str, user_id=None):
+        """
+        Renders and emails event_name. With user_id the subject is also pushed
+        to that user's open /api/events/ streams.
+        """
+        template = NotificationService.get_template(event_name)
+        if template is None:
             print("Template not found:", event_name)
+            NOTIFICATIONS.inc(event=event_name, result="no_template")
             return False
 
-        # Render email contents dynamically
-        subject = Template(template.subject).render(Context(ctx))
-        body = Template(template.body).render(Context(ctx))
-
-        send_mail(
-            subject,
-            body,
-            "no-reply@synchroni.in",  # sender email
-            [to_email],
-            fail_silently=False
-        )
+        with NOTIFICATION_LATENCY.time(event=event_name):
+            # Render email contents dynamically
+            subject_template, body_template = template
+            subject = subject_template.render(Context(ctx))
+            body = body_template.render(Context(ctx))
+
+            try:
+                send_mail(
+                    subject,
+                    body,
+                    "no-reply@synchroni.in",  # sender email
+                    [to_email],
+                    fail_silently=False
+                )
+            except Exception:
+                NOTIFICATIONS.inc(event=event_name, result="failed")
+                raise
+        NOTIFICATIONS.inc(event=event_name, result="sent")
+        if user_id is not None:
+            from courseapi import events
+            events.publish(user_id, "notification", {"event": event_name, "subject": subject})
         return True
@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import NotificationTemplate
+from .services import NotificationService
+
+
+@receiver([post_save, post_delete], sender=NotificationTemplate)
+def reload_templates(sender, **kwargs):
+    NotificationService.clear_templates()